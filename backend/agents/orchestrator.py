@@ -1,48 +1,31 @@
 # File: agents/orchestrator.py
 
-from crewai import Crew
-from .tasks import (
-    ResumeUploadTask,
-    JobScrapingTask,
-    ProfileBuildingTask,
-    MatchingTask,
-    ResumeTailoringTask,
-    JobApplicationTask
-)
+from typing import Optional
 
-def run_agents_for_user(email: str):
+from .tasks import build_tasks
+
+
+def run_crew(email: Optional[str] = None):
     """
-    Orchestrates the multi-agent flow for a given user.
-    Injects the email into tasks if necessary (e.g., for identification in MongoDB/FAISS).
+    Builds the tasks (and, on first use, the agents and their LLM) and runs the crew.
+    With an email, it is injected into the task descriptions (e.g., for identification in MongoDB/FAISS).
     """
-    
-    # Optionally inject email into task descriptions if agents need it explicitly
-    ProfileBuildingTask.description += f" The user email is {email}."
-    MatchingTask.description += f" The profile to match belongs to {email}."
-    ResumeTailoringTask.description += f" Generate documents for {email}."
-    JobApplicationTask.description += f" Apply on behalf of user {email}."
-
-    agents = [
-        ResumeUploadTask.agent,
-        JobScrapingTask.agent,
-        ProfileBuildingTask.agent,
-        MatchingTask.agent,
-        ResumeTailoringTask.agent,
-        JobApplicationTask.agent
-    ]
-    agents = [agent for agent in agents if agent is not None]
+    from crewai import Crew
+
+    tasks = build_tasks(email)
+    agents = [task.agent for task in tasks if task.agent is not None]
 
     crew = Crew(
         agents=agents,
-        tasks=[
-            ResumeUploadTask,
-            JobScrapingTask,
-            ProfileBuildingTask,
-            MatchingTask,
-            ResumeTailoringTask,
-            JobApplicationTask
-        ],
+        tasks=tasks,
         verbose=True  # Set to False in production if you don’t want logs
     )
 
-    crew.kickoff()  # Start the multi-agent orchestration
+    return crew.kickoff()  # Start the multi-agent orchestration
+
+
+def run_agents_for_user(email: str):
+    """
+    Orchestrates the multi-agent flow for a given user.
+    """
+    return run_crew(email)
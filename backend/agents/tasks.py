@@ -1,79 +1,118 @@
 # agents/tasks.py
+"""Task definitions for the multi-agent crew.
 
-from crewai import Task
-from .base_agents import (
-    UserInteractionAgent,
-    JobScraperAgent,
-    UserProfileAgent,
-    MatcherAgent,
-    ResumeGeneratorAgent,
-    JobApplicationAgent
-)
-
-# Task 1: Upload user documents and populate knowledge base
-ResumeUploadTask = Task(
-    description=(
-        "Engage with the user to upload their resume or profile documents. "
-        "Trigger the RAG pipeline by executing the script that ingests the uploaded data, "
-        "stores it in MongoDB (raw files), and updates the FAISS vector index. "
-        "Wait for confirmation that ingestion is complete and inform the team."
+Tasks are described by `TASK_SPECS` and built by `build_tasks()`, which
+creates fresh `crewai.Task` objects (and, through `get_agent`, the agents
+and their LLM) only when a crew is about to run. The old module attributes
+(`ResumeUploadTask`, ...) are still available and are built on first access.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from .base_agents import get_agent
+
+TASK_SPECS: Dict[str, Dict[str, str]] = {
+    # Task 1: Upload user documents and populate knowledge base
+    "ResumeUploadTask": dict(
+        description=(
+            "Engage with the user to upload their resume or profile documents. "
+            "Trigger the RAG pipeline by executing the script that ingests the uploaded data, "
+            "stores it in MongoDB (raw files), and updates the FAISS vector index. "
+            "Wait for confirmation that ingestion is complete and inform the team."
+        ),
+        expected_output="Confirmation that user's knowledge base is populated.",
+        agent="UserInteractionAgent",
     ),
-    expected_output="Confirmation that user's knowledge base is populated.",
-    agent=UserInteractionAgent
-)
-
-# Task 2: Trigger job scraping script and wait for JSON output
-JobScrapingTask = Task(
-    description=(
-        "Run the Python scripts responsible for scraping job boards like LinkedIn or Glassdoor. "
-        "Execute these scripts from the filesystem and return a confirmation when job listings "
-        "have been stored in JSON format. Provide file paths to the output."
+
+    # Task 2: Trigger job scraping script and wait for JSON output
+    "JobScrapingTask": dict(
+        description=(
+            "Run the Python scripts responsible for scraping job boards like LinkedIn or Glassdoor. "
+            "Execute these scripts from the filesystem and return a confirmation when job listings "
+            "have been stored in JSON format. Provide file paths to the output."
+        ),
+        expected_output="Paths to the scraped job JSON files.",
+        agent="JobScraperAgent",
     ),
-    expected_output="Paths to the scraped job JSON files.",
-    agent=JobScraperAgent
-)
-
-# Task 3: Build user profile from MongoDB/FAISS knowledge base
-ProfileBuildingTask = Task(
-    description=(
-        "Analyze the user data in the knowledge base and build a structured user profile. "
-        "Use the embedded vectors and metadata from MongoDB to extract skills, experience, and preferences. "
-        "Identify user by their email address and output a structured JSON profile."
+
+    # Task 3: Build user profile from MongoDB/FAISS knowledge base
+    "ProfileBuildingTask": dict(
+        description=(
+            "Analyze the user data in the knowledge base and build a structured user profile. "
+            "Use the embedded vectors and metadata from MongoDB to extract skills, experience, and preferences. "
+            "Identify user by their email address and output a structured JSON profile."
+        ),
+        expected_output="Structured user profile in JSON format.",
+        agent="UserProfileAgent",
     ),
-    expected_output="Structured user profile in JSON format.",
-    agent=UserProfileAgent
-)
-
-# Task 4: Match profile to jobs with 70%+ score
-MatchingTask = Task(
-    description=(
-        "Using the previously generated user profile, run the matching engine to compare "
-        "the profile against the scraped job listings. Use cosine similarity or semantic scoring. "
-        "Only return jobs that match at least 70% of the user’s qualifications and preferences."
+
+    # Task 4: Match profile to jobs with 70%+ score
+    "MatchingTask": dict(
+        description=(
+            "Using the previously generated user profile, run the matching engine to compare "
+            "the profile against the scraped job listings. Use cosine similarity or semantic scoring. "
+            "Only return jobs that match at least 70% of the user’s qualifications and preferences."
+        ),
+        expected_output="List of matched jobs (70%+ match score).",
+        agent="MatcherAgent",
     ),
-    expected_output="List of matched jobs (70%+ match score).",
-    agent=MatcherAgent
-)
-
-# Task 5: Generate tailored resumes and cover letters
-ResumeTailoringTask = Task(
-    description=(
-        "For each matched job, generate a tailored resume and a persuasive cover letter. "
-        "Use the user profile and the job description to personalize the content. "
-        "Ensure formatting and tone are appropriate for professional applications."
+
+    # Task 5: Generate tailored resumes and cover letters
+    "ResumeTailoringTask": dict(
+        description=(
+            "For each matched job, generate a tailored resume and a persuasive cover letter. "
+            "Use the user profile and the job description to personalize the content. "
+            "Ensure formatting and tone are appropriate for professional applications."
+        ),
+        expected_output="Tailored resume and cover letter per job, in Markdown or PDF-ready text.",
+        agent="ResumeGeneratorAgent",
     ),
-    expected_output="Tailored resume and cover letter per job, in Markdown or PDF-ready text.",
-    agent=ResumeGeneratorAgent
-)
-
-# Task 6: Automate the job application process
-JobApplicationTask = Task(
-    description=(
-        "Visit the application link for each selected job. "
-        "Fill out required fields using user data and resume. "
-        "Answer application questions intelligently based on context. "
-        "Submit the job application and return a confirmation or screenshot/log."
+
+    # Task 6: Automate the job application process
+    "JobApplicationTask": dict(
+        description=(
+            "Visit the application link for each selected job. "
+            "Fill out required fields using user data and resume. "
+            "Answer application questions intelligently based on context. "
+            "Submit the job application and return a confirmation or screenshot/log."
+        ),
+        expected_output="Application submission confirmation per job.",
+        agent="JobApplicationAgent",
     ),
-    expected_output="Application submission confirmation per job.",
-    agent=JobApplicationAgent
-)
+}
+
+# Appended to a task's description when the crew runs for one user.
+EMAIL_NOTES = {
+    "ProfileBuildingTask": " The user email is {email}.",
+    "MatchingTask": " The profile to match belongs to {email}.",
+    "ResumeTailoringTask": " Generate documents for {email}.",
+    "JobApplicationTask": " Apply on behalf of user {email}.",
+}
+
+_tasks: Dict[str, Any] = {}
+_tasks_lock = threading.Lock()
+
+
+def build_task(name: str, email: Optional[str] = None):
+    from crewai import Task
+
+    spec = dict(TASK_SPECS[name])
+    if email is not None and name in EMAIL_NOTES:
+        spec["description"] += EMAIL_NOTES[name].format(email=email)
+    spec["agent"] = get_agent(spec["agent"])
+    return Task(**spec)
+
+
+def build_tasks(email: Optional[str] = None) -> List[Any]:
+    """New Task objects for one crew run, in pipeline order."""
+    return [build_task(name, email) for name in TASK_SPECS]
+
+
+def __getattr__(name: str):
+    # Lazy module attributes for code importing the tasks by name.
+    if name not in TASK_SPECS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _tasks_lock:
+        if name not in _tasks:
+            _tasks[name] = build_task(name)
+        return _tasks[name]
@@ -1,22 +1,13 @@
 # app/db.py
-from pymongo import MongoClient
-import os
+from backend.utils.mongo import candidate_db, candidate_db_name, get_client, mongo_uri
 
 
-# Get MongoDB credentials from environment variables
-MONGO_HOST = os.getenv("MONGO_HOST", "mongodb")
-MONGO_PORT = os.getenv("MONGO_PORT", "27017")
-MONGO_USER = os.getenv("MONGO_INITDB_ROOT_USERNAME")
-MONGO_PASS = os.getenv("MONGO_INITDB_ROOT_PASSWORD")
-DB_NAME = os.getenv("DB_NAME", "candidate_data")
+# Connection settings and the pooled client live in backend.utils.mongo
+MONGO_URI = mongo_uri()
+DB_NAME = candidate_db_name()
 
-if MONGO_USER and MONGO_PASS:
-    MONGO_URI = f"mongodb://{MONGO_USER}:{MONGO_PASS}@{MONGO_HOST}:{MONGO_PORT}/"
-else:
-    MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/"
-
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+client = get_client()
+db = candidate_db()
 
 def mongo_has_profile(email: str) -> bool:
     """
@@ -2,7 +2,40 @@
 
 This module provides `match_jobs` which loads a FAISS-backed index for a
 user (persisted under `faiss_index/<email>`) and uses an LLM-backed query
-engine to score job postings against the user's resume.
+engine to score job postings against the user's resume. The embedding model
+and the LLM come from the process-wide `backend.utils.model_registry`, so
+they are loaded once per process rather than once per call.
+
+Two matching modes are available (`mode` argument or `MATCH_MODE`):
+- `query_engine` (default) - runs `index.as_query_engine(...).query()` per job
+  and reads the retrieval score of the top source node.
+- `retrieval` - looks up (or embeds, on a miss) the job texts in the shared
+  job-embedding cache (`backend.utils.embedding_cache`) and scores them
+  against the user's stored resume vectors with a single FAISS search,
+  skipping the LLM.
+  The score is the same retrieval score, so `match_score` and the 70%
+  threshold keep their meaning.
+
+`top_jobs_for_user` is the reverse direction: it searches the catalog-wide
+job index (`backend.utils.job_catalog`) with the user's resume vectors and
+returns the top K postings, optionally filtered by location, workplace and
+minimum salary.
+
+`stream_match_jobs` is the incremental variant used by `/match-jobs/stream/`:
+it consumes an iterator of jobs, scores them in micro-batches and yields each
+match as soon as its batch is scored, followed by a top-K summary.
+
+Queries are embedded with the same model that built the user's index
+(`backend.utils.embedding_service`); an index built by another model is
+re-embedded before matching.
+
+Resume vectors are read from the layout selected by `VECTOR_STORE_BACKEND`
+(`backend.utils.vectorstore`): one JSON-persisted directory per user, the
+same directories with memory-mapped vectors (`backend.utils.binary_index`),
+or the sharded multi-tenant store (`backend.utils.tenant_store`).
+
+Loaded indexes are kept in `backend.utils.index_cache.index_cache`, an LRU
+cache invalidated whenever the files in the user's persist dir change.
 
 Important environment variables used here:
 - `MODEL_PATH` - path to local LLM model file (default: `models/mistral-...gguf`).
@@ -10,127 +43,319 @@ Important environment variables used here:
 - `MODEL_AUTO_DOWNLOAD` - set to `false` to avoid downloading models during import/tests.
 - `MODEL_DOWNLOAD_PROGRESS` - enable progress logging for model download.
 - `MODEL_SHA256` - optional checksum for model verification.
+- `MATCH_MODE` - `query_engine` (default) or `retrieval`.
+- `MATCH_BATCH_SIZE` - job texts embedded per batch in retrieval mode (default 256).
+- `MATCH_STREAM_BATCH_SIZE` - jobs scored per micro-batch when streaming (default 32).
+- `MATCH_STREAM_TOP_K` - number of jobs in the final streaming summary (default 20).
 
 The `match_jobs` function is written to be testable: it checks for a small
 file (`default__vector_store.json`) in the user's FAISS directory before
 attempting to load the index. Tests can set `MODEL_AUTO_DOWNLOAD=false` and
-monkeypatch LlamaCPP/load_index_from_storage to avoid loading real models.
+register dummy factories on the model registry / monkeypatch
+`load_index_from_storage` to avoid loading real models. LlamaIndex and FAISS
+are imported on first use, so importing this module stays cheap.
 """
 
-from llama_index.embeddings.fastembed import FastEmbedEmbedding
-from llama_index.core import Settings
-from llama_index.llms.llama_cpp import LlamaCPP
-from llama_index.core import StorageContext, load_index_from_storage
-from pymongo import MongoClient
-import gridfs
+import heapq
+import itertools
 import os
 import logging
-from backend.utils.download import download_model
+from typing import Any, Dict, Iterable, Iterator, Optional
+from backend.utils.binary_index import ensure_binary_index, load_texts, load_vectors
+from backend.utils.embedding_cache import embed_job_texts
+from backend.utils.embedding_service import ensure_index_current
+from backend.utils.index_cache import index_cache
+from backend.utils.job_catalog import job_catalog
+from backend.utils.job_text import job_to_text
+from backend.utils.model_registry import matcher_embed_spec, matcher_llm_spec, registry
+from backend.utils.resume_store import read_resume
+from backend.utils.tenant_store import tenant_store
+from backend.utils.vector_scoring import nearest_scores
+from backend.utils.vectorstore import vector_store_backend
 from backend.logging_config import configure_logging  # ensure logging configured for modules
 
 logger = logging.getLogger(__name__)
 
+MATCH_THRESHOLD = 70
+MATCH_MODES = ("query_engine", "retrieval")
+
 
 def get_user_raw_file(email: str):
-    """Fetch raw (binary) uploaded file for the user from MongoDB/GridFS.
+    """Fetch the user's latest uploaded resume from MongoDB/GridFS.
 
     Raises RuntimeError if the file isn't present.
     """
     logger.debug("Fetching raw file for user: %s", email)
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://mongodb:27017/")
-    logger.debug("MongoDB URI: %s", mongo_uri)
-    client = MongoClient(mongo_uri)
-    db = client.get("candidate_data") if hasattr(client, 'get') else client["candidate_data"]
-    fs = gridfs.GridFS(db)
-    logger.debug("Searching for file in MongoDB for email: %s", email)
-    file_doc = fs.find_one({"email": email})
-    if file_doc:
-        logger.info("File found for %s, returning content.", email)
-        return file_doc.read()
+    return read_resume(email)
+
+
+def load_index_from_storage(storage_context):
+    """`llama_index.core.load_index_from_storage`, imported on first use."""
+    from llama_index.core import load_index_from_storage as load
+
+    return load(storage_context)
+
+
+def _score_percent(score) -> float:
+    score = score if score is not None else 0
+    return round(float(score) * 100, 2)
+
+
+def _collect_matches(jobs, scores) -> list:
+    """Attach `match_score` to jobs scoring at or above the threshold."""
+    matches = []
+    for job, score in zip(jobs, scores):
+        score_percent = _score_percent(score)
+        if score_percent >= MATCH_THRESHOLD:
+            logger.info("Job %s matched with score: %s%%", job.get('title', 'No Title'), score_percent)
+            matches.append({**job, "match_score": score_percent})
+    return matches
+
+
+def _load_user_faiss_index(email: str, user_dir: str):
+    """Return the user's resume vectors: the raw FAISS index persisted by
+    `FaissVectorStore`, or an (n, dim) array with the binary and tenant backends
+    (tenant retrieval scoring searches the shard index instead, see
+    `_tenant_nearest_scores`; the array is used for catalog queries).
+    """
+    backend = vector_store_backend()
+    if backend == "tenant":
+        return index_cache.get((email, "tenant_vectors"), user_dir, lambda: tenant_store().vectors(email))
+    if backend == "binary":
+        return index_cache.get((email, "binary_vectors"), user_dir, lambda: load_vectors(user_dir))
+
+    import faiss
+
+    return index_cache.get(
+        (email, "faiss"),
+        user_dir,
+        lambda: faiss.read_index(os.path.join(user_dir, "default__vector_store.json")),
+    )
+
+
+def _index_from_chunks(texts, vectors):
+    """Build an in-memory LlamaIndex index over stored chunk texts and their vectors."""
+    import faiss
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from llama_index.core.schema import TextNode
+    from llama_index.vector_stores.faiss import FaissVectorStore
+
+    nodes = [TextNode(text=text, embedding=vector.tolist()) for text, vector in zip(texts, vectors)]
+    vector_store = FaissVectorStore(faiss_index=faiss.IndexFlatL2(vectors.shape[1]))
+    return VectorStoreIndex(nodes, storage_context=StorageContext.from_defaults(vector_store=vector_store))
+
+
+def _load_user_index(email: str, user_dir: str):
+    """Return the user's LlamaIndex index, loading it from storage on a cache miss."""
+    backend = vector_store_backend()
+    if backend == "tenant":
+        store = tenant_store()
+        return index_cache.get(
+            (email, "tenant_llama_index"),
+            user_dir,
+            lambda: _index_from_chunks(store.texts(email), store.vectors(email)),
+        )
+    if backend == "binary":
+        return index_cache.get(
+            (email, "binary_llama_index"),
+            user_dir,
+            lambda: _index_from_chunks(load_texts(user_dir), load_vectors(user_dir)),
+        )
+
+    def load():
+        from llama_index.core import StorageContext
+
+        logger.debug("Loading index from storage context: %s", user_dir)
+        storage_context = StorageContext.from_defaults(persist_dir=user_dir)
+        logger.debug("Storage context created, loading index...")
+        return load_index_from_storage(storage_context)
+
+    return index_cache.get((email, "llama_index"), user_dir, load)
+
+
+def _match_with_query_engine(email: str, user_dir: str, jobs) -> list:
+    from llama_index.core import Settings
+
+    embed_spec = matcher_embed_spec()
+    llm_spec = matcher_llm_spec()
+    with registry.acquire(embed_spec) as embed_model, registry.acquire(llm_spec) as llm:
+        Settings.embed_model = embed_model
+        logger.debug("Using %s for job matching.", embed_spec.name)
+
+        # load vector store & index from directory (or the index cache)
+        index = _load_user_index(email, user_dir)
+
+        Settings.llm = llm
+        logger.debug("LLM (%s) set for querying.", llm_spec.kind)
+        query_engine = index.as_query_engine(similarity_top_k=5)
+
+        scores = []
+        for job in jobs:
+            response = query_engine.query(job_to_text(job))
+            logger.debug("Queried for job: %s", job.get('title', 'No Title'))
+            scores.append(response.source_nodes[0].score if response.source_nodes else 0)
+    return _collect_matches(jobs, scores)
+
+
+def _match_with_retrieval(email: str, user_dir: str, jobs) -> list:
+    if not jobs:
+        return []
+    batch_size = int(os.getenv("MATCH_BATCH_SIZE", "256"))
+    job_vectors = embed_job_texts([job_to_text(job) for job in jobs], batch_size=batch_size)
+    if vector_store_backend() == "tenant":
+        scores = _tenant_nearest_scores(email, job_vectors)
     else:
-        raise RuntimeError(f"Files for {email} not found. Please upload resume first.")
+        scores = nearest_scores(job_vectors, _load_user_faiss_index(email, user_dir))
+    return _collect_matches(jobs, scores)
 
 
-def match_jobs(email: str, jobs):
-    """Match a list of job postings to a user's stored resume/index.
+def _tenant_nearest_scores(email: str, job_vectors) -> list:
+    """Nearest-chunk distances from the tenant's shard index, restricted to its id range."""
+    distances, chunks = tenant_store().search(email, job_vectors, k=1)
+    return [
+        float(row[0]) if len(row) and texts[0] is not None else 0
+        for row, texts in zip(distances, chunks)
+    ]
 
-    The function returns a dict with keys `matches` (list) and `raw_file`
-    (binary content) for downstream use. It raises RuntimeError on missing
-    inputs (e.g. missing FAISS vector store directory).
+
+def top_jobs_for_user(
+    email: str,
+    k: int = 20,
+    location: Optional[str] = None,
+    workplace: Optional[str] = None,
+    min_salary: Optional[float] = None,
+) -> list:
+    """Top `k` catalog postings for the user's resume, best first.
+
+    Each posting carries `similarity` (cosine x 100, not the `match_score`
+    scale) and the `collection` it was scraped into. Raises RuntimeError if
+    the user has no index.
     """
+    user_dir = _require_user_dir(email)
+    resume_vectors = _load_user_faiss_index(email, user_dir)
+    if hasattr(resume_vectors, "reconstruct_n"):
+        resume_vectors = resume_vectors.reconstruct_n(0, resume_vectors.ntotal) if resume_vectors.ntotal else []
+    if len(resume_vectors) == 0:
+        return []
+    jobs = job_catalog().search(resume_vectors, k, location=location, workplace=workplace, min_salary=min_salary)
+    logger.info("Found %d catalog jobs for user: %s", len(jobs), email)
+    return jobs
 
-    logger.info("Matching jobs for user: %s", email)
-    Settings.embed_model = FastEmbedEmbedding(model_name="BAAI/bge-base-en-v1.5")
-    logger.debug("Using FastEmbedEmbedding for job matching.")
-    user_dir = f"faiss_index/{email}"
 
+def _resolve_mode(mode: Optional[str]) -> str:
+    mode = mode or os.getenv("MATCH_MODE", "query_engine")
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode: {mode}")
+    return mode
+
+
+def _require_user_dir(email: str) -> str:
+    """Check the user has stored resume vectors (re-embedding stale ones) and
+    return the directory they live in (the user's shard with the tenant store).
+    """
+    if vector_store_backend() == "tenant":
+        store = tenant_store()
+        if not store.has_tenant(email):
+            raise RuntimeError(f"Vector store not found for {email}. Please upload resume first.")
+        store.ensure_tenant_current(email)
+        return store.shard_for(email).directory
+
+    user_dir = f"faiss_index/{email}"
     logger.debug("User directory for index: %s", user_dir)
-    model_path = os.getenv(
-        "MODEL_PATH",
-        os.path.abspath("models/mistral-7b-instruct-v0.2.Q4_K_M.gguf")
-    )
-    model_url = os.getenv(
-        "MODEL_URL",
-        "https://huggingface.co/TheBloke/Mistral-7B-Instruct-v0.2-GGUF/resolve/main/mistral-7b-instruct-v0.2.Q4_K_M.gguf",
-    )
+
+    if vector_store_backend() == "binary":
+        if not ensure_binary_index(user_dir):
+            raise RuntimeError(f"Vector store not found for {email}. Please upload resume first.")
+        ensure_index_current(user_dir)
+        return user_dir
 
     # Ensure vector store exists
     if not os.path.exists(os.path.join(user_dir, "default__vector_store.json")):
         raise RuntimeError(f"Vector store not found for {email}. Please upload resume first.")
+    ensure_index_current(user_dir)
+    # Resolve the version symlink once, so one load never mixes two versions.
+    return os.path.realpath(user_dir)
 
-    # load vector store & index from directory
-    logger.debug("Loading index from storage context for user: %s", email)
-    storage_context = StorageContext.from_defaults(persist_dir=user_dir)
-    logger.debug("Storage context created, loading index...")
-    index = load_index_from_storage(storage_context)
-
-    # Download model if configured to
-    model_auto_download = os.getenv("MODEL_AUTO_DOWNLOAD", "true").lower() not in ("0", "false", "no")
-    if model_auto_download:
-        try:
-            os.makedirs(os.path.dirname(model_path), exist_ok=True)
-            download_model(
-                model_url,
-                model_path,
-                model_sha256=os.getenv("MODEL_SHA256"),
-                progress=os.getenv("MODEL_DOWNLOAD_PROGRESS", "false").lower() in ("1", "true", "yes"),
-            )
-        except Exception:
-            logger.exception("Failed to ensure model is present at %s", model_path)
-            raise
-
-    logger.info("Initializing LlamaCPP with model at %s", model_path)
-    Settings.llm = LlamaCPP(
-        model_path=model_path,
-        temperature=0.1,
-        max_new_tokens=512,
-        context_window=2048,
-    )
 
-    logger.debug("LlamaCPP model set for querying.")
-    query_engine = index.as_query_engine(similarity_top_k=5)
+def _match_batch(email: str, user_dir: str, jobs, mode: str) -> list:
+    if mode == "retrieval":
+        return _match_with_retrieval(email, user_dir, jobs)
+    return _match_with_query_engine(email, user_dir, jobs)
 
-    # Fetch raw file from MongoDB
-    logger.debug("Fetching raw file for user: %s", email)
-    raw_file = get_user_raw_file(email)
 
-    matches = []
-    logger.info("Matching jobs against %d job postings.", len(jobs))
-    for job in jobs:
-        job_text = f"{job.get('title', 'No Title')} at {job.get('company', 'EY')}. Requirements: {job.get('requirements', 'Not specified')}"
-        response = query_engine.query(job_text)
-        logger.debug("Queried for job: %s", job.get('title', 'No Title'))
-        score = response.source_nodes[0].score if response.source_nodes else 0
-        score = score if score is not None else 0
-        score_percent = round(score * 100, 2)
-        if score_percent >= 70:
-            logger.info("Job %s matched with score: %s%%", job.get('title', 'No Title'), score_percent)
-            matches.append({**job, "match_score": score_percent})
+def match_jobs(email: str, jobs, mode: Optional[str] = None, include_raw_file: bool = False):
+    """Match a list of job postings to a user's stored resume/index.
+
+    The function returns a dict with key `matches` (list); the user's
+    uploaded file (binary content) is only read from GridFS and added under
+    `raw_file` when `include_raw_file` is set - clients that need it should
+    download it from `GET /resume/{email}` instead. It raises RuntimeError on
+    missing inputs (e.g. missing FAISS vector store directory) and ValueError
+    on an unknown `mode` (see module docstring; defaults to `MATCH_MODE`).
+    """
+
+    mode = _resolve_mode(mode)
+
+    logger.info("Matching jobs for user: %s", email)
+    user_dir = _require_user_dir(email)
+
+    logger.info("Matching jobs against %d job postings (mode: %s).", len(jobs), mode)
+    matches = _match_batch(email, user_dir, jobs, mode)
 
     matches.sort(key=lambda x: x["match_score"], reverse=True)
 
     logger.info("Found %d matching jobs for user: %s", len(matches), email)
-    return {
-        "matches": matches,
-        "raw_file": raw_file,  # This is the binary content of the user's file
-    }
\ No newline at end of file
+    result = {"matches": matches}
+    if include_raw_file:
+        result["raw_file"] = get_user_raw_file(email)
+    return result
+
+def stream_match_jobs(
+    email: str,
+    jobs: Iterable[Dict[str, Any]],
+    mode: Optional[str] = "retrieval",
+    batch_size: Optional[int] = None,
+    top_k: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Score `jobs` incrementally, yielding events as micro-batches complete.
+
+    Yields `{"event": "match", "job": {...}}` for every job at or above the
+    threshold, then a final `{"event": "summary", "scored": n, "matched": m,
+    "top": [...]}` with the best `top_k` matches sorted by score. `jobs` may
+    be any iterator (e.g. `backend.utils.job_stream.iter_jobs`), so memory
+    use is bounded by the batch size and `top_k`.
+
+    Raises RuntimeError before yielding anything if the user has no index.
+    """
+    mode = _resolve_mode(mode)
+    user_dir = _require_user_dir(email)
+    batch_size = batch_size or int(os.getenv("MATCH_STREAM_BATCH_SIZE", "32"))
+    top_k = top_k or int(os.getenv("MATCH_STREAM_TOP_K", "20"))
+
+    def events() -> Iterator[Dict[str, Any]]:
+        top: list = []  # min-heap of (score, seq, job)
+        seq = itertools.count()
+        scored = matched = 0
+        iterator = iter(jobs)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            scored += len(batch)
+            for job in _match_batch(email, user_dir, batch, mode):
+                matched += 1
+                item = (job["match_score"], next(seq), job)
+                if len(top) < top_k:
+                    heapq.heappush(top, item)
+                else:
+                    heapq.heappushpop(top, item)
+                yield {"event": "match", "job": job}
+        logger.info("Streamed %d matches out of %d jobs for user: %s", matched, scored, email)
+        yield {
+            "event": "summary",
+            "scored": scored,
+            "matched": matched,
+            "top": [job for _, _, job in sorted(top, key=lambda t: (-t[0], t[1]))],
+        }
+
+    return events()
@@ -1,31 +1,51 @@
 # main.py
 
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import base64
 import os
-import shutil
 import json
+import threading
+from typing import Optional
 
-from app.resume_parser import extract_text_from_pdf, extract_text_from_docx
-from app.candidate_embedder import embed_candidate, store_file_in_mongodb
-from app.job_matcher import match_jobs
-from app.user_profile_utils import check_user_profile
+from app.resume_parser import DOCUMENT_EXTENSIONS, iter_document_text
+from app.candidate_embedder import embed_candidate
+from app.job_matcher import match_jobs, stream_match_jobs, top_jobs_for_user
+from app.user_profile_utils import check_user_profile_async
 from fastapi.middleware.cors import CORSMiddleware
-from agents.orchestrator import run_agents_for_user
-
-from crewai import Crew
-from agents.tasks import (
-    ResumeUploadTask, JobScrapingTask, ProfileBuildingTask,
-    MatchingTask, ResumeTailoringTask, JobApplicationTask
-)
+from agents.orchestrator import run_agents_for_user, run_crew
 
 # Optional: scraping tools
 # main.py
-from jobs_scraper.ey_scraper import scrape_ey_jobs, store_in_mongodb
-from jobs_scraper.motion_scraper import scrape_motion_jobs, store_in_mongodb
+from jobs_scraper.ey_scraper import scrape_ey_jobs_async, store_in_mongodb as store_ey_jobs
+from jobs_scraper.motion_scraper import scrape_motion_jobs, store_in_mongodb as store_motion_jobs
+from backend.jobs_scraper.browser_pool import close_shared_pool, shared_pool_stats
 
 
-from app.user_profile_utils import check_user_profile
+from backend.utils import mongo
+from backend.utils.executor import PoolSaturatedError, iterate_in_pool, pool_stats, run_in_pool, shutdown_pools, submit_to_pool
+from backend.utils.generation_cache import generation_cache
+from backend.utils.index_cache import index_cache
+from backend.utils.inference import inference_stats, shutdown_inference_scheduler
+from backend.utils.ingest_queue import TERMINAL_STATUSES, IngestWorkers, ingest_queue
+from backend.utils.job_catalog import job_catalog
+from backend.utils.job_stream import iter_jobs
+from backend.utils.model_registry import registry, warm_up_from_env
+from backend.utils.resume_chunks import DEFAULT_DOCUMENT_ID
+from backend.utils.resume_store import (
+    byte_range,
+    content_disposition,
+    copy_blob_to,
+    delete_user_files,
+    etag_matches,
+    iter_range,
+    open_resume,
+    resume_etag,
+    store_resume,
+)
+from backend.utils.tailoring import DOCUMENT_INSTRUCTIONS, answer_questions, resume_text, tailor_documents
+from backend.utils.vectorstore import delete_user_vectors
 
 app = FastAPI()
 
@@ -38,67 +58,303 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def warm_up_models():
+    # Load the models listed in MODEL_WARMUP in the background so the first
+    # /match-jobs/ call does not pay the load, without delaying startup.
+    threading.Thread(target=warm_up_from_env, name="model-warmup", daemon=True).start()
+
+
+@app.on_event("startup")
+def connect_mongo():
+    mongo.connect()
+
+
+@app.on_event("shutdown")
+def stop_pools():
+    shutdown_pools(wait=False)
+
+
+@app.on_event("shutdown")
+def stop_inference():
+    shutdown_inference_scheduler(timeout=5)
+
+
+@app.on_event("shutdown")
+def close_mongo():
+    mongo.close()
+
+
+@app.on_event("shutdown")
+async def close_browsers():
+    await close_shared_pool()
+
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    # Backpressure: the workload pool is full, ask the client to retry.
+    return JSONResponse(status_code=429, content={"error": str(exc)}, headers={"Retry-After": "5"})
+
+
+def _match_pool(mode):
+    # Retrieval-only matching is embedding work; the query engine runs the LLM.
+    return "embedding" if mode == "retrieval" else "inference"
+
+
+def _ingest_upload(job, progress):
+    """Ingest queue handler: parse and embed an upload stored in GridFS."""
+    payload = job["payload"]
+    email = payload["email"]
+    path = ingest_queue().upload_path(payload["ext"])
+    try:
+        progress("fetching", payload["sha256"])
+        copy_blob_to(payload["sha256"], path)
+        # Pages are chunked as they are extracted.
+        progress("parsing and embedding")
+        pages = iter_document_text(path, payload["ext"])
+        chunks = embed_candidate(email=email, text=pages, document_id=payload["document"])
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return {"email": email, "document": payload["document"], "chunks": chunks}
+
+
+ingest_workers = None
+
+
+@app.on_event("startup")
+def start_ingest_workers():
+    global ingest_workers
+    ingest_workers = IngestWorkers(ingest_queue(), {"resume": _ingest_upload})
+    ingest_workers.start()
+
+
+@app.on_event("shutdown")
+def stop_ingest_workers():
+    if ingest_workers is not None:
+        ingest_workers.stop(timeout=5)
+
+
 @app.post("/upload-resume/")
-async def upload_resume(email: str = Form(...), file: UploadFile = File(...)):
+async def upload_resume(email: str = Form(...), file: UploadFile = File(...), document: str = Form(DEFAULT_DOCUMENT_ID)):
+    """Queue a resume for ingestion and return its job id (`202 Accepted`).
+
+    Poll `/jobs/{job_id}` or stream `/jobs/{job_id}/events` for progress.
+    Uploading again with the same `document` (e.g. `cover_letter`) replaces
+    that document's chunks and keeps the others.
+    """
     filename = file.filename or ""
     ext = os.path.splitext(filename)[-1].lower()
-    if ext not in [".pdf", ".docx"]:
+    if ext not in DOCUMENT_EXTENSIONS:
         return JSONResponse(status_code=400, content={"error": "Unsupported file type."})
 
-    temp_path = f"temp{ext}"
-    with open(temp_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    # Hashed and stored straight from the upload stream; known bytes are not written again.
+    stored = await run_in_pool("io", store_resume, file.file, email, filename, document, file.content_type)
+    payload = {"email": email, "document": document, "filename": filename, "ext": ext, "sha256": stored["sha256"]}
+    job_id = await run_in_pool("io", ingest_queue().enqueue, "resume", payload)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}",
+            "sha256": stored["sha256"],
+            "duplicate": not stored["stored"],
+        },
+    )
 
-    try:
-        # Store raw file in MongoDB
-        store_file_in_mongodb(temp_path, email)
 
-        # Extract text & embed
-        text = extract_text_from_pdf(temp_path) if ext == ".pdf" else extract_text_from_docx(temp_path)
-        embed_candidate(email=email, text=text)
-    finally:
-        os.remove(temp_path)
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    queue = ingest_queue()
+    job = await run_in_pool("io", queue.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    job["events"] = await run_in_pool("io", queue.events, job_id)
+    return job
+
+
+async def _job_events(job_id: str):
+    queue = ingest_queue()
+    seq = 0
+    while True:
+        for event in await run_in_pool("io", queue.events, job_id, seq):
+            seq = event["seq"]
+            yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+        job = await run_in_pool("io", queue.get, job_id)
+        if job["status"] in TERMINAL_STATUSES:
+            # Events of the final transition were committed with it.
+            for event in await run_in_pool("io", queue.events, job_id, seq):
+                yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+            return
+        await asyncio.sleep(0.5)
+
 
-    return {"status": f"Resume stored and processed for {email}"}
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events with the job's progress, ending when it is done or failed."""
+    if await run_in_pool("io", ingest_queue().get, job_id) is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return StreamingResponse(_job_events(job_id), media_type="text/event-stream")
 
 
 @app.post("/match-jobs/")
-async def match_job_list(email: str = Form(...), file: UploadFile = File(...)):
+async def match_job_list(
+    email: str = Form(...),
+    file: UploadFile = File(...),
+    mode: str = Form(None),
+    include_raw_file: bool = Form(False),
+):
+    """Match the uploaded job list; the resume itself is at `GET /resume/{email}`.
+
+    `include_raw_file` adds the stored file, base64-encoded, for older clients.
+    """
     jobs = json.loads(await file.read())
-    matched = match_jobs(email=email, jobs=jobs)
+    try:
+        matched = await run_in_pool(
+            _match_pool(mode or os.getenv("MATCH_MODE")),
+            match_jobs,
+            email=email,
+            jobs=jobs,
+            mode=mode,
+            include_raw_file=include_raw_file,
+        )
+    except ValueError as ve:
+        return JSONResponse(status_code=400, content={"error": str(ve)})
+    if include_raw_file:
+        matched["raw_file"] = base64.b64encode(matched["raw_file"]).decode("ascii")
     return {"matched_jobs": matched}
 
 
-@app.post("/run-multiagent/")
-async def run_full_pipeline(background_tasks: BackgroundTasks):
+async def _encode_match_events(events, fmt, pool):
+    """Serialize match events as NDJSON lines or Server-Sent Events.
+
+    Each micro-batch is scored in `pool`, keeping the event loop free.
     """
-    Triggers full CrewAI orchestration in background (non-blocking).
+    try:
+        async for event in iterate_in_pool(pool, events):
+            if fmt == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+    except ValueError as e:
+        # Malformed job file discovered mid-stream: report it as a final event.
+        error = {"event": "error", "message": str(e)}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n" if fmt == "sse" else json.dumps(error) + "\n"
+
+
+@app.post("/match-jobs/stream/")
+async def match_job_stream(
+    email: str = Form(...),
+    file: UploadFile = File(...),
+    mode: str = Form("retrieval"),
+    format: str = Form("ndjson"),
+):
+    """
+    Streams matches as soon as each micro-batch is scored, ending with a
+    top-K summary event. The jobs file (JSON array or NDJSON) is parsed
+    incrementally. `format` is `ndjson` (default) or `sse`.
     """
-    def run_crew_tasks():
-        agent_list = [
-            ResumeUploadTask.agent,
-            JobScrapingTask.agent,
-            ProfileBuildingTask.agent,
-            MatchingTask.agent,
-            ResumeTailoringTask.agent,
-            JobApplicationTask.agent,
-        ]
-        agent_list = [agent for agent in agent_list if agent is not None]
-        crew = Crew(
-            agents=agent_list,
-            tasks=[
-                ResumeUploadTask,
-                JobScrapingTask,
-                ProfileBuildingTask,
-                MatchingTask,
-                ResumeTailoringTask,
-                JobApplicationTask,
-            ],
-            verbose=True
+    if format not in ("ndjson", "sse"):
+        return JSONResponse(status_code=400, content={"error": f"Unsupported format: {format}"})
+    try:
+        # The preamble may re-embed a stale user index; keep it off the event loop.
+        events = await run_in_pool(_match_pool(mode), stream_match_jobs, email=email, jobs=iter_jobs(file.file), mode=mode)
+    except PoolSaturatedError:
+        raise
+    except (RuntimeError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(_encode_match_events(events, format, _match_pool(mode)), media_type=media_type)
+
+
+@app.post("/top-jobs/")
+async def top_jobs(
+    email: str = Form(...),
+    k: int = Form(20, ge=1, le=int(os.getenv("TOP_JOBS_MAX_K", "200"))),
+    location: str = Form(None),
+    workplace: str = Form(None),
+    min_salary: float = Form(None),
+):
+    """
+    Reverse matching: the top `k` scraped postings for the user's resume,
+    from the catalog-wide job index, with optional metadata filters.
+    """
+    try:
+        jobs = await run_in_pool(
+            "embedding", top_jobs_for_user, email, k, location=location, workplace=workplace, min_salary=min_salary
         )
-        crew.kickoff()
+    except PoolSaturatedError:
+        raise
+    except RuntimeError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"jobs": jobs}
+
+
+@app.post("/tailor-documents/")
+async def tailor_job_documents(
+    email: str = Form(...),
+    file: UploadFile = File(...),
+    kinds: str = Form("resume,cover_letter"),
+):
+    """Tailored documents for every job in the uploaded list, from the user's resume.
+
+    The resume is evaluated once and reused as a cached prompt prefix for all
+    jobs; documents already generated for the same resume and job are served
+    from the generation cache.
+    """
+    try:
+        jobs = json.loads(await file.read())
+    except ValueError:
+        jobs = None
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        return JSONResponse(status_code=400, content={"error": "file must be a JSON list of job objects"})
+    kinds = [kind.strip() for kind in kinds.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in DOCUMENT_INSTRUCTIONS]
+    if unknown or not kinds:
+        return JSONResponse(status_code=400, content={"error": f"Unknown document kinds: {unknown}"})
+    try:
+        text = await run_in_pool("io", resume_text, email)
+    except RuntimeError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    documents = await run_in_pool("inference", tailor_documents, text, jobs, kinds)
+    return {"documents": documents}
 
-    background_tasks.add_task(run_crew_tasks)
+
+@app.post("/application-answers/")
+async def application_answers(
+    email: str = Form(...),
+    questions: str = Form(...),
+    job: Optional[str] = Form(None),
+):
+    """Answers to application questions (a JSON list) from the user's resume, optionally for one job (JSON)."""
+    try:
+        questions = json.loads(questions)
+    except ValueError:
+        questions = None
+    if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        return JSONResponse(status_code=400, content={"error": "questions must be a JSON list of strings"})
+    try:
+        job = json.loads(job) if job else None
+    except ValueError:
+        job = []  # rejected below like any other non-object
+    if job is not None and not isinstance(job, dict):
+        return JSONResponse(status_code=400, content={"error": "job must be a JSON object"})
+    try:
+        text = await run_in_pool("io", resume_text, email)
+    except RuntimeError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    answers = await run_in_pool("inference", answer_questions, text, questions, job)
+    return {"answers": answers}
+
+
+@app.post("/run-multiagent/")
+async def run_full_pipeline():
+    """
+    Triggers full CrewAI orchestration in background (non-blocking).
+    The pool slot is taken before responding, so a full pool returns 429.
+    """
+    submit_to_pool("inference", run_crew)
     return {"status": "Multi-agent system started in background"}
 
 @app.post("/run-multiagent/")
@@ -106,8 +362,10 @@ async def run_multiagent(email: str = Form(...)):
     try:
         # Trigger CrewAI or LangChain flow using the email
         
-        run_agents_for_user(email)
+        await run_in_pool("inference", run_agents_for_user, email)
         return {"status": "success", "message": "Agents started."}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -116,25 +374,130 @@ async def run_multiagent(email: str = Form(...)):
 async def root():
     return {"message": "AI Job Assistant is running"}
 
+@app.get("/models/")
+async def list_models():
+    return {"models": registry.stats()}
+
+
+@app.get("/metrics/pools/")
+async def pools_metrics():
+    return {"pools": pool_stats()}
+
+
+@app.get("/metrics/browser/")
+async def browser_metrics():
+    return {"browser": shared_pool_stats()}
+
+
+@app.get("/metrics/inference/")
+async def inference_metrics():
+    """Queue wait, tokens/s and slot occupancy of the shared LLM scheduler."""
+    return {"inference": inference_stats()}
+
+
+@app.get("/metrics/generation-cache/")
+async def generation_cache_metrics():
+    cache = generation_cache()
+    return {"generation_cache": await run_in_pool("io", cache.stats) if cache is not None else None}
+
+
+@app.get("/metrics/ingest/")
+async def ingest_metrics():
+    workers = ingest_workers.workers if ingest_workers is not None else 0
+    return {"workers": workers, "jobs": await run_in_pool("io", ingest_queue().counts)}
+
+
+@app.get("/index-cache/")
+async def index_cache_stats():
+    return index_cache.stats()
+
+
+@app.get("/job-catalog/")
+async def job_catalog_stats():
+    return await run_in_pool("io", lambda: job_catalog().stats())
+
+
+@app.delete("/vectors/{email}")
+async def delete_vectors(email: str):
+    """Delete every stored resume vector of one user (tenant)."""
+    try:
+        deleted = await run_in_pool("io", delete_user_vectors, email)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"deleted": deleted}
+
+
+@app.get("/resume/{email}")
+async def download_resume(email: str, request: Request, document: str = DEFAULT_DOCUMENT_ID):
+    """Stream the user's latest upload from GridFS; supports `Range` and `If-None-Match`."""
+    stream = await run_in_pool("io", open_resume, email, document)
+    if stream is None:
+        return JSONResponse(status_code=404, content={"error": f"No {document} uploaded for {email}"})
+    etag = resume_etag(stream)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": content_disposition(stream.filename or document),
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = stream.length
+    try:
+        span = byte_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    status = 200
+    start, end = 0, size - 1
+    if span is not None and request.headers.get("if-range", etag) == etag:
+        status = 206
+        start, end = span
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iterate_in_pool("io", iter_range(stream, start, end)),
+        status_code=status,
+        media_type=stream.content_type or "application/octet-stream",
+        headers=headers,
+    )
+
+
+@app.delete("/resume/{email}")
+async def delete_resume_files(email: str):
+    """Drop the user's stored uploads; files no other user references are deleted."""
+    freed = await run_in_pool("io", delete_user_files, email)
+    return {"freed": freed}
+
+
+@app.post("/models/unload/")
+async def unload_models(force: bool = Form(False)):
+    unloaded = registry.unload(force=force)
+    return {"unloaded": [spec.name for spec in unloaded]}
+
 @app.post("/check-profile/")
 async def check_profile(email: str = Form(...)):
     try:
-        exists = check_user_profile(email)
+        exists = await check_user_profile_async(email)
         if exists:
             return {"status": "exists", "message": "✅ Profile found. You may proceed to job search."}
         else:
             return {"status": "new", "message": "📄 No profile found. Please upload your resume to begin."}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.post("/scrape-ey-jobs/")
 async def scrape_ey(country: str = Form(...)):
     try:
-        jobs = scrape_ey_jobs(country)
-        store_in_mongodb(jobs)
-        return {"status": "success", "jobs_scraped": len(jobs)}
+        jobs = await scrape_ey_jobs_async(country)
+        ingested = await run_in_pool("io", store_ey_jobs, jobs)
+        return {"status": "success", "jobs_scraped": len(jobs), "ingested": ingested}
     except ValueError as ve:
         return {"status": "error", "message": str(ve)}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         return {"status": "error", "message": f"Failed to scrape: {e}"}
 
@@ -142,7 +505,9 @@ async def scrape_ey(country: str = Form(...)):
 async def scrape_motion():
     try:
         jobs = await scrape_motion_jobs()
-        store_in_mongodb(jobs)
-        return {"status": "success", "jobs_scraped": len(jobs)}
+        ingested = await run_in_pool("io", store_motion_jobs, jobs)
+        return {"status": "success", "jobs_scraped": len(jobs), "ingested": ingested}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
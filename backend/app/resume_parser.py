@@ -3,6 +3,20 @@
 This keeps existing imports (`from app.resume_parser import ...`) working while the
 implementation lives in `backend/utils/resume_parser.py`.
 """
-from backend.utils.resume_parser import extract_text_from_pdf, extract_text_from_docx
+from backend.utils.resume_parser import (
+    DOCUMENT_EXTENSIONS,
+    extract_text_from_docx,
+    extract_text_from_pdf,
+    iter_docx_blocks,
+    iter_document_text,
+    iter_pdf_pages,
+)
 
-__all__ = ["extract_text_from_pdf", "extract_text_from_docx"]
+__all__ = [
+    "DOCUMENT_EXTENSIONS",
+    "extract_text_from_docx",
+    "extract_text_from_pdf",
+    "iter_docx_blocks",
+    "iter_document_text",
+    "iter_pdf_pages",
+]
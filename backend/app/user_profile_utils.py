@@ -18,6 +18,6 @@
 # app/user_profile_utils.py
 
 """Compatibility wrapper re-exporting from `backend.utils.user_profile_utils`."""
-from backend.utils.user_profile_utils import check_user_profile
+from backend.utils.user_profile_utils import check_user_profile, check_user_profile_async
 
-__all__ = ["check_user_profile"]
+__all__ = ["check_user_profile", "check_user_profile_async"]
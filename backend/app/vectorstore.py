@@ -1,4 +1,4 @@
 """Compatibility wrapper re-exporting from `backend.utils.vectorstore`."""
-from backend.utils.vectorstore import faiss_exists_for_email
+from backend.utils.vectorstore import delete_user_vectors, faiss_exists_for_email, vector_store_backend
 
-__all__ = ["faiss_exists_for_email"]
+__all__ = ["delete_user_vectors", "faiss_exists_for_email", "vector_store_backend"]
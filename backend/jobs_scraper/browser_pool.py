@@ -0,0 +1,303 @@
+# browser_pool.py
+"""Shared Playwright browser pool for the scrapers.
+
+Launching Chromium per scrape and visiting detail pages one after another
+makes a scrape cost the sum of all page loads. `BrowserPool` keeps one warm
+browser with a bounded set of contexts and reusable pages:
+
+- at most `concurrency` pages are open at once, spread round-robin over
+  `max_contexts` browser contexts,
+- pages are returned to an idle pool after use instead of being closed,
+- `map()` fans a coroutine out over many items through the pool, so a full
+  scrape is bounded by N-way parallelism.
+
+`shared_pool()` returns a process-wide pool (for the API); CLI runs can
+create their own pool with `async with BrowserPool(...) as pool`. A pool
+built with `user_data_dir` wraps a persistent (logged-in) context instead of
+launching a fresh browser.
+
+Detail pages only need their HTML, so callers can pass a `BlockPolicy` to
+`page()`/`map()`: requests of the listed resource types (images, fonts,
+media, ...) or to the listed tracker/ad domains are aborted by a route
+handler installed on the page. `stats()` reports pages served, per-page
+latency, requests, blocked requests and bytes transferred, so the savings
+are visible (see `/metrics/browser/`).
+
+Each scraper reads its own settings with `block_policy_from_env(SITE)` and
+`extract_mode_from_env(SITE)`:
+- `<SITE>_BLOCK_RESOURCES` (default true) turns request blocking off,
+- `<SITE>_BLOCK_TYPES` overrides the blocked resource types (comma-separated),
+- `<SITE>_EXTRACT_MODE` is `evaluate` (default: read all fields of a page in
+  one `page.evaluate` round-trip) or `selectors` (one `query_selector` /
+  `inner_text` await per field, as the scrapers originally did).
+
+Environment variables for the shared pool:
+- `PLAYWRIGHT_CONCURRENCY` (default 4), `PLAYWRIGHT_CONTEXTS` (default 2),
+- `PLAYWRIGHT_HEADLESS` (default true), `PLAYWRIGHT_SLOW_MO` (ms, default 0).
+"""
+import asyncio
+import functools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import NamedTuple, Tuple
+from urllib.parse import urlsplit
+
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+TRACKER_DOMAINS = (
+    "doubleclick.net",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.io",
+    "segment.com",
+    "optimizely.com",
+    "newrelic.com",
+    "nr-data.net",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "bat.bing.com",
+    "px.ads.linkedin.com",
+    "ads-twitter.com",
+    "analytics.tiktok.com",
+    "clarity.ms",
+)
+
+
+class BlockPolicy(NamedTuple):
+    """Which requests a page should abort: by Playwright resource type or by host."""
+
+    resource_types: Tuple[str, ...] = DEFAULT_BLOCKED_RESOURCE_TYPES
+    domains: Tuple[str, ...] = TRACKER_DOMAINS
+
+    def blocks(self, resource_type, url):
+        if resource_type in self.resource_types:
+            return True
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == domain or host.endswith("." + domain) for domain in self.domains)
+
+
+DEFAULT_BLOCK_POLICY = BlockPolicy()
+EXTRACT_MODES = ("evaluate", "selectors")
+
+
+def block_policy_from_env(site, default=DEFAULT_BLOCK_POLICY):
+    """Per-scraper `BlockPolicy` from `<SITE>_BLOCK_RESOURCES` / `<SITE>_BLOCK_TYPES`."""
+    site = site.upper()
+    if os.getenv(f"{site}_BLOCK_RESOURCES", "true").lower() not in ("1", "true", "yes"):
+        return None
+    types = os.getenv(f"{site}_BLOCK_TYPES")
+    if types is not None:
+        default = default._replace(resource_types=tuple(t.strip() for t in types.split(",") if t.strip()))
+    return default
+
+
+def extract_mode_from_env(site, default="evaluate"):
+    mode = os.getenv(f"{site.upper()}_EXTRACT_MODE", default).lower()
+    if mode not in EXTRACT_MODES:
+        raise ValueError(f"Unknown {site.upper()}_EXTRACT_MODE {mode!r}; expected one of {EXTRACT_MODES}")
+    return mode
+
+
+class BrowserPool:
+    def __init__(self, concurrency=4, max_contexts=2, headless=True, slow_mo=0, user_data_dir=None):
+        self.concurrency = concurrency
+        self.max_contexts = max_contexts if user_data_dir is None else 1
+        self.headless = headless
+        self.slow_mo = slow_mo
+        self.user_data_dir = user_data_dir
+        self._playwright = None
+        self._browser = None
+        self._contexts = []
+        self._idle = None
+        self._created = 0
+        self._start_lock = asyncio.Lock()
+        self._context_lock = asyncio.Lock()
+        self._policies = {}
+        self._routed = set()
+        self._stats = {
+            "pages": 0,
+            "failed": 0,
+            "seconds": 0.0,
+            "max_seconds": 0.0,
+            "requests": 0,
+            "blocked": 0,
+            "bytes": 0,
+        }
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def started(self):
+        return self._playwright is not None
+
+    async def start(self):
+        async with self._start_lock:
+            if self.started:
+                return
+            # Imported here so importing the API does not load Playwright.
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            if self.user_data_dir:
+                context = await self._playwright.chromium.launch_persistent_context(
+                    user_data_dir=self.user_data_dir, headless=self.headless, slow_mo=self.slow_mo
+                )
+                self._contexts = [context]
+            else:
+                self._browser = await self._playwright.chromium.launch(headless=self.headless, slow_mo=self.slow_mo)
+            self._idle = asyncio.Queue()
+            self._created = 0
+
+    async def close(self):
+        if not self.started:
+            return
+        for context in self._contexts:
+            await context.close()
+        if self._browser is not None:
+            await self._browser.close()
+        await self._playwright.stop()
+        self._playwright = self._browser = None
+        self._contexts = []
+
+    async def new_context(self):
+        """Hook for subclasses/callers that need to configure new contexts."""
+        return await self._browser.new_context()
+
+    async def _context_for(self, slot):
+        index = slot % self.max_contexts
+        if len(self._contexts) <= index:
+            # Callers racing here would each create the missing contexts;
+            # the length is re-checked once the lock is held.
+            async with self._context_lock:
+                while len(self._contexts) <= index:
+                    self._contexts.append(await self.new_context())
+        return self._contexts[index]
+
+    async def _acquire_page(self):
+        if not self._idle.empty() or self._created >= self.concurrency:
+            return await self._idle.get()
+        slot = self._created
+        self._created += 1
+        try:
+            context = await self._context_for(slot)
+            page = await context.new_page()
+        except Exception:
+            self._created -= 1
+            raise
+        page.on("requestfinished", self._on_request_finished)
+        return page
+
+    def _release_page(self, page):
+        if page.is_closed():
+            # Let a replacement page be created for this slot.
+            self._created -= 1
+            self._policies.pop(page, None)
+            self._routed.discard(page)
+        else:
+            self._idle.put_nowait(page)
+
+    async def _apply_policy(self, page, policy):
+        self._policies[page] = policy
+        # Routing sends every request through Python, so only pay for it on
+        # pages that have been asked to block something.
+        if policy is not None and page not in self._routed:
+            await page.route("**/*", functools.partial(self._route, page))
+            self._routed.add(page)
+
+    async def _route(self, page, route):
+        request = route.request
+        policy = self._policies.get(page)
+        if policy is not None and policy.blocks(request.resource_type, request.url):
+            self._stats["blocked"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _on_request_finished(self, request):
+        self._stats["requests"] += 1
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        self._stats["bytes"] += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+
+    @asynccontextmanager
+    async def page(self, policy=None):
+        """Borrow a page from the pool; at most `concurrency` are in use at once.
+
+        `policy` is a `BlockPolicy` for the requests this page makes while
+        borrowed (None loads everything).
+        """
+        await self.start()
+        page = await self._acquire_page()
+        started = time.perf_counter()
+        try:
+            await self._apply_policy(page, policy)
+            yield page
+        except BaseException:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stats["pages"] += 1
+            self._stats["seconds"] += elapsed
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], elapsed)
+            self._release_page(page)
+
+    async def map(self, fn, items, policy=None):
+        """Run `fn(page, item)` for every item through the pool, keeping input order.
+
+        Exceptions are returned in place of results so one failing detail
+        page does not abort the scrape.
+        """
+        async def run(item):
+            async with self.page(policy) as page:
+                return await fn(page, item)
+
+        return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["avg_seconds"] = stats["seconds"] / stats["pages"] if stats["pages"] else 0.0
+        stats["open_pages"] = self._created
+        return stats
+
+
+_shared_pool = None
+
+
+async def shared_pool():
+    """Return the process-wide warm browser pool, starting it on first use."""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = BrowserPool(
+            concurrency=int(os.getenv("PLAYWRIGHT_CONCURRENCY", "4")),
+            max_contexts=int(os.getenv("PLAYWRIGHT_CONTEXTS", "2")),
+            headless=os.getenv("PLAYWRIGHT_HEADLESS", "true").lower() in ("1", "true", "yes"),
+            slow_mo=int(os.getenv("PLAYWRIGHT_SLOW_MO", "0")),
+        )
+    await _shared_pool.start()
+    return _shared_pool
+
+
+def shared_pool_stats():
+    """Counters of the shared pool, or None if no scrape has started it yet."""
+    return _shared_pool.stats() if _shared_pool is not None else None
+
+
+async def close_shared_pool():
+    global _shared_pool
+    if _shared_pool is not None:
+        await _shared_pool.close()
+        _shared_pool = None
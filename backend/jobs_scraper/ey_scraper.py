@@ -1,9 +1,12 @@
 # ey_scraper.py
 
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
 from urllib.parse import urljoin
-import os, json, time, requests
+import asyncio, json, os, random
+import httpx
+
+from backend.utils.job_ingest import upsert_jobs
+from backend.utils.rate_limit import HostRateLimiter
 
 country_code_map = {
     "united states": "US",
@@ -21,6 +24,15 @@ country_code_map = {
 headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 base_url = "https://careers.ey.com"
 
+# Fetching is concurrent and politeness is enforced by a per-host token bucket
+# instead of fixed sleeps. All of these can be tuned through the environment.
+EY_CONCURRENCY = int(os.getenv("EY_CONCURRENCY", "8"))
+EY_RATE_PER_SEC = float(os.getenv("EY_RATE_PER_SEC", "2"))
+EY_BURST = int(os.getenv("EY_BURST", "4"))
+EY_MAX_RETRIES = int(os.getenv("EY_MAX_RETRIES", "3"))
+EY_TIMEOUT = float(os.getenv("EY_TIMEOUT", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
 from typing import Optional
 
@@ -39,9 +51,13 @@ def find_next_page(soup):
     return urljoin(base_url, next_link["href"]) if next_link and "href" in next_link.attrs else None
 
 
-def extract_job_details(link):
-    res = requests.get(link, headers=headers)
-    job_soup = BeautifulSoup(res.text, "html.parser")
+def parse_listing(html):
+    soup = BeautifulSoup(html, "html.parser")
+    return extract_job_links(soup), find_next_page(soup)
+
+
+def parse_job_details(html, link):
+    job_soup = BeautifulSoup(html, "html.parser")
 
     def extract(selector):
         el = job_soup.select_one(selector)
@@ -58,45 +74,88 @@ def extract_job_details(link):
     }
 
 
-def scrape_ey_jobs(country: str) -> list:
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    # Exponential backoff with jitter: ~0.5s, 1s, 2s, ...
+    return 0.5 * (2 ** attempt) * (0.5 + random.random())
+
+
+async def fetch(client, limiter, url, retries=EY_MAX_RETRIES):
+    """GET `url` politely, retrying with backoff on 429/5xx and transport errors."""
+    for attempt in range(retries + 1):
+        await limiter.acquire(url)
+        try:
+            res = await client.get(url)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(_retry_delay(None, attempt))
+            continue
+        if res.status_code in RETRY_STATUSES and attempt < retries:
+            await asyncio.sleep(_retry_delay(res, attempt))
+            continue
+        res.raise_for_status()
+        return res.text
+
+
+async def scrape_ey_jobs_async(country: str, concurrency: int = EY_CONCURRENCY, rate: float = EY_RATE_PER_SEC) -> list:
     code = get_country_code(country)
     if not code:
         raise ValueError(f"Unsupported country: {country}")
 
     start_url = f"{base_url}/search/?createNewAlert=false&q=&locationsearch=&optionsFacetsDD_country={code}&optionsFacetsDD_customfield1="
 
-    current_url = start_url
-    all_job_links = []
-
-    while current_url:
-        res = requests.get(current_url, headers=headers)
-        soup = BeautifulSoup(res.text, "html.parser")
-        all_job_links.extend(extract_job_links(soup))
-        current_url = find_next_page(soup)
-        time.sleep(1)
-
-    all_job_links = list(set(all_job_links))
+    limiter = HostRateLimiter(rate, EY_BURST)
+    links: asyncio.Queue = asyncio.Queue()
+    seen = set()
     all_jobs = []
 
-    for link in all_job_links:
+    async def discover(client):
+        # Pagination feeds detail links to the workers as soon as each page is parsed.
+        # Parsing runs in a thread so it does not stall the other fetches.
+        current_url = start_url
         try:
-            all_jobs.append(extract_job_details(link))
-        except Exception as e:
-            print(f"Error scraping {link}: {e}")
-        time.sleep(1)
+            while current_url:
+                page_links, current_url = await asyncio.to_thread(parse_listing, await fetch(client, limiter, current_url))
+                for link in page_links:
+                    if link not in seen:
+                        seen.add(link)
+                        links.put_nowait(link)
+        finally:
+            for _ in range(concurrency):
+                links.put_nowait(None)
+
+    async def worker(client):
+        while True:
+            link = await links.get()
+            if link is None:
+                return
+            try:
+                all_jobs.append(await asyncio.to_thread(parse_job_details, await fetch(client, limiter, link), link))
+            except Exception as e:
+                print(f"Error scraping {link}: {e}")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=EY_TIMEOUT, follow_redirects=True) as client:
+        await asyncio.gather(discover(client), *(worker(client) for _ in range(concurrency)))
 
     return all_jobs
 
 
+def scrape_ey_jobs(country: str) -> list:
+    return asyncio.run(scrape_ey_jobs_async(country))
+
+
 def store_in_mongodb(jobs: list, collection_name="ey_jobs"):
     if not jobs:
-        return
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
 
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-    client: MongoClient = MongoClient(mongo_uri, serverSelectionTimeoutMS=3000)
-    db = client["job_data"]
-    db[collection_name].insert_many(jobs)
-    print(f"✅ Stored {len(jobs)} jobs in MongoDB collection '{collection_name}'.")
+    counts = upsert_jobs(jobs, collection_name)
+    print(f"✅ Stored jobs in MongoDB collection '{collection_name}': "
+          f"{counts['inserted']} new, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+    return counts
 
 
 def main():
@@ -1,72 +1,125 @@
 
 import asyncio
 import json
-from playwright.async_api import async_playwright
+
+from backend.jobs_scraper.browser_pool import BrowserPool, block_policy_from_env, extract_mode_from_env, shared_pool
 
 SEARCH_URL = "https://www.glassdoor.com/job-listing/sr-backend-developer-node-js-aws-mongodb-resolve-tech-solutions-inc-JV_IC1140006_KO0,40_KE41,67.htm?jl=1009754088983"
 
-async def scrape_glassdoor_jobs():
+JOB_CARD_SELECTOR = "a.JobCard_jobTitle__GLyJ1"
+DESCRIPTION_SELECTOR = "div.JobDetails_jobDescription_uW_fk.JobDetails_showHidden_C_FOA p"
+
+# All card fields in one round-trip (evaluate mode).
+CARDS_JS = """
+(cards) => cards.map((card) => {
+    const link = card.getAttribute("href");
+    const jobId = link && link.includes("jl=") ? link.split("jl=").pop() : "";
+    const container = card.closest('div[data-test="JobListing"]');
+    const text = (sel) => { const el = container && container.querySelector(sel); return el ? el.innerText : null; };
+    return {
+        "company": text("span.EmployerProfile_compactEmployerName__9MGcV"),
+        "job-title": card.innerText,
+        "job-link": link && link.startsWith("/") ? "https://www.glassdoor.com" + link : link,
+        "job-location": text(`div#job-location-${jobId}`),
+        "job-salary": text(`div#job-salary-${jobId}`),
+        "salary-estimate-by": text(`div#job-salary-${jobId} span`),
+    };
+})
+"""
+
+DESCRIPTION_JS = """
+(selector) => Array.from(document.querySelectorAll(selector), (p) => p.innerText).join(" ")
+"""
+
+
+async def _scrape_job_card(job_card):
+    job_link = await job_card.get_attribute("href")
+    job_url = f"https://www.glassdoor.com{job_link}" if job_link and job_link.startswith("/") else job_link
+    job_id = job_link.split("jl=")[-1] if "jl=" in job_link else ""
+
+    title = await job_card.inner_text()
+
+    container = await job_card.evaluate_handle("node => node.closest('div[data-test=\"JobListing\"]')")
+    company_el = await container.query_selector("span.EmployerProfile_compactEmployerName__9MGcV")
+    location_el = await container.query_selector(f"div#job-location-{job_id}")
+    salary_el = await container.query_selector(f"div#job-salary-{job_id}")
+    salary_by_el = await container.query_selector(f"div#job-salary-{job_id} span")
+
+    return {
+        "company": await company_el.inner_text() if company_el else None,
+        "job-title": title,
+        "job-link": job_url,
+        "job-location": await location_el.inner_text() if location_el else None,
+        "job-salary": await salary_el.inner_text() if salary_el else None,
+        "salary-estimate-by": await salary_by_el.inner_text() if salary_by_el else None,
+    }
+
+
+async def _scrape_description(job_page, job, extract_mode="selectors"):
+    # Visit job URL and scrape full description
+    job_url = job["job-link"]
+    await job_page.goto(job_url, timeout=120_000)
+    try:
+        await job_page.wait_for_selector(DESCRIPTION_SELECTOR, timeout=30_000)
+        if extract_mode == "evaluate":
+            return {**job, "description": await job_page.evaluate(DESCRIPTION_JS, DESCRIPTION_SELECTOR)}
+        paragraphs = await job_page.query_selector_all(DESCRIPTION_SELECTOR)
+        description = " ".join([await p.inner_text() for p in paragraphs])
+    except Exception as e:
+        print(f"Failed to load description for {job_url}: {e}")
+        description = None
+    return {**job, "description": description}
+
+
+async def scrape_glassdoor_jobs(pool=None, extract_mode=None):
+    """Scrape the Glassdoor listing, then load descriptions in parallel through `pool`.
+
+    `extract_mode` defaults to `GLASSDOOR_EXTRACT_MODE`.
+    """
+    pool = pool or await shared_pool()
+    extract_mode = extract_mode or extract_mode_from_env("glassdoor")
+    policy = block_policy_from_env("glassdoor")
     jobs = []
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False, slow_mo=500)
-        page = await browser.new_page()
+    async with pool.page(policy) as page:
         await page.goto(SEARCH_URL, timeout=120_000)
 
         try:
             await page.wait_for_selector("div[data-test='JobListing']", timeout=60_000)
         except Exception as e:
             print("Failed to load job listings:", e)
-            await browser.close()
             return jobs
 
-        job_cards = await page.query_selector_all("a.JobCard_jobTitle__GLyJ1")
-        print(f"Found {len(job_cards)} job listings.")
-
-        for job_card in job_cards:
-            try:
-                job_link = await job_card.get_attribute("href")
-                job_url = f"https://www.glassdoor.com{job_link}" if job_link and job_link.startswith("/") else job_link
-                job_id = job_link.split("jl=")[-1] if "jl=" in job_link else ""
-
-                title = await job_card.inner_text()
-
-                container = await job_card.evaluate_handle("node => node.closest('div[data-test=\"JobListing\"]')")
-                company_el = await container.query_selector("span.EmployerProfile_compactEmployerName__9MGcV")
-                location_el = await container.query_selector(f"div#job-location-{job_id}")
-                salary_el = await container.query_selector(f"div#job-salary-{job_id}")
-                salary_by_el = await container.query_selector(f"div#job-salary-{job_id} span")
-
-                job = {
-                    "company": await company_el.inner_text() if company_el else None,
-                    "job-title": title,
-                    "job-link": job_url,
-                    "job-location": await location_el.inner_text() if location_el else None,
-                    "job-salary": await salary_el.inner_text() if salary_el else None,
-                    "salary-estimate-by": await salary_by_el.inner_text() if salary_by_el else None,
-                }
-
-                # Visit job URL and scrape full description
-                job_page = await browser.new_page()
-                await job_page.goto(job_url, timeout=120_000)
+        if extract_mode == "evaluate":
+            jobs = await page.eval_on_selector_all(JOB_CARD_SELECTOR, CARDS_JS)
+            print(f"Found {len(jobs)} job listings.")
+        else:
+            job_cards = await page.query_selector_all(JOB_CARD_SELECTOR)
+            print(f"Found {len(job_cards)} job listings.")
+
+            for job_card in job_cards:
                 try:
-                    await job_page.wait_for_selector("div.JobDetails_jobDescription_uW_fk.JobDetails_showHidden_C_FOA p", timeout=30_000)
-                    paragraphs = await job_page.query_selector_all("div.JobDetails_jobDescription_uW_fk.JobDetails_showHidden_C_FOA p")
-                    job["description"] = " ".join([await p.inner_text() for p in paragraphs])
+                    jobs.append(await _scrape_job_card(job_card))
                 except Exception as e:
-                    print(f"Failed to load description for {job_url}: {e}")
-                    job["description"] = None
-                await job_page.close()
+                    print(f"Error scraping a job card: {e}")
+                    continue
+
+    async def visit(job_page, job):
+        return await _scrape_description(job_page, job, extract_mode)
+
+    details = await pool.map(visit, jobs, policy)
+    return [
+        detail if not isinstance(detail, Exception) else {**job, "description": None}
+        for job, detail in zip(jobs, details)
+    ]
+
 
-                jobs.append(job)
-            except Exception as e:
-                print(f"Error scraping a job card: {e}")
-                continue
+async def _main():
+    async with BrowserPool() as pool:
+        return await scrape_glassdoor_jobs(pool)
 
-        await browser.close()
-    return jobs
 
 if __name__ == "__main__":
-    scraped_jobs = asyncio.run(scrape_glassdoor_jobs())
+    scraped_jobs = asyncio.run(_main())
     with open("glassdoor_jobs.json", "w", encoding="utf-8") as f:
         json.dump(scraped_jobs, f, ensure_ascii=False, indent=2)
     print(f"Saved {len(scraped_jobs)} jobs to glassdoor_jobs.json")
@@ -7,7 +7,8 @@
 import asyncio
 import json
 import re
-from playwright.async_api import async_playwright
+
+from backend.jobs_scraper.browser_pool import BrowserPool, block_policy_from_env, extract_mode_from_env
 
 BASE_URL = "https://utdallas.joinhandshake.com"
 SEARCH_URL_TEMPLATE = BASE_URL + "/job-search?page={}"
@@ -17,113 +18,160 @@ USER_DATA_DIR = "/home/smartcat/chrome-handshake-profile"
 START_PAGE = 1
 END_PAGE = 1  # You can increase this to scrape more pages
 
-async def scrape_handshake_jobs():
-    all_jobs = []
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch_persistent_context(
-            user_data_dir=USER_DATA_DIR,
-            headless=False
-        )
-
-        page = browser.pages[0] if browser.pages else await browser.new_page()
+DESCRIPTION_SELECTOR = "div.sc-hpHAyN.gFYNTb"
+CONCURRENCY = 4
+
+# Cards and description in one round-trip (evaluate mode).
+DETAIL_JS = """
+([cardSelector, descriptionSelector]) => {
+    const text = (root, sel) => { const el = root.querySelector(sel); return el ? el.innerText.trim() : ""; };
+    const description = document.querySelector(descriptionSelector);
+    return {
+        description: description ? description.textContent.trim() : "",
+        cards: Array.from(document.querySelectorAll(cardSelector), (card) => {
+            const link = card.querySelector("a[href*='/jobs/']");
+            return {
+                company: text(card, "div.sc-iTFTee.kqrVpX span.sc-jrcTuL.ifJtBF"),
+                title: text(card, "div.sc-hLBbgP.dpzvOf"),
+                location: text(card, "span.sc-hywjFt.eqqBly"),
+                date_posted: text(card, "span.sc-qyDQW.ZEwse"),
+                href: link ? link.getAttribute("href") || "" : null,
+            };
+        }),
+    };
+}
+"""
+
+
+async def _collect_job_ids(page, page_number):
+    search_url = SEARCH_URL_TEMPLATE.format(page_number)
+    print(f"\n🔄 Scraping search results page {page_number}: {search_url}")
+
+    try:
+        await page.goto(search_url, timeout=60000)
+        await page.wait_for_selector(JOB_CONTAINER_SELECTOR, timeout=30000)
+    except Exception as e:
+        print(f"❌ Failed to load page {page_number}: {e}")
+        return []
+
+    data_hooks = await page.eval_on_selector_all(
+        JOB_CONTAINER_SELECTOR, "(cards) => cards.map((card) => card.getAttribute('data-hook'))"
+    )
+    print(f"➡️ Found {len(data_hooks)} job cards on page {page_number}")
+
+    job_ids = []
+    for data_hook in data_hooks:
+        try:
+            match = re.search(r'job-result-card\s*\|\s*(\d+)', data_hook or "")
+            if match:
+                job_ids.append((match.group(1).strip(), page_number))
+        except Exception as e:
+            print(f"⚠️ Error processing job card: {e}")
+    return job_ids
+
+
+def _search_uuid(job_url):
+    search_id_match = re.search(r'searchId=([a-f0-9\-]+)', job_url)
+    return search_id_match.group(1) if search_id_match else ""
+
+
+async def _scrape_job_detail_evaluate(job_page, job_id, job_detail_url):
+    try:
+        await job_page.wait_for_selector(DESCRIPTION_SELECTOR, timeout=30000)
+    except Exception as e:
+        print(f"❌ Failed to load job description for {job_detail_url}: {e}")
+    detail = await job_page.evaluate(DETAIL_JS, [JOB_CONTAINER_SELECTOR, DESCRIPTION_SELECTOR])
+    jobs = []
+    for card in detail["cards"]:
+        href = card.pop("href")
+        job_url = BASE_URL + href if href is not None else ""
+        jobs.append({
+            **card,
+            "job_url": job_detail_url,
+            "search_uuid": _search_uuid(job_url),
+            "job_id": job_id,
+            "description": detail["description"],
+        })
+    return jobs
+
+
+async def _scrape_job_detail(job_page, job_ref, extract_mode="selectors"):
+    job_id, page_number = job_ref
+    job_detail_url = f"{BASE_URL}/job-search/{job_id}?per_page=5&sort=posted_date_desc&page={page_number}"
+    jobs = []
+    try:
+        await job_page.goto(job_detail_url, timeout=60000)
+        print(f"🔍 Scraping job details for ID {job_id} at {job_detail_url}")
+        await job_page.wait_for_selector(JOB_CONTAINER_SELECTOR, timeout=30000)
+        if extract_mode == "evaluate":
+            return await _scrape_job_detail_evaluate(job_page, job_id, job_detail_url)
+        job_detail_cards = await job_page.query_selector_all(JOB_CONTAINER_SELECTOR)
+
+        # The description panel lives on the same page, so read it once
+        # instead of reloading the URL for every card.
+        try:
+            await job_page.wait_for_selector(DESCRIPTION_SELECTOR, timeout=30000)
+            desc_elem = await job_page.query_selector(DESCRIPTION_SELECTOR)
+            description = (await desc_elem.text_content()).strip() if desc_elem else ""
+        except Exception as e:
+            print(f"❌ Failed to load job description for {job_detail_url}: {e}")
+            description = ""
+
+        for detail_card in job_detail_cards:
+            company_elem = await detail_card.query_selector("div.sc-iTFTee.kqrVpX span.sc-jrcTuL.ifJtBF")
+            title_elem = await detail_card.query_selector("div.sc-hLBbgP.dpzvOf")
+            location_elem = await detail_card.query_selector("span.sc-hywjFt.eqqBly")
+            date_elem = await detail_card.query_selector("span.sc-qyDQW.ZEwse")
+            link_elem = await detail_card.query_selector("a[href*='/jobs/']")
+
+            job_url = BASE_URL + (await link_elem.get_attribute("href") or "") if link_elem else ""
+
+            jobs.append({
+                "company": (await company_elem.inner_text()).strip() if company_elem else "",
+                "title": (await title_elem.inner_text()).strip() if title_elem else "",
+                "location": (await location_elem.inner_text()).strip() if location_elem else "",
+                "date_posted": (await date_elem.inner_text()).strip() if date_elem else "",
+                "job_url": job_detail_url,
+                "search_uuid": _search_uuid(job_url),
+                "job_id": job_id,
+                "description": description,
+            })
+    except Exception as e:
+        print(f"⚠️ Failed to scrape job detail for ID {job_id}: {e}")
+    return jobs
+
+
+async def scrape_handshake_jobs(pool=None, extract_mode=None):
+    """Scrape Handshake with the logged-in profile, `CONCURRENCY` detail pages at a time.
+
+    `extract_mode` defaults to `HANDSHAKE_EXTRACT_MODE`.
+    """
+    if pool is None:
+        async with BrowserPool(concurrency=CONCURRENCY, headless=False, user_data_dir=USER_DATA_DIR) as pool:
+            return await scrape_handshake_jobs(pool, extract_mode)
+
+    extract_mode = extract_mode or extract_mode_from_env("handshake")
+    policy = block_policy_from_env("handshake")
+    job_refs = []
+    async with pool.page(policy) as page:
         await page.goto(BASE_URL, timeout=60000)
 
         # Confirm login
         if "login" in page.url.lower():
             print("⚠️ Not logged in. Please log in manually with this profile.")
-            await browser.close()
             return []
 
         for page_number in range(START_PAGE, END_PAGE + 1):
-            search_url = SEARCH_URL_TEMPLATE.format(page_number)
-            print(f"\n🔄 Scraping search results page {page_number}: {search_url}")
-
-            try:
-                await page.goto(search_url, timeout=60000)
-                await page.wait_for_selector(JOB_CONTAINER_SELECTOR, timeout=30000)
-            except Exception as e:
-                print(f"❌ Failed to load page {page_number}: {e}")
-                continue
-
-            job_cards = await page.query_selector_all(JOB_CONTAINER_SELECTOR)
-            print(f"➡️ Found {len(job_cards)} job cards on page {page_number}")
-
-            for card in job_cards:
-                try:
-                    data_hook = await card.get_attribute("data-hook")
-                    match = re.search(r'job-result-card\s*\|\s*(\d+)', data_hook or "")
-                    if not match:
-                        continue
-
-                    job_id = match.group(1).strip()
-                    job_detail_url = f"{BASE_URL}/job-search/{job_id}?per_page=5&sort=posted_date_desc&page={page_number}"
-
-                    job_page = await browser.new_page()
-                    try:
-                        await job_page.goto(job_detail_url, timeout=60000)
-                        print(f"🔍 Scraping job details for ID {job_id} at {job_detail_url}")
-                        await job_page.wait_for_selector(JOB_CONTAINER_SELECTOR, timeout=30000)
-                        job_detail_cards = await job_page.query_selector_all(JOB_CONTAINER_SELECTOR)
-
-                        for detail_card in job_detail_cards:
-                            company_elem = await detail_card.query_selector("div.sc-iTFTee.kqrVpX span.sc-jrcTuL.ifJtBF")
-                            title_elem = await detail_card.query_selector("div.sc-hLBbgP.dpzvOf")
-                            location_elem = await detail_card.query_selector("span.sc-hywjFt.eqqBly")
-                            date_elem = await detail_card.query_selector("span.sc-qyDQW.ZEwse")
-                            link_elem = await detail_card.query_selector("a[href*='/jobs/']")
-
-                            job_url = BASE_URL + (await link_elem.get_attribute("href") or "") if link_elem else ""
-                            search_id_match = re.search(r'searchId=([a-f0-9\-]+)', job_url)
-                            print(f"🔗 Job URL: {search_id_match}")
-                            search_uuid = search_id_match.group(1) if search_id_match else ""
-
-                            job_data = {
-                                "company": (await company_elem.inner_text()).strip() if company_elem else "",
-                                "title": (await title_elem.inner_text()).strip() if title_elem else "",
-                                "location": (await location_elem.inner_text()).strip() if location_elem else "",
-                                "date_posted": (await date_elem.inner_text()).strip() if date_elem else "",
-                                "job_url": job_detail_url,
-                                "search_uuid": search_uuid,
-                                "job_id": job_id
-                            }
-
-                            # 🔍 Visit job detail page for description
-                            if job_detail_url:
-                                desc_page = await browser.new_page()
-                                try:
-                                    await desc_page.goto(job_detail_url, timeout=60000)
-                                    print(f"🔍 Loading job description for {job_detail_url}")
-                                    # try:
-                                    #     view_more_btn = await desc_page.query_selector("button.view-more-button")
-                                    #     if view_more_btn:
-                                    #         await view_more_btn.click()
-                                    #         await desc_page.wait_for_timeout(500)
-                                    # except:
-                                    #     pass
-
-                                    await desc_page.wait_for_selector("div.sc-hpHAyN.gFYNTb", timeout=30000)
-                                    desc_elem = await desc_page.query_selector("div.sc-hpHAyN.gFYNTb")
-                                    job_data["description"] = (await desc_elem.text_content()).strip() if desc_elem else ""
-                                except Exception as e:
-                                    print(f"❌ Failed to load job description for {search_id_match}: {e}")
-                                    job_data["description"] = ""
-                                finally:
-                                    await desc_page.close()
-
-                            all_jobs.append(job_data)
-
-                    except Exception as e:
-                        print(f"⚠️ Failed to scrape job detail for ID {job_id}: {e}")
-                    finally:
-                        await job_page.close()
-
-                except Exception as e:
-                    print(f"⚠️ Error processing job card: {e}")
-                    continue
-
-        await browser.close()
-        return all_jobs
+            job_refs.extend(await _collect_job_ids(page, page_number))
+
+    all_jobs = []
+    async def visit(job_page, job_ref):
+        return await _scrape_job_detail(job_page, job_ref, extract_mode)
+
+    for jobs in await pool.map(visit, job_refs, policy):
+        if not isinstance(jobs, Exception):
+            all_jobs.extend(jobs)
+    return all_jobs
 
 if __name__ == "__main__":
     scraped_jobs = asyncio.run(scrape_handshake_jobs())
@@ -1,83 +1,128 @@
 # motion_scraper.py
 
-import os, json, asyncio
-from playwright.async_api import async_playwright
-from pymongo import MongoClient
+import json, asyncio
+
+from backend.jobs_scraper.browser_pool import BrowserPool, block_policy_from_env, extract_mode_from_env, shared_pool
+from backend.utils.job_ingest import upsert_jobs
 
 BASE_URL = "https://motionrecruitment.com"
 SEARCH_URL = f"{BASE_URL}/tech-jobs"
-
-
-async def scrape_motion_jobs():
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+JOB_ITEM_SELECTOR = "li.JobItem_module_jobItem"
+
+# All card fields in one round-trip (evaluate mode).
+CARDS_JS = """
+(items, baseUrl) => items.map((item) => {
+    const text = (sel) => { const el = item.querySelector(sel); return el ? el.innerText : "N/A"; };
+    const link = item.querySelector("a");
+    const details = item.querySelectorAll("p.JobDetailsItem_module_jobDetailsText");
+    return {
+        title: text("h2.JobItem_module_title"),
+        url: baseUrl + (link ? link.getAttribute("href") || "" : "#"),
+        location: text("div.JobItem_module_jobDetailsSection > p"),
+        workplace: text("div.JobItem_module_jobDetailsWrapper > b"),
+        job_type: details.length > 0 ? details[0].innerText : "N/A",
+        salary: details.length > 1 ? details[1].innerText : "N/A",
+    };
+})
+"""
+
+DETAIL_JS = """
+() => {
+    const text = (sel) => { const el = document.querySelector(sel); return el ? el.innerText : "N/A"; };
+    return {description: text("div.JobView_module_jobDescription"), author: text("p.JobView_module_author")};
+}
+"""
+
+
+async def _scrape_job_card(job_element):
+    title_el = await job_element.query_selector("h2.JobItem_module_title")
+    title = await title_el.inner_text() if title_el else "N/A"
+
+    link_el = await job_element.query_selector("a")
+    relative_url = await link_el.get_attribute("href") if link_el else "#"
+    job_url = BASE_URL + (relative_url or "")
+
+    location_el = await job_element.query_selector("div.JobItem_module_jobDetailsSection > p")
+    location = await location_el.inner_text() if location_el else "N/A"
+
+    wrapper_el = await job_element.query_selector("div.JobItem_module_jobDetailsWrapper > b")
+    workplace = await wrapper_el.inner_text() if wrapper_el else "N/A"
+
+    job_type_els = await job_element.query_selector_all("p.JobDetailsItem_module_jobDetailsText")
+    job_type = await job_type_els[0].inner_text() if len(job_type_els) > 0 else "N/A"
+    salary = await job_type_els[1].inner_text() if len(job_type_els) > 1 else "N/A"
+
+    return {
+        "title": title,
+        "url": job_url,
+        "location": location,
+        "workplace": workplace,
+        "job_type": job_type,
+        "salary": salary,
+    }
+
+
+async def _scrape_cards(page, extract_mode):
+    if extract_mode == "evaluate":
+        return await page.eval_on_selector_all(JOB_ITEM_SELECTOR, CARDS_JS, BASE_URL)
+    job_elements = await page.query_selector_all(JOB_ITEM_SELECTOR)
+    return [await _scrape_job_card(job_element) for job_element in job_elements]
+
+
+async def _scrape_job_detail(job_page, job, extract_mode="selectors"):
+    await job_page.goto(job["url"], timeout=60_000)
+
+    try:
+        await job_page.wait_for_selector("div.JobView_module_jobDescription", timeout=10_000)
+        if extract_mode == "evaluate":
+            return {**job, **await job_page.evaluate(DETAIL_JS)}
+        job_desc_el = await job_page.query_selector("div.JobView_module_jobDescription")
+        job_description = await job_desc_el.inner_text() if job_desc_el else "N/A"
+
+        author_el = await job_page.query_selector("p.JobView_module_author")
+        author = await author_el.inner_text() if author_el else "N/A"
+    except Exception:
+        job_description = "N/A"
+        author = "N/A"
+
+    return {**job, "description": job_description, "author": author}
+
+
+async def scrape_motion_jobs(pool=None, extract_mode=None):
+    """Scrape the Motion listing, then fetch detail pages in parallel through `pool`.
+
+    Uses the shared warm browser pool unless a `BrowserPool` is passed in;
+    `extract_mode` defaults to `MOTION_EXTRACT_MODE`.
+    """
+    pool = pool or await shared_pool()
+    extract_mode = extract_mode or extract_mode_from_env("motion")
+    policy = block_policy_from_env("motion")
+
+    async with pool.page(policy) as page:
         await page.goto(SEARCH_URL, timeout=120_000)
 
         await page.wait_for_selector("ul.JobsList_module_list")
-        job_elements = await page.query_selector_all("li.JobItem_module_jobItem")
-
-        jobs = []
-
-        for job_element in job_elements:
-            title_el = await job_element.query_selector("h2.JobItem_module_title")
-            title = await title_el.inner_text() if title_el else "N/A"
-
-            link_el = await job_element.query_selector("a")
-            relative_url = await link_el.get_attribute("href") if link_el else "#"
-            job_url = BASE_URL + (relative_url or "")
-
-            location_el = await job_element.query_selector("div.JobItem_module_jobDetailsSection > p")
-            location = await location_el.inner_text() if location_el else "N/A"
-
-            wrapper_el = await job_element.query_selector("div.JobItem_module_jobDetailsWrapper > b")
-            workplace = await wrapper_el.inner_text() if wrapper_el else "N/A"
+        cards = await _scrape_cards(page, extract_mode)
 
-            job_type_els = await job_element.query_selector_all("p.JobDetailsItem_module_jobDetailsText")
-            job_type = await job_type_els[0].inner_text() if len(job_type_els) > 0 else "N/A"
-            salary = await job_type_els[1].inner_text() if len(job_type_els) > 1 else "N/A"
+    # Visit job detail pages, N at a time
+    async def visit(job_page, job):
+        return await _scrape_job_detail(job_page, job, extract_mode)
 
-            # Visit job detail page
-            job_page = await browser.new_page()
-            await job_page.goto(job_url, timeout=60_000)
-
-            try:
-                await job_page.wait_for_selector("div.JobView_module_jobDescription", timeout=10_000)
-                job_desc_el = await job_page.query_selector("div.JobView_module_jobDescription")
-                job_description = await job_desc_el.inner_text() if job_desc_el else "N/A"
-
-                author_el = await job_page.query_selector("p.JobView_module_author")
-                author = await author_el.inner_text() if author_el else "N/A"
-            except:
-                job_description = "N/A"
-                author = "N/A"
-
-            await job_page.close()
-
-            jobs.append({
-                "title": title,
-                "url": job_url,
-                "location": location,
-                "workplace": workplace,
-                "job_type": job_type,
-                "salary": salary,
-                "description": job_description,
-                "author": author
-            })
-
-        await browser.close()
-        return jobs
+    details = await pool.map(visit, cards, policy)
+    return [
+        detail if not isinstance(detail, Exception) else {**card, "description": "N/A", "author": "N/A"}
+        for card, detail in zip(cards, details)
+    ]
 
 
 def store_in_mongodb(jobs: list, collection_name="motion_jobs"):
     if not jobs:
-        return
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
 
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-    client: MongoClient = MongoClient(mongo_uri, serverSelectionTimeoutMS=3000)
-    db = client["job_data"]
-    db[collection_name].insert_many(jobs)
-    print(f"✅ Stored {len(jobs)} jobs in MongoDB collection '{collection_name}'.")
+    counts = upsert_jobs(jobs, collection_name)
+    print(f"✅ Stored jobs in MongoDB collection '{collection_name}': "
+          f"{counts['inserted']} new, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+    return counts
 
 
 def save_to_json(jobs: list, filename="motion_jobs.json"):
@@ -86,8 +131,13 @@ def save_to_json(jobs: list, filename="motion_jobs.json"):
     print(f"✅ Saved {len(jobs)} jobs to {filename}")
 
 
+async def _main():
+    async with BrowserPool() as pool:
+        return await scrape_motion_jobs(pool)
+
+
 if __name__ == "__main__":
-    scraped_jobs = asyncio.run(scrape_motion_jobs())
+    scraped_jobs = asyncio.run(_main())
     for job in scraped_jobs:
         print("=" * 80)
         for key, value in job.items():
@@ -0,0 +1,127 @@
+import importlib
+import os
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import binary_index, model_registry  # noqa: E402
+from backend.utils.resume_chunks import chunk_hash, make_chunks, plan_ingest  # noqa: E402
+from backend.utils.vector_scoring import nearest_scores  # noqa: E402
+
+
+def test_write_and_mmap_load(tmp_path):
+    user_dir = str(tmp_path / "a@x.com")
+    assert binary_index.write_binary_index(user_dir, ["python", "sql"], [[1, 0], [0, 1]]) == 2
+    assert binary_index.has_binary_index(user_dir)
+
+    vectors = binary_index.load_vectors(user_dir)
+    assert isinstance(vectors, np.memmap)
+    assert vectors.tolist() == [[1.0, 0.0], [0.0, 1.0]]
+    assert binary_index.load_texts(user_dir) == ["python", "sql"]
+    assert nearest_scores(np.array([[1, 0.1]]), vectors)[0] == pytest.approx(0.01)
+
+
+def test_incremental_update_appends_a_segment(tmp_path, monkeypatch):
+    user_dir = str(tmp_path / "a@x.com")
+    binary_index.write_binary_index(user_dir, ["python", "sql", "python"], [[1, 0], [0, 1], [1, 0]])
+    assert binary_index.load_texts(user_dir) == ["python", "sql"]
+
+    binary_index.update_binary_index(user_dir, make_chunks("cover_letter", ["letter"]), [[1, 1]])
+    plan = plan_ingest(binary_index.stored_chunks(user_dir), "resume", ["python", "rust"])
+    assert [chunk.text for chunk in plan.add] == ["rust"] and len(plan.delete) == 1
+    binary_index.update_binary_index(user_dir, plan.add, [[0.5, 0.5]], delete=plan.delete)
+
+    assert binary_index.load_texts(user_dir) == ["python", "letter", "rust"]
+    assert binary_index.load_vectors(user_dir).tolist() == [[1, 0], [1, 1], [0.5, 0.5]]
+    assert len([name for name in os.listdir(user_dir) if name.endswith(".npy")]) == 3
+
+    # Past BINARY_MAX_SEGMENTS the live vectors are compacted into one mapped segment.
+    monkeypatch.setenv("BINARY_MAX_SEGMENTS", "1")
+    binary_index.update_binary_index(user_dir, make_chunks("notes", ["go"]), [[2, 2]])
+    assert [name for name in os.listdir(user_dir) if name.endswith(".npy")] == ["vectors-000005.npy"]
+    vectors = binary_index.load_vectors(user_dir)
+    assert isinstance(vectors, np.memmap)
+    assert vectors.tolist() == [[1, 0], [1, 1], [0.5, 0.5], [2, 2]]
+    with pytest.raises(ValueError):
+        binary_index.update_binary_index(user_dir, make_chunks("notes", ["c"]), [[1, 1, 1]])
+
+
+def test_plan_ingest():
+    existing = [(1, None, chunk_hash("a")), (2, "resume", chunk_hash("b")), (3, "letter", chunk_hash("a"))]
+    plan = plan_ingest(existing, "resume", ["a", "c", "c"])
+    assert [chunk.text for chunk in plan.add] == ["c"]
+    assert plan.delete == [2] and plan.kept == 2
+    assert plan_ingest(existing, "resume", ["a", "b"]) == ([], [], 3)
+
+
+def test_missing_directory_is_not_an_index(tmp_path):
+    assert not binary_index.ensure_binary_index(str(tmp_path / "nobody"))
+
+
+class SlowEmbedder:
+    def get_text_embedding_batch(self, texts):
+        time.sleep(0.2)  # keep both ingests inside the embed step at once
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def candidate_embedder(tmp_path, monkeypatch):
+    pymongo_mod = types.ModuleType("pymongo")
+    pymongo_mod.MongoClient = object
+    gridfs_mod = types.ModuleType("gridfs")
+    gridfs_mod.GridFS = object
+    monkeypatch.setitem(sys.modules, "pymongo", pymongo_mod)
+    monkeypatch.setitem(sys.modules, "gridfs", gridfs_mod)
+    importlib.reload(importlib.import_module("backend.utils.mongo"))
+    embedder = importlib.reload(importlib.import_module("backend.utils.candidate_embedder"))
+    spec = model_registry.embedding_spec()
+    monkeypatch.setitem(model_registry.registry._factories, spec.kind, lambda spec: SlowEmbedder())
+    monkeypatch.setattr(embedder, "split_chunks", lambda text: text.split("\n\n"))
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "binary")
+    monkeypatch.chdir(tmp_path)
+    yield embedder
+    model_registry.registry.unload(spec, force=True)
+
+
+def test_concurrent_ingests_of_one_document_are_serialized(candidate_embedder):
+    candidate_embedder.embed_candidate("a@x.com", "Dear hiring manager.", document_id="cover_letter")
+    text = "Python developer.\n\nTen years of SQL."
+    with ThreadPoolExecutor(2) as pool:
+        counts = list(pool.map(lambda _: candidate_embedder.embed_candidate("a@x.com", text), range(2)))
+    assert counts[0] == counts[1] == 3 == len(binary_index.load_texts(os.path.join("faiss_index", "a@x.com")))
+
+
+def test_per_user_versions_are_swapped_atomically(candidate_embedder):
+    from backend.utils.vectorstore import delete_user_vectors, swap_user_dir
+
+    user_dir = os.path.join("faiss_index", "a@x.com")
+    os.makedirs(user_dir)
+    with open(os.path.join(user_dir, "index.faiss"), "w") as f:
+        f.write("legacy")
+
+    def persist(text):
+        new_dir = os.path.join("faiss_index", ".versions", "a@x.com", text)
+        os.makedirs(new_dir)
+        with open(os.path.join(new_dir, "index.faiss"), "w") as f:
+            f.write(text)
+        swap_user_dir(new_dir, user_dir)
+
+    for text in ("v1", "v2", "v3"):
+        persist(text)
+        assert os.path.islink(user_dir)
+        with open(os.path.join(user_dir, "index.faiss")) as f:
+            assert f.read() == text
+    # The current and the previous version are kept.
+    assert sorted(os.listdir(os.path.join("faiss_index", ".versions", "a@x.com"))) == ["v2", "v3"]
+    assert [name for name in os.listdir("faiss_index") if not name.startswith(".")] == ["a@x.com"]
+
+    assert delete_user_vectors("a@x.com") is True
+    assert not os.path.lexists(user_dir)
+    assert not os.path.exists(os.path.join("faiss_index", ".versions", "a@x.com"))
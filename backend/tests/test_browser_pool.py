@@ -0,0 +1,226 @@
+import asyncio
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+        self.handlers = {}
+        self.route_handler = None
+
+    def is_closed(self):
+        return self.closed
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def route(self, pattern, handler):
+        self.route_handler = handler
+
+    async def request(self, resource_type, url, size=100):
+        """Simulate the browser issuing a request; returns True if it was sent."""
+        route = FakeRoute(resource_type, url)
+        if self.route_handler is not None:
+            await self.route_handler(route)
+            if route.aborted:
+                return False
+        await self.handlers["requestfinished"](FakeRequest(resource_type, url, size))
+        return True
+
+
+class FakeRequest:
+    def __init__(self, resource_type, url, size=0):
+        self.resource_type = resource_type
+        self.url = url
+        self.size = size
+
+    async def sizes(self):
+        return {"responseBodySize": self.size, "responseHeadersSize": 10}
+
+
+class FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = FakeRequest(resource_type, url)
+        self.aborted = False
+
+    async def abort(self):
+        self.aborted = True
+
+    async def continue_(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+        self.closed = False
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    async def new_context(self):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browser = FakeBrowser()
+        self.chromium = types.SimpleNamespace(launch=self.launch)
+        self.stopped = False
+
+    async def launch(self, headless=True, slow_mo=0):
+        return self.browser
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def browser_pool(monkeypatch):
+    playwright_mod = types.ModuleType("playwright")
+    async_api = types.ModuleType("playwright.async_api")
+    async_api.async_playwright = FakePlaywright
+    monkeypatch.setitem(sys.modules, "playwright", playwright_mod)
+    monkeypatch.setitem(sys.modules, "playwright.async_api", async_api)
+    return importlib.reload(importlib.import_module("backend.jobs_scraper.browser_pool"))
+
+
+def test_map_bounds_concurrency_and_reuses_pages(browser_pool):
+    pool = browser_pool.BrowserPool(concurrency=3, max_contexts=2)
+    active = 0
+    peak = 0
+    seen_pages = set()
+
+    async def visit(page, item):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        seen_pages.add(id(page))
+        await asyncio.sleep(0)
+        active -= 1
+        if item == 4:
+            raise RuntimeError("detail page failed")
+        return item * 10
+
+    async def main():
+        async with pool:
+            results = await pool.map(visit, range(10))
+            browser = pool._browser
+        return results, browser
+
+    results, browser = asyncio.run(main())
+
+    assert peak == 3
+    assert len(seen_pages) == 3
+    assert len(browser.contexts) == 2  # pages spread over contexts
+    assert isinstance(results[4], RuntimeError)
+    assert [r for i, r in enumerate(results) if i != 4] == [i * 10 for i in range(10) if i != 4]
+    assert browser.closed and all(context.closed for context in browser.contexts)
+
+
+def test_concurrent_pages_share_the_contexts(browser_pool):
+    pool = browser_pool.BrowserPool(concurrency=4, max_contexts=2)
+
+    async def main():
+        async with pool:
+            browser = pool._browser
+            new_context = browser.new_context
+
+            async def slow_new_context():
+                await asyncio.sleep(0.01)  # lets the other callers in
+                return await new_context()
+
+            browser.new_context = slow_new_context
+            await pool.map(lambda page, item: asyncio.sleep(0.01), range(4))
+        return browser
+
+    browser = asyncio.run(main())
+    assert len(browser.contexts) == 2
+    assert sorted(len(context.pages) for context in browser.contexts) == [2, 2]
+
+
+def test_closed_page_is_replaced(browser_pool):
+    pool = browser_pool.BrowserPool(concurrency=1, max_contexts=1)
+
+    async def main():
+        async with pool:
+            async with pool.page() as first:
+                first.closed = True
+            async with pool.page() as second:
+                pass
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first is not second
+
+
+def test_block_policy_matches_types_and_tracker_subdomains(browser_pool):
+    policy = browser_pool.BlockPolicy(resource_types=("image",), domains=("doubleclick.net",))
+    assert policy.blocks("image", "https://example.com/logo.png")
+    assert policy.blocks("script", "https://stats.g.doubleclick.net/x.js")
+    assert not policy.blocks("document", "https://example.com/job/1")
+    assert not policy.blocks("script", "https://notdoubleclick.net/x.js")
+
+
+def test_page_policy_blocks_requests_and_counts_bytes(browser_pool):
+    pool = browser_pool.BrowserPool(concurrency=1, max_contexts=1)
+
+    async def main():
+        async with pool:
+            async with pool.page(browser_pool.DEFAULT_BLOCK_POLICY) as page:
+                assert await page.request("document", "https://motionrecruitment.com/tech-jobs", size=500)
+                assert not await page.request("image", "https://motionrecruitment.com/logo.png")
+                assert not await page.request("script", "https://www.googletagmanager.com/gtm.js")
+            # The same page borrowed without a policy loads everything again.
+            async with pool.page() as page:
+                assert await page.request("image", "https://motionrecruitment.com/logo.png", size=1000)
+            return pool.stats()
+
+    stats = asyncio.run(main())
+    assert stats["pages"] == 2
+    assert stats["requests"] == 2
+    assert stats["blocked"] == 2
+    assert stats["bytes"] == 500 + 10 + 1000 + 10
+    assert stats["avg_seconds"] >= 0
+
+
+def test_per_site_settings_from_env(browser_pool, monkeypatch):
+    assert browser_pool.block_policy_from_env("motion") == browser_pool.DEFAULT_BLOCK_POLICY
+    monkeypatch.setenv("MOTION_BLOCK_TYPES", "image, stylesheet")
+    assert browser_pool.block_policy_from_env("motion").resource_types == ("image", "stylesheet")
+    monkeypatch.setenv("GLASSDOOR_BLOCK_RESOURCES", "false")
+    assert browser_pool.block_policy_from_env("glassdoor") is None
+
+    assert browser_pool.extract_mode_from_env("motion") == "evaluate"
+    monkeypatch.setenv("HANDSHAKE_EXTRACT_MODE", "selectors")
+    assert browser_pool.extract_mode_from_env("handshake") == "selectors"
+    monkeypatch.setenv("HANDSHAKE_EXTRACT_MODE", "xpath")
+    with pytest.raises(ValueError):
+        browser_pool.extract_mode_from_env("handshake")
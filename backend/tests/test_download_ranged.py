@@ -0,0 +1,179 @@
+import hashlib
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import download
+
+DATA = bytes(range(256)) * 4096  # 1 MiB
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class ModelServer:
+    """Local stand-in for the model host: Range support, dropped connections."""
+
+    def __init__(self, ranges=True, drop=0):
+        self.ranges = ranges
+        self.drop = drop  # number of ranged responses cut off half way
+        self.requests = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                header = self.headers.get("Range")
+                with server.lock:
+                    server.requests.append(header)
+                    cut = bool(header and server.ranges and server.drop > 0 and header != "bytes=0-")
+                    if cut:
+                        server.drop -= 1
+                if header and server.ranges:
+                    first, _, last = header[len("bytes="):].partition("-")
+                    start, end = int(first), int(last) if last else len(DATA) - 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+                else:
+                    start, end = 0, len(DATA) - 1
+                    self.send_response(200)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                body = DATA[start:end + 1]
+                if cut:
+                    body = body[: len(body) // 2]
+                    self.close_connection = True
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/model.gguf"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setenv("DOWNLOAD_MIN_SEGMENT_BYTES", str(128 * 1024))
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_parallel_ranged_download(tmp_path, small_segments):
+    server = ModelServer()
+    dest = str(tmp_path / "model.gguf")
+    try:
+        download.download_model(server.url, dest, model_sha256=SHA256, segments=4, backoff_factor=0)
+    finally:
+        server.close()
+    assert _read(dest) == DATA
+    # The probe plus one request per segment.
+    assert sorted(server.requests[1:]) == sorted(
+        f"bytes={start}-{start + 262143}" for start in range(0, len(DATA), 262144)
+    )
+    assert not os.path.exists(download.part_path(dest))
+    assert download.verify_file(dest, SHA256)
+
+
+def test_dropped_connections_resume_mid_segment(tmp_path, small_segments):
+    server = ModelServer(drop=2)
+    dest = str(tmp_path / "model.gguf")
+    try:
+        download.download_model(server.url, dest, model_sha256=SHA256, segments=4, backoff_factor=0)
+    finally:
+        server.close()
+    assert _read(dest) == DATA
+    segment_starts = {f"bytes={start}-" for start in range(0, len(DATA), 262144)}
+    resumed = [r for r in server.requests[1:] if not any(r.startswith(s) for s in segment_starts)]
+    assert len(resumed) == 2
+
+
+def test_partial_download_is_resumed_by_the_next_call(tmp_path, small_segments):
+    dest = str(tmp_path / "model.gguf")
+    server = ModelServer(drop=100)
+    try:
+        with pytest.raises(RuntimeError):
+            download.download_model(server.url, dest, segments=4, total_retries=0, backoff_factor=0)
+        assert os.path.exists(download.part_path(dest)) and not os.path.exists(dest)
+
+        server.drop = 0
+        first_call = len(server.requests)
+        download.download_model(server.url, dest, model_sha256=SHA256, segments=4, backoff_factor=0)
+    finally:
+        server.close()
+    assert _read(dest) == DATA
+    # Only the bytes missing from the first attempt were requested again
+    # (counted from the requests: handlers of the first call may still be
+    # finishing their writes).
+    ranges = [r[len("bytes="):].split("-") for r in server.requests[first_call + 1:]]
+    assert 0 < sum(int(last) - int(first) + 1 for first, last in ranges) < len(DATA)
+
+
+def test_server_without_range_support(tmp_path):
+    server = ModelServer(ranges=False)
+    dest = str(tmp_path / "model.gguf")
+    try:
+        download.download_model(server.url, dest, model_sha256=SHA256)
+    finally:
+        server.close()
+    assert _read(dest) == DATA
+    assert server.requests == ["bytes=0-"]
+
+
+def test_verified_model_is_not_downloaded_or_hashed_again(tmp_path, monkeypatch):
+    server = ModelServer()
+    dest = str(tmp_path / "model.gguf")
+    try:
+        download.download_model(server.url, dest, model_sha256=SHA256)
+        requests_made = len(server.requests)
+
+        def no_hashing(path):
+            raise AssertionError("re-hashed a verified model")
+
+        monkeypatch.setattr(download, "_hash_file", no_hashing)
+        download.download_model(server.url, dest, model_sha256=SHA256)
+        assert len(server.requests) == requests_made
+    finally:
+        server.close()
+
+    # A modified file is hashed again and fails verification.
+    monkeypatch.undo()
+    with open(dest, "r+b") as f:
+        f.write(b"x")
+    assert not download.verify_file(dest, SHA256)
+
+
+def test_concurrent_callers_download_once(tmp_path, small_segments):
+    server = ModelServer()
+    dest = str(tmp_path / "model.gguf")
+    try:
+        threads = [
+            threading.Thread(target=download.download_model, args=(server.url, dest), kwargs={"model_sha256": SHA256})
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+    finally:
+        server.close()
+    assert _read(dest) == DATA
+    # One probe: the callers that waited for the lock found the verified file.
+    assert server.requests.count("bytes=0-") == 1
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import embedding_cache
+from backend.utils.embedding_cache import EmbeddingCache, embed_job_texts, text_hash
+from backend.utils.model_registry import ModelSpec, registry
+
+
+class CountingEmbedding:
+    def __init__(self):
+        self.calls = []
+
+    def get_text_embedding(self, text):
+        return self.get_query_embedding(text)
+
+    def get_query_embedding(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 1.0, 0.0]
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=3)
+    hashes = [text_hash("a"), text_hash("b")]
+    assert cache.put(hashes, np.array([[1, 2, 3], [4, 5, 6]])) == 2
+    assert cache.put([hashes[1]], np.array([[9, 9, 9]])) == 0  # already cached
+
+    rows = cache.lookup(hashes + [text_hash("missing")])
+    assert set(rows) == set(hashes)
+    assert cache.get([rows[hashes[1]], rows[hashes[0]]]).tolist() == [[4, 5, 6], [1, 2, 3]]
+
+    # A fresh instance (another process) sees the persisted rows.
+    reopened = EmbeddingCache(str(tmp_path), dimension=3)
+    assert len(reopened) == 2
+    assert reopened.get([rows[hashes[0]]]).tolist() == [[1, 2, 3]]
+
+
+def test_torn_append_is_discarded(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=3)
+    cache.put([text_hash("a")], np.array([[1, 2, 3]]))
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\x00" * 5)
+    cache.put([text_hash("b")], np.array([[4, 5, 6]]))
+    assert cache.get([cache.lookup([text_hash("b")])[text_hash("b")]]).tolist() == [[4, 5, 6]]
+
+
+def test_embed_job_texts_only_embeds_misses(tmp_path, monkeypatch):
+    model = CountingEmbedding()
+    registry.register_factory("counting", lambda spec: model)
+    monkeypatch.setenv("EMBED_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(embedding_cache, "embedding_dimension", lambda spec, embed_model=None: 3)
+    spec = ModelSpec.create("counting", "tiny")
+    try:
+        first = embed_job_texts(["Data Engineer", "ML  Engineer"], spec=spec)
+        second = embed_job_texts(["ML Engineer", "Data Engineer", "QA Engineer"], spec=spec)
+    finally:
+        registry.unload(spec, force=True)
+
+    assert model.calls == ["Data Engineer", "ML  Engineer", "QA Engineer"]
+    assert first.shape == (2, 3)
+    # Whitespace-normalized text hits the cached vector
+    assert second[0].tolist() == first[1].tolist()
+    assert second[1].tolist() == first[0].tolist()
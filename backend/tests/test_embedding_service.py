@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import embedding_service
+from backend.utils.model_registry import ModelSpec, embedding_spec, ingest_embed_spec, matcher_embed_spec, registry
+
+
+class DummyEmbedding:
+    def get_text_embedding(self, text):
+        return [0.0] * 5
+
+
+@pytest.fixture
+def dummy_backend(monkeypatch):
+    registry.register_factory("dummy", lambda spec: DummyEmbedding())
+    monkeypatch.setenv("EMBED_BACKEND", "dummy")
+    monkeypatch.setenv("EMBED_MODEL", "tiny-model")
+    yield
+    registry.unload(ModelSpec.create("dummy", "tiny-model"), force=True)
+
+
+def test_ingest_and_matching_share_one_model(monkeypatch):
+    monkeypatch.delenv("EMBED_BACKEND", raising=False)
+    monkeypatch.delenv("EMBED_MODEL", raising=False)
+    monkeypatch.delenv("MATCH_EMBED_MODEL", raising=False)
+    assert ingest_embed_spec() == matcher_embed_spec() == embedding_spec()
+    assert embedding_spec().kind == "fastembed"
+
+
+def test_fingerprint_round_trip_and_mismatch(tmp_path, dummy_backend, monkeypatch):
+    user_dir = str(tmp_path)
+    assert not embedding_service.fingerprint_matches(user_dir)
+
+    embedding_service.write_fingerprint(user_dir)
+    stored = json.loads((tmp_path / embedding_service.FINGERPRINT_FILE).read_text())
+    assert stored == {"backend": "dummy", "model": "tiny-model", "params": {}, "dimension": 5}
+    assert embedding_service.fingerprint_matches(user_dir)
+
+    monkeypatch.setenv("EMBED_MODEL", "BAAI/bge-base-en-v1.5")
+    assert not embedding_service.fingerprint_matches(user_dir)
+
+
+def test_ensure_index_current_reembeds_once(tmp_path, dummy_backend, monkeypatch):
+    user_dir = str(tmp_path)
+    calls = []
+
+    def fake_reembed(path, spec):
+        calls.append((path, spec.name))
+        embedding_service.write_fingerprint(path, spec)
+
+    monkeypatch.setattr(embedding_service, "reembed_index", fake_reembed)
+
+    assert embedding_service.ensure_index_current(user_dir) is True
+    assert embedding_service.ensure_index_current(user_dir) is False
+    assert calls == [(user_dir, "tiny-model")]
+
+
+def test_reembedding_holds_the_users_ingest_lock(tmp_path, dummy_backend, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    user_dir = str(tmp_path / "faiss_index" / "a@x.com")
+    os.makedirs(user_dir)
+    lock_path = tmp_path / "faiss_index" / ".versions" / "a@x.com" / "ingest.lock"
+
+    def fake_reembed(path, spec):
+        # Another process (another open file description) cannot take it.
+        with open(lock_path, "a") as other:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        embedding_service.write_fingerprint(path, spec)
+
+    monkeypatch.setattr(embedding_service, "reembed_index", fake_reembed)
+    assert embedding_service.ensure_index_current(user_dir) is True
+
+
+def test_ensure_index_current_can_refuse_stale_index(tmp_path, dummy_backend, monkeypatch):
+    monkeypatch.setenv("EMBED_REEMBED_ON_MISMATCH", "false")
+    with pytest.raises(RuntimeError):
+        embedding_service.ensure_index_current(str(tmp_path))
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.executor import (
+    PoolSaturatedError,
+    WorkloadPool,
+    get_pool,
+    iterate_in_pool,
+    shutdown_pools,
+    submit_to_pool,
+)
+
+
+def test_calls_run_off_the_event_loop_thread():
+    pool = WorkloadPool("test", workers=2, queue=2)
+
+    async def main():
+        return await pool.run(threading.get_ident)
+
+    try:
+        worker_thread = asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert worker_thread != threading.get_ident()
+    assert pool.stats()["completed"] == 1
+
+
+def test_rejects_when_workers_and_queue_are_full():
+    pool = WorkloadPool("test", workers=1, queue=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(pool.run(release.wait))
+        second = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        stats = pool.stats()
+        assert stats["active"] == 1
+        assert stats["queued"] == 1
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(release.wait)
+
+        release.set()
+        await asyncio.gather(first, second)
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_failures_are_counted_and_propagated():
+    pool = WorkloadPool("test", workers=1, queue=0)
+
+    def boom():
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(boom))
+    finally:
+        pool.shutdown()
+    assert pool.stats()["failed"] == 1
+
+
+def test_iterate_in_pool_drives_blocking_iterator(monkeypatch):
+    monkeypatch.setenv("POOL_IO_WORKERS", "1")
+
+    async def main():
+        return [item async for item in iterate_in_pool("io", iter([1, 2, 3]))]
+
+    try:
+        assert asyncio.run(main()) == [1, 2, 3]
+        assert get_pool("io").stats()["completed"] == 4
+    finally:
+        shutdown_pools()
+
+
+def test_cancelled_callers_keep_the_slot_until_the_call_ends():
+    pool = WorkloadPool("test", workers=1, queue=0)
+    release = threading.Event()
+
+    async def main():
+        task = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        # The worker thread is still blocked, so the pool is still full.
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.sleep(0.05)
+        assert await pool.run(lambda: 1) == 1
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["completed"] == 2
+
+
+def test_inference_pool_has_a_worker_per_scheduler_slot(monkeypatch):
+    shutdown_pools()
+    monkeypatch.delenv("POOL_INFERENCE_WORKERS", raising=False)
+    monkeypatch.delenv("INFERENCE_SLOTS", raising=False)
+    monkeypatch.setenv("INFERENCE_SERVER_URL", "http://127.0.0.1:8080")
+    try:
+        assert get_pool("inference").workers == 4
+        shutdown_pools()
+        monkeypatch.setenv("INFERENCE_SLOTS", "6")
+        assert get_pool("inference").workers == 6
+    finally:
+        shutdown_pools()
+
+
+def test_submit_to_pool_rejects_before_returning_when_full(monkeypatch):
+    shutdown_pools()
+    monkeypatch.setenv("POOL_IO_WORKERS", "1")
+    monkeypatch.setenv("POOL_IO_QUEUE", "0")
+    release = threading.Event()
+    try:
+        running = submit_to_pool("io", release.wait)
+        with pytest.raises(PoolSaturatedError):
+            submit_to_pool("io", release.wait)
+        release.set()
+        running.result(timeout=5)
+        assert get_pool("io").stats()["rejected"] == 1
+    finally:
+        release.set()
+        shutdown_pools()
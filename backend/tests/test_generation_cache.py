@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import generation_cache, inference, model_registry, tailoring
+from backend.utils.generation_cache import GenerationCache, cache_key
+
+
+class CountingBackend:
+    name = "counting"
+    slots = 2
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def complete(self, prompt, max_tokens, temperature, stop, prefix=None):
+        with self.lock:
+            self.prompts.append(prompt)
+            n = len(self.prompts)
+        return inference.GenerationResult(f"generated {n}", 0, 1, 0.0)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_PATH", str(tmp_path / "generations.sqlite"))
+    monkeypatch.setattr(generation_cache, "_cache", None)
+    return generation_cache.generation_cache()
+
+
+def run(fn, *args, **kwargs):
+    backend = CountingBackend()
+    scheduler = inference.InferenceScheduler(backend)
+    try:
+        return fn(*args, scheduler=scheduler, **kwargs), backend
+    finally:
+        scheduler.shutdown(5)
+
+
+def test_cache_key_is_canonical():
+    assert cache_key("t", {"a": 1, "b": 2}) == cache_key("t", {"b": 2, "a": 1})
+    assert cache_key("t", {"a": 1}) != cache_key("t", {"a": 2})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = GenerationCache(str(tmp_path / "c.sqlite"), max_bytes=250)
+    for n in range(3):
+        cache.put(f"k{n}", "x" * 100)
+        cache.get("k0")  # keep k0 recently used
+    assert cache.get("k0") == "x" * 100
+    assert cache.get("k1") is None
+    assert cache.get("k2") == "x" * 100
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] <= 250
+
+
+def test_size_is_tracked_without_rescanning(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    cache = GenerationCache(path, max_bytes=250)
+    cache.put("k", "x" * 100)
+    cache.put("k", "x" * 200)  # replaced, not added
+    assert cache._bytes == 200 and cache.stats()["evictions"] == 0
+    assert GenerationCache(path, max_bytes=250)._bytes == 200
+
+
+def test_nearest_is_scoped_and_thresholded(tmp_path):
+    cache = GenerationCache(str(tmp_path / "c.sqlite"), max_bytes=1 << 20)
+    cache.put("a", "answer a", scope="s1", vector=np.array([1.0, 0.0]))
+    cache.put("b", "answer b", scope="s2", vector=np.array([0.0, 1.0]))
+    assert cache.nearest("s1", np.array([0.99, 0.05]), threshold=0.95)[0] == "answer a"
+    assert cache.nearest("s1", np.array([0.0, 1.0]), threshold=0.95) is None
+    assert cache.nearest("s2", np.array([1.0, 0.0]), threshold=0.95) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.nearest("s1", np.array([1.0, 0.0])) is None  # off by default
+
+
+def test_rerun_only_generates_new_or_changed_jobs(cache):
+    jobs = [{"title": f"Engineer {n}", "company": "Acme", "requirements": "Python"} for n in range(3)]
+    first, backend = run(tailoring.tailor_documents, "Ten years of Python.", jobs, kinds=("cover_letter",))
+    assert len(backend.prompts) == 3 and not any(d["cached"] for d in first)
+
+    jobs[1] = dict(jobs[1], requirements="Rust")
+    jobs.append({"title": "Engineer 3", "company": "Acme", "requirements": "Go"})
+    second, backend = run(tailoring.tailor_documents, "Ten years of Python.", jobs, kinds=("cover_letter",))
+    assert [d["cached"] for d in second] == [True, False, True, False]
+    assert len(backend.prompts) == 2
+    assert second[0]["text"] == first[0]["text"] and second[2]["text"] == first[2]["text"]
+
+    third, backend = run(tailoring.tailor_documents, "Twelve years of Python.", jobs, kinds=("cover_letter",))
+    assert len(backend.prompts) == 4 and not any(d["cached"] for d in third)
+
+
+class KeywordEmbedder:
+    words = ("salary", "relocate", "visa")
+
+    def get_query_embedding(self, text):
+        text = text.lower()
+        return [1.0 if word in text else 0.0 for word in self.words] + [0.01]
+
+
+@pytest.fixture
+def keyword_embedder(monkeypatch):
+    spec = model_registry.embedding_spec()
+    monkeypatch.setitem(model_registry.registry._factories, spec.kind, lambda spec: KeywordEmbedder())
+    yield
+    model_registry.registry.unload(spec, force=True)
+
+
+def test_near_identical_questions_reuse_answers(cache, keyword_embedder, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_SIMILARITY", "0.95")
+    questions = ["What are your salary expectations?", "Are you willing to relocate?"]
+    first, backend = run(tailoring.answer_questions, "Ten years of Python.", questions)
+    assert len(backend.prompts) == 2 and [a["cached"] for a in first] == [False, False]
+
+    questions = ["What are your salary expectations?", "Would you relocate for this role?", "Do you need a visa?"]
+    second, backend = run(tailoring.answer_questions, "Ten years of Python.", questions)
+    assert [a["cached"] for a in second] == ["exact", "similar", False]
+    assert second[1]["text"] == first[1]["text"]
+    assert len(backend.prompts) == 1 and "visa" in backend.prompts[0]
@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.index_cache import IndexCache
+
+
+def make_user_dir(tmp_path, email, size=10):
+    user_dir = tmp_path / email
+    user_dir.mkdir()
+    (user_dir / "default__vector_store.json").write_bytes(b"x" * size)
+    return str(user_dir)
+
+
+def test_hit_after_first_load(tmp_path):
+    cache = IndexCache(max_entries=4, max_bytes=1000)
+    user_dir = make_user_dir(tmp_path, "a@example.com")
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return object()
+
+    first = cache.get("a", user_dir, loader)
+    second = cache.get("a", user_dir, loader)
+
+    assert first is second
+    assert len(loads) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_changed_persist_dir_invalidates_entry(tmp_path):
+    cache = IndexCache(max_entries=4, max_bytes=1000)
+    user_dir = make_user_dir(tmp_path, "a@example.com")
+
+    first = cache.get("a", user_dir, object)
+    # Simulate a new /upload-resume/ rewriting the persisted files
+    with open(os.path.join(user_dir, "docstore.json"), "w") as f:
+        f.write("{}")
+    second = cache.get("a", user_dir, object)
+
+    assert first is not second
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_by_entries_and_bytes(tmp_path):
+    cache = IndexCache(max_entries=2, max_bytes=25)
+    dirs = {name: make_user_dir(tmp_path, name) for name in ("a", "b", "c")}
+
+    cache.get("a", dirs["a"], object)
+    cache.get("b", dirs["b"], object)
+    cache.get("a", dirs["a"], object)  # "a" is now most recently used
+    cache.get("c", dirs["c"], object)  # evicts "b"
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 20
+
+    cache.get("a", dirs["a"], object)
+    assert cache.stats()["hits"] == 2
+
+
+def test_oversized_entries_are_not_cached(tmp_path):
+    cache = IndexCache(max_entries=2, max_bytes=5)
+    user_dir = make_user_dir(tmp_path, "big", size=100)
+
+    cache.get("big", user_dir, object)
+    cache.get("big", user_dir, object)
+
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,222 @@
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import inference
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self, slots, gate=None):
+        self.slots = slots
+        self.gate = gate
+        self.order = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def complete(self, prompt, max_tokens, temperature, stop, prefix=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        if self.gate is not None:
+            self.gate.wait(5)
+        else:
+            time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+            self.order.append(prompt)
+        if prompt == "boom":
+            raise ValueError("decode failed")
+        return inference.GenerationResult(prompt.upper(), 3, 10, 0.02)
+
+
+def test_interactive_prompts_jump_the_queue():
+    gate = threading.Event()
+    backend = FakeBackend(slots=1, gate=gate)
+    scheduler = inference.InferenceScheduler(backend)
+    first = scheduler.submit("first", priority=inference.PRIORITY_BACKGROUND)
+    while backend.running == 0:
+        time.sleep(0.001)
+    background = [scheduler.submit(f"agent {n}", priority=inference.PRIORITY_BACKGROUND) for n in range(2)]
+    interactive = scheduler.submit("match", priority=inference.PRIORITY_INTERACTIVE)
+    gate.set()
+
+    assert interactive.result(5).text == "MATCH"
+    assert [future.result(5).text for future in background] == ["AGENT 0", "AGENT 1"]
+    assert first.result(5).text == "FIRST"
+    assert backend.order == ["first", "match", "agent 0", "agent 1"]
+    scheduler.shutdown(5)
+
+
+def test_slots_decode_concurrently_and_report_metrics():
+    backend = FakeBackend(slots=3)
+    scheduler = inference.InferenceScheduler(backend)
+    futures = [scheduler.submit(f"prompt {n}") for n in range(9)]
+    failed = scheduler.submit("boom")
+    assert [future.result(5).completion_tokens for future in futures] == [10] * 9
+    with pytest.raises(ValueError):
+        failed.result(5)
+
+    stats = scheduler.stats()
+    assert backend.max_running == 3
+    assert stats["completed"] == 9 and stats["failed"] == 1
+    assert stats["completion_tokens"] == 90
+    assert stats["tokens_per_second"] > 0
+    assert 0.5 < stats["occupancy"] <= 1
+    assert stats["queue_wait_ms"]["p95"] >= stats["queue_wait_ms"]["p50"] > 0
+    scheduler.shutdown(5)
+    with pytest.raises(RuntimeError):
+        scheduler.submit("late")
+
+
+def test_llama_server_backend():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests_seen.append((self.path, body))
+            payload = json.dumps({"content": " Yes.", "tokens_evaluated": 12, "tokens_predicted": 2}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = inference.LlamaServerBackend(f"http://127.0.0.1:{server.server_address[1]}/", slots=2, timeout=5)
+        result = backend.complete("Is this a match?", 16, 0.1, ["\n"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert result.text == " Yes." and result.prompt_tokens == 12 and result.completion_tokens == 2
+    path, body = requests_seen[0]
+    assert path == "/completion"
+    assert body["n_predict"] == 16 and body["stop"] == ["\n"] and body["cache_prompt"] is True
+
+
+class FakeState:
+    def __init__(self, tokens):
+        self.input_ids = list(tokens)
+        self.llama_state_size = 100 * len(tokens)
+
+
+class FakeLlama:
+    """Characters are tokens; counts how many tokens are evaluated."""
+
+    def __init__(self):
+        self.input_ids = []
+        self.evaluated = 0
+
+    def tokenize(self, text):
+        return list(text.decode("utf-8"))
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens):
+        self.evaluated += len(tokens)
+        self.input_ids += list(tokens)
+
+    def save_state(self):
+        return FakeState(self.input_ids)
+
+    def load_state(self, state):
+        self.input_ids = list(state.input_ids)
+
+    def __call__(self, prompt, max_tokens, temperature, stop):
+        tokens = list(prompt)
+        common = 0
+        while common < min(len(tokens), len(self.input_ids)) and tokens[common] == self.input_ids[common]:
+            common += 1
+        self.input_ids = self.input_ids[:common]
+        self.eval(tokens[common:])
+        return {"choices": [{"text": "ok"}], "usage": {"prompt_tokens": len(tokens), "completion_tokens": 1}}
+
+
+@pytest.fixture
+def fake_llama(monkeypatch):
+    from backend.utils.model_registry import registry
+
+    model = FakeLlama()
+    monkeypatch.setitem(registry._factories, "llama_cpp", lambda spec: model)
+    yield model
+    registry.unload(force=True)
+
+
+def test_prefix_state_is_evaluated_once(fake_llama):
+    cache = inference.PrefixCache(capacity_bytes=1 << 20)
+    backend = inference.LlamaCppBackend("model.gguf", 4096, 0, cache)
+    resume = "R" * 1000
+    other = "O" * 1000
+    for n in range(30):
+        backend.complete(f"{resume}job {n:02d}", 16, 0.2, None, prefix=resume)
+        # Another candidate's prompt in between evicts the resume from the context.
+        backend.complete(f"{other}job {n:02d}", 16, 0.2, None, prefix=other)
+
+    assert fake_llama.evaluated == 2 * 1000 + 60 * len("job 00")
+    assert cache.stats()["misses"] == 2 and cache.stats()["hits"] == 58
+
+
+def test_prefix_cache_spills_to_disk(tmp_path):
+    cache = inference.PrefixCache(capacity_bytes=250, spill_dir=str(tmp_path), disk_bytes=10_000)
+    cache.put("a", FakeState("aa"), 200)
+    cache.put("b", FakeState("bb"), 200)  # evicts and spills "a"
+    assert cache.stats()["entries"] == 1 and cache.stats()["spills"] == 1
+    with open(tmp_path / "a.state", "rb") as f:
+        assert pickle.load(f)[1] == 200
+
+    assert cache.get("a").input_ids == ["a", "a"]
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["misses"] == 1
+
+
+def test_server_backend_pins_a_prefix_to_one_slot():
+    backend = inference.LlamaServerBackend("http://127.0.0.1:1", slots=4, timeout=1)
+    slots = set()
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"content": ""}
+
+    def post(url, json, timeout):
+        slots.add(json["id_slot"])
+        return Response()
+
+    backend.session.post = post
+    for n in range(5):
+        backend.complete(f"resume job {n}", 8, 0.2, None, prefix="resume ")
+    assert len(slots) == 1 and 0 <= slots.pop() < 4
+
+
+def test_timed_out_generation_leaves_the_queue():
+    gate = threading.Event()
+    backend = FakeBackend(slots=1, gate=gate)
+    scheduler = inference.InferenceScheduler(backend)
+    busy = scheduler.submit("busy")
+    with pytest.raises(TimeoutError):
+        scheduler.generate("late", timeout=0.05)
+    gate.set()
+    assert busy.result(5).text == "BUSY"
+    scheduler.shutdown(5)
+    assert backend.order == ["busy"]
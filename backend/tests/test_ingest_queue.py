@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.ingest_queue import IngestQueue, IngestWorkers, LeaseLostError  # noqa: E402
+
+
+def test_job_runs_and_records_progress(tmp_path):
+    queue = IngestQueue(str(tmp_path))
+    job_id = queue.enqueue("resume", {"email": "a@x.com"})
+    assert queue.get(job_id)["status"] == "queued"
+
+    def handler(job, progress):
+        progress("embedding", "3 chunks")
+        return {"email": job["payload"]["email"], "chunks": 3}
+
+    workers = IngestWorkers(queue, {"resume": handler}, workers=1)
+    assert workers.run_one() is True
+    assert workers.run_one() is False
+
+    job = queue.get(job_id)
+    assert job["status"] == "done" and job["result"] == {"email": "a@x.com", "chunks": 3}
+    assert [event["stage"] for event in queue.events(job_id)] == ["queued", "started", "embedding", "done"]
+    assert [event["stage"] for event in queue.events(job_id, after=queue.events(job_id)[1]["seq"])] == ["embedding", "done"]
+    assert queue.counts() == {"done": 1}
+
+
+def test_failures_and_unknown_kinds_are_recorded(tmp_path):
+    queue = IngestQueue(str(tmp_path))
+    failing = queue.enqueue("resume", {})
+    unknown = queue.enqueue("video", {})
+
+    def handler(job, progress):
+        raise RuntimeError("bad pdf")
+
+    workers = IngestWorkers(queue, {"resume": handler}, workers=1)
+    while workers.run_one():
+        pass
+    assert queue.get(failing)["status"] == "failed" and queue.get(failing)["error"] == "bad pdf"
+    assert "video" in queue.get(unknown)["error"]
+
+
+def test_abandoned_jobs_are_reclaimed_until_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEASE_SECONDS", "-1")  # every lease is already expired
+    monkeypatch.setenv("INGEST_MAX_ATTEMPTS", "2")
+    queue = IngestQueue(str(tmp_path))
+    job_id = queue.enqueue("resume", {})
+
+    # A worker that dies mid-job never calls finish(); the job stays "running".
+    assert queue.claim()["attempts"] == 0
+    assert queue.claim()["id"] == job_id
+    assert queue.claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["attempts"] == 2
+
+
+def test_running_jobs_keep_their_lease(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEASE_SECONDS", "0.15")
+    queue = IngestQueue(str(tmp_path))
+    job_id = queue.enqueue("resume", {})
+    reclaimed = []
+
+    def handler(job, progress):
+        # Runs for several lease periods; the heartbeat keeps the job claimed.
+        for _ in range(5):
+            time.sleep(0.1)
+            reclaimed.append(queue.claim())
+
+    assert IngestWorkers(queue, {"resume": handler}, workers=1).run_one()
+    assert reclaimed == [None] * 5
+    job = queue.get(job_id)
+    assert job["status"] == "done" and job["attempts"] == 1
+
+
+def test_a_stale_attempt_cannot_overwrite_the_new_one(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEASE_SECONDS", "-1")
+    queue = IngestQueue(str(tmp_path))
+    job_id = queue.enqueue("resume", {})
+    stale, current = queue.claim(), queue.claim()
+    assert (stale["attempt"], current["attempt"]) == (1, 2)
+
+    with pytest.raises(LeaseLostError):
+        queue.progress(job_id, "embedding", attempt=stale["attempt"])
+    assert queue.finish(job_id, error="timeout", attempt=stale["attempt"]) is False
+    assert queue.get(job_id)["status"] == "running"
+    assert queue.finish(job_id, result=1, attempt=current["attempt"]) is True
+    assert queue.get(job_id)["status"] == "done"
+
+
+def test_renew_without_an_attempt_is_unconditional(tmp_path):
+    queue = IngestQueue(str(tmp_path))
+    job_id = queue.enqueue("resume", {})
+    claimed = queue.claim()
+    assert queue.renew(job_id) is True
+    assert queue.renew(job_id, attempt=claimed["attempt"]) is True
+    assert queue.renew(job_id, attempt=claimed["attempt"] + 1) is False
+
+
+def test_worker_threads_drain_the_queue(tmp_path):
+    queue = IngestQueue(str(tmp_path))
+    done = threading.Semaphore(0)
+
+    def handler(job, progress):
+        done.release()
+
+    workers = IngestWorkers(queue, {"resume": handler}, workers=3)
+    workers.start()
+    try:
+        ids = [queue.enqueue("resume", {"n": n}) for n in range(6)]
+        for _ in ids:
+            assert done.acquire(timeout=5)
+    finally:
+        workers.stop(timeout=5)
+    assert all(queue.get(job_id)["status"] == "done" for job_id in ids)
+    assert len(os.listdir(queue.uploads_dir)) == 0 and queue.upload_path(".pdf") != queue.upload_path(".pdf")
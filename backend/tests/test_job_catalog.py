@@ -0,0 +1,166 @@
+import importlib
+import os
+import pickle
+import sys
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeFlatIP:
+    def __init__(self, d, *args):
+        self.d = d
+
+
+class FakeHNSW(FakeFlatIP):
+    def __init__(self, d, m, metric):
+        super().__init__(d)
+        self.hnsw = types.SimpleNamespace(efConstruction=0, efSearch=0)
+
+
+class FakeIVFFlat(FakeFlatIP):
+    def __init__(self, quantizer, d, nlist, metric):
+        super().__init__(d)
+        self.nlist = nlist
+        self.nprobe = 1
+        self.trained_on = 0
+
+    def train(self, vectors):
+        self.trained_on = len(vectors)
+
+
+class FakeIDMap2:
+    """Brute-force inner-product index with ids, like faiss.IndexIDMap2."""
+
+    def __init__(self, inner):
+        self.index = inner
+        self.ids = np.zeros(0, dtype="int64")
+        self.vectors = np.zeros((0, inner.d), dtype="float32")
+
+    @property
+    def ntotal(self):
+        return len(self.ids)
+
+    def add_with_ids(self, vectors, ids):
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.ids = np.concatenate([self.ids, ids])
+
+    def remove_ids(self, ids):
+        if isinstance(self.index, FakeHNSW):
+            raise RuntimeError("not implemented for this type of index")
+        keep = ~np.isin(self.ids, ids)
+        self.ids, self.vectors = self.ids[keep], self.vectors[keep]
+
+    def search(self, queries, k):
+        scores = queries @ self.vectors.T
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, axis=1), self.ids[order]
+
+
+@pytest.fixture
+def job_catalog(monkeypatch):
+    faiss_mod = types.ModuleType("faiss")
+    faiss_mod.METRIC_INNER_PRODUCT = 0
+    faiss_mod.IndexFlatIP = FakeFlatIP
+    faiss_mod.IndexHNSWFlat = FakeHNSW
+    faiss_mod.IndexIVFFlat = FakeIVFFlat
+    faiss_mod.IndexIDMap2 = FakeIDMap2
+    faiss_mod.downcast_index = lambda index: index
+
+    def write_index(index, path):
+        with open(path, "wb") as f:
+            pickle.dump(index, f)
+
+    def read_index(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    faiss_mod.write_index = write_index
+    faiss_mod.read_index = read_index
+    monkeypatch.setitem(sys.modules, "faiss", faiss_mod)
+    pymongo_mod = types.ModuleType("pymongo")
+    pymongo_mod.MongoClient = object
+    gridfs_mod = types.ModuleType("gridfs")
+    gridfs_mod.GridFS = object
+    monkeypatch.setitem(sys.modules, "pymongo", pymongo_mod)
+    monkeypatch.setitem(sys.modules, "gridfs", gridfs_mod)
+    return importlib.import_module("backend.utils.job_catalog")
+
+
+JOBS = [
+    {"title": "Data Engineer", "url": "https://x.com/1", "location": "Dallas, TX", "workplace": "Remote", "salary": "$120,000 - $150,000"},
+    {"title": "ML Engineer", "url": "https://x.com/2", "location": "Austin, TX", "workplace": "Onsite", "salary": "$60/hr"},
+    {"title": "QA Engineer", "url": "https://x.com/3", "location": "Dallas, TX", "workplace": "Onsite", "salary": "80k"},
+]
+VECTORS = np.array([[1, 0, 0], [0.8, 0.6, 0], [0, 1, 0]], dtype="float32")
+
+
+def test_parse_salary(job_catalog):
+    assert job_catalog.parse_salary("$120,000 - $150,000 a year") == (120000, 150000)
+    assert job_catalog.parse_salary("80k+") == (80000, 80000)
+    assert job_catalog.parse_salary("$60/hr") == (124800, 124800)
+    assert job_catalog.parse_salary("N/A") == (None, None)
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_search_ranks_filters_and_replaces(job_catalog, tmp_path, monkeypatch, kind):
+    monkeypatch.setenv("CATALOG_COMPACT_RATIO", "1")  # keep HNSW tombstones around
+    catalog = job_catalog.JobCatalog(str(tmp_path), dimension=3, kind=kind)
+    assert catalog.add_jobs(JOBS, "motion_jobs", VECTORS) == 3
+
+    top = catalog.search(np.array([[1, 0, 0]]), k=2)
+    assert [job["title"] for job in top] == ["Data Engineer", "ML Engineer"]
+    assert top[0]["similarity"] == 100.0 and top[0]["collection"] == "motion_jobs"
+    assert catalog.search(np.array([[1, 0, 0]]), k=0) == []
+
+    dallas = catalog.search(np.array([[1, 0, 0]]), k=5, location="dallas")
+    assert [job["title"] for job in dallas] == ["Data Engineer", "QA Engineer"]
+    assert [j["title"] for j in catalog.search(np.array([[1, 0, 0]]), k=5, workplace="onsite")] == ["ML Engineer", "QA Engineer"]
+    assert [j["title"] for j in catalog.search(np.array([[1, 0, 0]]), k=5, min_salary=125000)] == ["Data Engineer"]
+
+    # A re-scraped posting replaces its previous vector instead of duplicating it.
+    catalog.add_jobs([dict(JOBS[0], salary="$130,000")], "motion_jobs", np.array([[0, 0, 1]]))
+    top = catalog.search(np.array([[1, 0, 0]]), k=5)
+    assert [job["title"] for job in top].count("Data Engineer") == 1
+    assert catalog.stats()["active"] == 3
+
+    catalog.remove_jobs([job_catalog.job_content_key(JOBS[1])])
+    assert "ML Engineer" not in [job["title"] for job in catalog.search(np.array([[1, 0, 0]]), k=5)]
+
+    # Another process opening the same directory sees the persisted catalog.
+    reopened = job_catalog.JobCatalog(str(tmp_path), dimension=3, kind=kind)
+    assert [job["title"] for job in reopened.search(np.array([[0, 1, 0]]), k=1)] == ["QA Engineer"]
+
+
+def test_hnsw_tombstones_are_compacted(job_catalog, tmp_path, monkeypatch):
+    catalog = job_catalog.JobCatalog(str(tmp_path), dimension=3, kind="hnsw")
+    catalog.add_jobs(JOBS, "motion_jobs", VECTORS)
+    monkeypatch.setattr(job_catalog, "embed_job_texts", lambda texts: VECTORS[: len(texts)])
+
+    catalog.remove_jobs([job_catalog.job_content_key(JOBS[2])])
+    stats = catalog.stats()
+    assert stats["tombstones"] == 0 and stats["indexed"] == stats["active"] == 2
+
+
+def test_ivf_is_retrained_as_the_catalog_grows(job_catalog, tmp_path, monkeypatch):
+    jobs = [{"title": f"Engineer {n}", "url": f"https://x.com/{n}"} for n in range(8)]
+    vectors = {job_catalog.job_to_text(job): np.eye(8, dtype="float32")[n] for n, job in enumerate(jobs)}
+    monkeypatch.setattr(job_catalog, "embed_job_texts", lambda texts: np.stack([vectors[text] for text in texts]))
+    catalog = job_catalog.JobCatalog(str(tmp_path), dimension=8, kind="ivf")
+
+    catalog.add_jobs(jobs[:3], "motion_jobs")
+    assert catalog._index.index.trained_on == 3
+    catalog.add_jobs(jobs[3:5], "motion_jobs")
+    assert catalog._index.index.trained_on == 3  # 5 < 2 x 3
+    catalog.add_jobs(jobs[5:6], "motion_jobs")
+    assert catalog._index.index.trained_on == 6
+    assert catalog.stats()["indexed"] == 6
+    assert [job["title"] for job in catalog.search(np.eye(8)[[4]], k=1)] == ["Engineer 4"]
+
+    # A bulk rebuild trains once, on everything.
+    assert catalog.rebuild({"motion_jobs": jobs}) == 8
+    assert catalog._index.index.trained_on == 8
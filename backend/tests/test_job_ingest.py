@@ -0,0 +1,118 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class UpdateOne:
+    def __init__(self, filter, update, upsert=False):
+        self.filter = filter
+        self.update = update
+        self.upsert = upsert
+
+
+class FakeCollection:
+    """In-memory stand-in for a pymongo collection keyed by job_key."""
+
+    name = "test_jobs"
+
+    def __init__(self, legacy=()):
+        self.docs = {}
+        self.legacy = list(legacy)  # documents inserted without a job_key
+        self.indexes = []
+        self.bulk_calls = 0
+
+    def create_index(self, field, unique=False, partialFilterExpression=None):
+        if unique and partialFilterExpression is None and len(self.legacy) > 1:
+            raise RuntimeError("E11000 duplicate key error: { job_key: null }")
+        self.indexes.append((field, unique))
+
+    def find(self, query, projection=None):
+        keys = query["job_key"]["$in"]
+        return [dict(self.docs[k]) for k in keys if k in self.docs]
+
+    def bulk_write(self, operations, ordered=True):
+        self.bulk_calls += 1
+        upserted = modified = 0
+        for op in operations:
+            key = op.filter["job_key"]
+            if key in self.docs:
+                self.docs[key].update(op.update["$set"])
+                modified += 1
+            else:
+                self.docs[key] = {**op.update["$setOnInsert"], **op.update["$set"]}
+                upserted += 1
+        return types.SimpleNamespace(upserted_count=upserted, modified_count=modified)
+
+
+@pytest.fixture
+def job_ingest(monkeypatch):
+    pymongo_mod = types.ModuleType("pymongo")
+    pymongo_mod.MongoClient = object
+    pymongo_mod.UpdateOne = UpdateOne
+    gridfs_mod = types.ModuleType("gridfs")
+    gridfs_mod.GridFS = object
+    monkeypatch.setitem(sys.modules, "pymongo", pymongo_mod)
+    monkeypatch.setitem(sys.modules, "gridfs", gridfs_mod)
+    monkeypatch.setenv("INGEST_EMBED_JOBS", "false")
+    importlib.reload(importlib.import_module("backend.utils.mongo"))
+    return importlib.reload(importlib.import_module("backend.utils.job_ingest"))
+
+
+def test_canonical_url_ignores_tracking_and_cosmetic_differences(job_ingest):
+    a = job_ingest.canonical_url("HTTPS://Careers.EY.com:443/job/123/?utm_source=x&b=2&a=1#apply")
+    b = job_ingest.canonical_url("https://careers.ey.com/job/123?a=1&b=2")
+    assert a == b == "https://careers.ey.com/job/123?a=1&b=2"
+
+
+def test_content_key_is_stable_across_scrapers_field_names(job_ingest):
+    motion = {"title": "  Data   Engineer", "company": "EY", "url": "https://x.com/j/1?utm_medium=y"}
+    glassdoor = {"job-title": "data engineer", "company": "ey", "job-link": "https://x.com/j/1"}
+    assert job_ingest.job_content_key(motion) == job_ingest.job_content_key(glassdoor)
+    assert job_ingest.job_content_key(motion) != job_ingest.job_content_key({**motion, "url": "https://x.com/j/2"})
+
+
+def test_repeat_ingest_only_writes_changes(job_ingest):
+    collection = FakeCollection()
+    jobs = [
+        {"title": "Data Engineer", "url": "https://x.com/1", "salary": "100k"},
+        {"title": "ML Engineer", "url": "https://x.com/2", "salary": "120k"},
+    ]
+
+    first = job_ingest.upsert_jobs(jobs, "test_jobs", collection=collection)
+    assert first == {"inserted": 2, "updated": 0, "unchanged": 0, "duplicates": 0}
+    assert ("job_key", True) in collection.indexes
+    assert "_id" not in jobs[0]  # input is not mutated like insert_many did
+
+    second = job_ingest.upsert_jobs(jobs, "test_jobs", collection=collection)
+    assert second == {"inserted": 0, "updated": 0, "unchanged": 2, "duplicates": 0}
+    assert collection.bulk_calls == 1
+
+    changed = [dict(jobs[0], salary="110k"), jobs[1], dict(jobs[1])]
+    third = job_ingest.upsert_jobs(changed, "test_jobs", collection=collection)
+    assert third == {"inserted": 0, "updated": 1, "unchanged": 1, "duplicates": 1}
+    assert len(collection.docs) == 2
+
+
+def test_changed_jobs_are_sent_to_the_embedding_cache(job_ingest, monkeypatch):
+    embedded = []
+    monkeypatch.setenv("INGEST_EMBED_JOBS", "true")
+    monkeypatch.setattr(job_ingest, "_index_changed_jobs", lambda jobs, collection: embedded.append(len(jobs)))
+    collection = FakeCollection()
+    jobs = [{"title": "Data Engineer", "url": "https://x.com/1"}, {"title": "ML Engineer", "url": "https://x.com/2"}]
+
+    job_ingest.upsert_jobs(jobs, "test_jobs", collection=collection)
+    job_ingest.upsert_jobs([dict(jobs[0], requirements="SQL"), jobs[1]], "test_jobs", collection=collection)
+    job_ingest.upsert_jobs(jobs[1:], "test_jobs", collection=collection)
+    assert embedded == [2, 1]
+
+
+def test_collections_with_legacy_documents_can_be_indexed(job_ingest):
+    collection = FakeCollection(legacy=[{"title": "Old job 1"}, {"title": "Old job 2"}])
+    counts = job_ingest.upsert_jobs([{"title": "Data Engineer", "url": "https://x.com/1"}], "test_jobs", collection=collection)
+    assert counts["inserted"] == 1
+    assert ("job_key", True) in collection.indexes
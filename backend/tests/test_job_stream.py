@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.job_stream import iter_jobs
+
+JOBS = [
+    {"title": "Data Engineer", "company": "EY", "salary": 120000},
+    {"title": "Backend Developer — Node.js", "requirements": ["AWS", "MongoDB"], "remote": True},
+    {"title": "ML Engineer", "score": 12345.678, "tags": None},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+def test_json_array_is_parsed_incrementally(chunk_size):
+    data = json.dumps(JOBS, ensure_ascii=False, indent=2).encode("utf-8")
+    assert list(iter_jobs(io.BytesIO(data), chunk_size=chunk_size)) == JOBS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64 * 1024])
+def test_ndjson_is_parsed_incrementally(chunk_size):
+    data = "\n".join(json.dumps(job, ensure_ascii=False) for job in JOBS).encode("utf-8")
+    assert list(iter_jobs(io.BytesIO(data), chunk_size=chunk_size)) == JOBS
+
+
+def test_numbers_split_across_chunks():
+    data = b"[1234567, 89]"
+    assert list(iter_jobs(io.BytesIO(data), chunk_size=3)) == [1234567, 89]
+
+
+def test_empty_inputs():
+    assert list(iter_jobs(io.BytesIO(b""))) == []
+    assert list(iter_jobs(io.BytesIO(b"  [ ] "))) == []
+
+
+def test_items_are_yielded_before_the_file_is_fully_read():
+    data = json.dumps(JOBS).encode("utf-8")
+    stream = io.BytesIO(data)
+    first = next(iter_jobs(stream, chunk_size=16))
+    assert first == JOBS[0]
+    assert stream.tell() < len(data)
+
+
+def test_malformed_input_raises_value_error():
+    with pytest.raises(ValueError):
+        list(iter_jobs(io.BytesIO(b'[{"title": "a"} {"title": "b"}]')))
+    with pytest.raises(ValueError):
+        list(iter_jobs(io.BytesIO(b'[{"title": ')))
+
+
+class CountingReads(io.BytesIO):
+    reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_large_items_are_not_decoded_once_per_chunk():
+    data = json.dumps([{"description": "x" * 1_000_000}]).encode("utf-8")
+    stream = CountingReads(data)
+    assert len(list(iter_jobs(stream, chunk_size=1024))) == 1
+    assert stream.reads < 20
+
+
+def test_syntax_errors_fail_before_the_rest_is_read():
+    data = b'[{"title": "a" "b"}, ' + b", ".join([b'{"title": "c"}'] * 10_000) + b"]"
+    stream = io.BytesIO(data)
+    with pytest.raises(ValueError):
+        list(iter_jobs(stream, chunk_size=64))
+    assert stream.tell() <= 64
+
+
+def test_oversized_items_are_rejected(monkeypatch):
+    monkeypatch.setenv("JOB_STREAM_MAX_ITEM_BYTES", "1000")
+    data = json.dumps([{"title": "a"}, {"description": "x" * 5000}]).encode("utf-8")
+    stream = io.BytesIO(data)
+    jobs = iter_jobs(stream, chunk_size=64)
+    assert next(jobs) == {"title": "a"}
+    with pytest.raises(ValueError):
+        next(jobs)
+    assert stream.tell() < 2100
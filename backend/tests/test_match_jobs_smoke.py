@@ -11,6 +11,8 @@ import pytest
 def no_auto_download_env(monkeypatch):
     # Prevent model auto download during tests
     monkeypatch.setenv("MODEL_AUTO_DOWNLOAD", "false")
+    # The stubbed LlamaCPP below is only used by the direct (non-scheduler) backend
+    monkeypatch.setenv("INFERENCE_BACKEND", "direct")
     yield
 
 
@@ -108,7 +110,7 @@ def test_match_jobs_loads_index_without_model(monkeypatch, tmp_path):
     jm.LlamaCPP = DummyLlama
 
     # Prevent MongoDB access by mocking get_user_raw_file
-    monkeypatch.setattr(jm, 'get_user_raw_file', lambda email: b"")
+    monkeypatch.setattr(jm, 'get_user_raw_file', lambda email: b"resume")
 
     # Build a tiny fake index object that has as_query_engine returning an object with query()
     class FakeQueryEngine:
@@ -125,7 +127,42 @@ def test_match_jobs_loads_index_without_model(monkeypatch, tmp_path):
     # Monkeypatch load_index_from_storage to return our fake index
     monkeypatch.setattr(jm, 'load_index_from_storage', lambda storage_context: FakeIndex())
 
+    # Mark the index as built by the configured embedding model so it is not re-embedded
+    from backend.utils.embedding_service import write_fingerprint
+
+    write_fingerprint(str(user_dir))
+
     # Call match_jobs and assert it returns structure without raising
     result = jm.match_jobs(email, jobs=[])  # empty jobs list
     assert isinstance(result, dict)
-    assert 'matches' in result and 'raw_file' in result
+    assert 'matches' in result and 'raw_file' not in result
+    # The raw file is only fetched on request
+    assert jm.match_jobs(email, jobs=[], include_raw_file=True)['raw_file'] == b"resume"
+
+
+def test_tenant_retrieval_searches_the_shard_index(monkeypatch):
+    import types
+
+    import numpy as np
+
+    monkeypatch.setitem(sys.modules, "pymongo", types.SimpleNamespace(MongoClient=object))
+    monkeypatch.setitem(sys.modules, "gridfs", types.SimpleNamespace(GridFS=object))
+    import backend.app.job_matcher as jm
+
+    searched = []
+
+    class FakeTenantStore:
+        def search(self, email, queries, k=1):
+            searched.append((email, len(queries), k))
+            return np.array([[0.1], [0.9]], dtype="float32"), [["python"], [None]]
+
+        def vectors(self, email):
+            raise AssertionError("retrieval must not brute-force the tenant's vectors")
+
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "tenant")
+    monkeypatch.setattr(jm, "tenant_store", FakeTenantStore)
+    monkeypatch.setattr(jm, "embed_job_texts", lambda texts, batch_size=256: np.ones((len(texts), 2), dtype="float32"))
+    jobs = [{"title": "Data Engineer"}, {"title": "Chef"}]
+    assert jm._tenant_nearest_scores("a@x.com", np.ones((2, 2))) == [pytest.approx(0.1), 0]
+    jm._match_with_retrieval("a@x.com", "shard-0", jobs)
+    assert searched[-1] == ("a@x.com", 2, 1)
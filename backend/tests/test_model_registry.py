@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import model_registry
+from backend.utils.model_registry import ModelRegistry, ModelSpec
+
+
+def make_registry():
+    loads = []
+
+    def factory(spec):
+        loads.append(spec)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register_factory("dummy", factory)
+    return registry, loads
+
+
+def test_get_loads_once_and_shares_instance():
+    registry, loads = make_registry()
+    spec = ModelSpec.create("dummy", "model-a", temperature=0.1)
+
+    first = registry.get(spec)
+    second = registry.get(ModelSpec.create("dummy", "model-a", temperature=0.1))
+
+    assert first is second
+    assert len(loads) == 1
+    assert registry.stats()[0]["refcount"] == 2
+
+
+def test_different_params_are_different_models():
+    registry, loads = make_registry()
+    a = registry.get(ModelSpec.create("dummy", "model-a", temperature=0.1))
+    b = registry.get(ModelSpec.create("dummy", "model-a", temperature=0.2))
+    assert a is not b
+    assert len(loads) == 2
+
+
+def test_unload_keeps_referenced_models_unless_forced():
+    registry, loads = make_registry()
+    spec = ModelSpec.create("dummy", "model-a")
+
+    registry.get(spec)
+    assert registry.unload(spec) == []
+    assert registry.is_loaded(spec)
+
+    registry.release(spec)
+    assert registry.unload(spec) == [spec]
+    assert not registry.is_loaded(spec)
+
+    # A later get() reloads the model
+    with registry.acquire(spec):
+        assert registry.unload(force=True) == [spec]
+    assert len(loads) == 2
+
+
+def test_concurrent_get_loads_once():
+    registry = ModelRegistry()
+    loads = []
+    barrier = threading.Barrier(8)
+
+    def slow_factory(spec):
+        loads.append(spec)
+        return object()
+
+    registry.register_factory("dummy", slow_factory)
+    spec = ModelSpec.create("dummy", "model-a")
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(registry.get(spec))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert len({id(r) for r in results}) == 1
+
+
+def test_warm_up_does_not_take_references():
+    registry, loads = make_registry()
+    spec = ModelSpec.create("dummy", "model-a")
+    registry.warm_up([spec])
+    assert registry.is_loaded(spec)
+    assert registry.stats()[0]["refcount"] == 0
+
+
+def test_langchain_llamacpp_factory_fetches_the_model_first(monkeypatch):
+    calls = []
+    llms = types.ModuleType("langchain_community.llms")
+    llms.LlamaCpp = lambda model_path, **kwargs: calls.append(("load", model_path))
+    monkeypatch.setitem(sys.modules, "langchain_community", types.ModuleType("langchain_community"))
+    monkeypatch.setitem(sys.modules, "langchain_community.llms", llms)
+    monkeypatch.setattr(model_registry, "ensure_model_file", lambda path: calls.append(("ensure", path)))
+
+    model_registry._langchain_llamacpp_factory(ModelSpec.create("langchain.llamacpp", "m.gguf"))
+
+    assert calls == [("ensure", "m.gguf"), ("load", "m.gguf")]
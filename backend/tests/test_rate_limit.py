@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils.rate_limit import HostRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_bucket_allows_burst_then_paces_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+    async def main():
+        for _ in range(7):
+            await bucket.acquire()
+
+    asyncio.run(main())
+
+    # 3 immediate requests, then 4 more at 2 req/s
+    assert len(clock.sleeps) == 4
+    assert clock.now == 2.0
+
+
+def test_bucket_refills_while_idle():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, burst=2, clock=clock, sleep=clock.sleep)
+
+    async def main():
+        await bucket.acquire()
+        await bucket.acquire()
+        clock.now += 5  # idle long enough to refill, but only up to `burst`
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(main())
+    assert clock.sleeps == [1.0]
+
+
+def test_host_limiter_keeps_separate_buckets():
+    limiter = HostRateLimiter(rate=1, burst=1)
+    a = limiter.bucket("https://careers.ey.com/job/1")
+    assert limiter.bucket("https://CAREERS.ey.com/job/2") is a
+    assert limiter.bucket("https://example.com/") is not a
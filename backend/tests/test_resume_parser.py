@@ -0,0 +1,136 @@
+import importlib
+import os
+import sys
+import time
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+STUCK = "<stuck>"
+PAGES = ["Experienced data engineer with Python and SQL.", "", "Skills: Spark, Airflow, dbt, Kafka, AWS."]
+
+
+class FakePlumberPage:
+    def __init__(self, number):
+        self.number = number
+
+    def extract_text(self):
+        return f"layout page {self.number}"
+
+
+class FakePlumberPdf:
+    opened = 0
+
+    def __init__(self):
+        FakePlumberPdf.opened += 1
+        self.pages = [FakePlumberPage(n) for n in range(len(PAGES))]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeTextPage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_text_range(self):
+        return self.text.replace("\n", "\r\n")
+
+    def close(self):
+        pass
+
+
+class FakePdfiumPage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_textpage(self):
+        if self.text == STUCK:
+            time.sleep(60)
+        return FakeTextPage(self.text)
+
+    def close(self):
+        pass
+
+
+class FakePdfiumDocument:
+    def __init__(self, path):
+        self.path = path
+
+    def __len__(self):
+        return len(PAGES)
+
+    def __getitem__(self, number):
+        return FakePdfiumPage(STUCK if self.path == "stuck.pdf" else PAGES[number])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def resume_parser(monkeypatch):
+    # Forked workers inherit the stub modules below.
+    monkeypatch.setenv("PDF_START_METHOD", "fork")
+    pdfplumber_mod = types.ModuleType("pdfplumber")
+    pdfplumber_mod.open = lambda path: FakePlumberPdf()
+    pdfium_mod = types.ModuleType("pypdfium2")
+    pdfium_mod.PdfDocument = FakePdfiumDocument
+    monkeypatch.setitem(sys.modules, "pdfplumber", pdfplumber_mod)
+    monkeypatch.setitem(sys.modules, "pypdfium2", pdfium_mod)
+    monkeypatch.setitem(sys.modules, "docx", types.ModuleType("docx"))
+    monkeypatch.delitem(sys.modules, "backend.utils.resume_parser", raising=False)
+    FakePlumberPdf.opened = 0
+    return importlib.import_module("backend.utils.resume_parser")
+
+
+def test_pdfium_pages_with_pdfplumber_fallback(resume_parser):
+    pages = resume_parser._iter_range("resume.pdf", 0, len(PAGES), "pdfium")
+    assert next(pages) == PAGES[0]
+    # pdfplumber is only opened for the page pdfium could not read.
+    assert FakePlumberPdf.opened == 0
+    assert list(pages) == ["layout page 1", PAGES[2]]
+    assert FakePlumberPdf.opened == 1
+    assert list(resume_parser.iter_pdf_pages("resume.pdf", workers=1)) == [PAGES[0], "layout page 1", PAGES[2]]
+
+
+def test_pdfplumber_engine_and_page_cap(resume_parser, monkeypatch):
+    monkeypatch.setenv("PDF_ENGINE", "pdfplumber")
+    assert list(resume_parser.iter_pdf_pages("resume.pdf", max_pages=2, workers=1)) == ["layout page 0", "layout page 1"]
+    monkeypatch.setenv("PDF_ENGINE", "ocr")
+    with pytest.raises(ValueError):
+        resume_parser.extract_text_from_pdf("resume.pdf")
+
+
+def test_deadline_stops_extraction(resume_parser):
+    pages = resume_parser.iter_pdf_pages("resume.pdf", timeout=0, workers=1)
+    with pytest.raises(TimeoutError):
+        list(pages)
+
+
+def test_stuck_page_is_killed_at_the_deadline(resume_parser):
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(resume_parser.iter_pdf_pages("stuck.pdf", timeout=1, workers=1))
+    assert time.monotonic() - started < 10
+
+
+def test_deadline_only_counts_extraction(resume_parser, monkeypatch):
+    monkeypatch.setenv("PDF_PAGES_PER_TASK", "1")
+    pages = []
+    for text in resume_parser.iter_pdf_pages("resume.pdf", timeout=2, workers=1):
+        pages.append(text)
+        time.sleep(1)  # the consumer is slower than the deadline
+    assert len(pages) == len(PAGES)
+
+
+def test_unsupported_document_type(resume_parser):
+    with pytest.raises(ValueError):
+        resume_parser.iter_document_text("resume.txt", ".txt")
@@ -0,0 +1,223 @@
+import importlib
+import io
+import os
+import sys
+import threading
+import time
+import types
+from collections import defaultdict
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FileExists(Exception):
+    pass
+
+
+def _matches(doc, query):
+    for key, value in query.items():
+        if isinstance(value, dict):
+            if "$lte" in value and not doc.get(key, 0) <= value["$lte"]:
+                return False
+            if "$exists" in value and (key in doc) != value["$exists"]:
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+
+class FakeCollection:
+    """Just the pymongo calls resume_store makes."""
+
+    def __init__(self):
+        self.docs = []
+
+    def create_index(self, keys, unique=False):
+        pass
+
+    def find_one(self, query):
+        return next((doc for doc in self.docs if _matches(doc, query)), None)
+
+    def find(self, query):
+        return [doc for doc in self.docs if _matches(doc, query)]
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        upserted_id = None
+        if doc is None:
+            if not upsert:
+                return types.SimpleNamespace(upserted_id=None, modified_count=0)
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.update(update.get("$setOnInsert", {}))
+            self.docs.append(doc)
+            upserted_id = doc.setdefault("_id", len(self.docs))
+        doc.update(update.get("$set", {}))
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+        for key in update.get("$unset", {}):
+            doc.pop(key, None)
+        return types.SimpleNamespace(upserted_id=upserted_id, modified_count=int(upserted_id is None))
+
+    def delete_one(self, query):
+        doc = self.find_one(query)
+        if doc is not None:
+            self.docs.remove(doc)
+        return types.SimpleNamespace(deleted_count=int(doc is not None))
+
+    def delete_many(self, query):
+        self.docs = [doc for doc in self.docs if not _matches(doc, query)]
+
+
+class FakeGridFS:
+    def __init__(self):
+        self.files = {}
+        self.puts = 0
+
+    def exists(self, file_id):
+        return file_id in self.files
+
+    def put(self, data, _id, **kwargs):
+        if _id in self.files:
+            raise FileExists(_id)
+        self.puts += 1
+        self.files[_id] = data.read()
+
+    def get(self, file_id):
+        return io.BytesIO(self.files[file_id])
+
+    def delete(self, file_id):
+        self.files.pop(file_id, None)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    gridfs_mod = types.ModuleType("gridfs")
+    gridfs_mod.GridFS = object
+    errors_mod = types.ModuleType("gridfs.errors")
+    errors_mod.FileExists = FileExists
+    pymongo_mod = types.ModuleType("pymongo")
+    pymongo_mod.MongoClient = object
+    monkeypatch.setitem(sys.modules, "pymongo", pymongo_mod)
+    monkeypatch.setitem(sys.modules, "gridfs", gridfs_mod)
+    monkeypatch.setitem(sys.modules, "gridfs.errors", errors_mod)
+    module = importlib.import_module("backend.utils.resume_store")
+    db = defaultdict(FakeCollection)
+    fs = FakeGridFS()
+    monkeypatch.setattr(module, "candidate_db", lambda: types.SimpleNamespace(
+        resume_uploads=db["uploads"], resume_blobs=db["blobs"], resume_latest=db["latest"]
+    ))
+    monkeypatch.setattr(module, "candidate_gridfs", lambda: fs)
+    module.fs, module.db = fs, db
+    return module
+
+
+def test_repeat_uploads_are_written_once(store):
+    first = store.store_resume(io.BytesIO(b"%PDF resume v1"), "a@x.com", "cv.pdf")
+    again = store.store_resume(io.BytesIO(b"%PDF resume v1"), "a@x.com", "cv.pdf")
+    other = store.store_resume(io.BytesIO(b"%PDF resume v1"), "b@x.com", "mine.pdf")
+
+    assert first["stored"] and not again["stored"] and not other["stored"]
+    assert first["sha256"] == again["sha256"] == other["sha256"]
+    assert store.fs.puts == 1
+    assert store.db["blobs"].docs[0]["refcount"] == 2
+
+
+def test_latest_version_is_returned(store):
+    store.store_resume(io.BytesIO(b"v1"), "a@x.com", "cv.pdf")
+    store.store_resume(io.BytesIO(b"v2"), "a@x.com", "cv.pdf")
+    store.store_resume(io.BytesIO(b"letter"), "a@x.com", "letter.pdf", document="cover_letter")
+
+    assert store.read_resume("a@x.com") == b"v2"
+    assert store.read_resume("a@x.com", "cover_letter") == b"letter"
+    assert store.latest_resume("a@x.com")["filename"] == "cv.pdf"
+
+
+def test_blobs_are_deleted_with_their_last_reference(store):
+    shared = store.store_resume(io.BytesIO(b"same"), "a@x.com", "cv.pdf")["sha256"]
+    store.store_resume(io.BytesIO(b"same"), "b@x.com", "cv.pdf")
+    store.store_resume(io.BytesIO(b"only a"), "a@x.com", "old.pdf")
+
+    assert store.delete_user_files("a@x.com") == 1
+    assert list(store.fs.files) == [shared]
+    assert store.delete_user_files("b@x.com") == 1
+    assert store.fs.files == {}
+    with pytest.raises(RuntimeError):
+        store.read_resume("b@x.com", "cover_letter")
+
+
+def test_byte_ranges(store):
+    assert store.byte_range(None, 100) is None
+    assert store.byte_range("bytes=0-9", 100) == (0, 9)
+    assert store.byte_range("bytes=90-", 100) == (90, 99)
+    assert store.byte_range("bytes=-10", 100) == (90, 99)
+    assert store.byte_range("bytes=50-500", 100) == (50, 99)
+    assert store.byte_range("bytes=0-1,5-6", 100) is None
+    assert store.byte_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        store.byte_range("bytes=100-", 100)
+
+
+def test_range_is_read_in_blocks(store, monkeypatch):
+    monkeypatch.setattr(store, "READ_CHUNK_BYTES", 4)
+    stream = io.BytesIO(b"0123456789abcdef")
+    assert list(store.iter_range(stream, 2, 11)) == [b"2345", b"6789", b"ab"]
+
+
+def test_etag_matches_lists_wildcards_and_weak_tags(store):
+    etag = '"abc"'
+    assert store.etag_matches('"abc"', etag)
+    assert store.etag_matches('"x", W/"abc"', etag)
+    assert store.etag_matches("*", etag)
+    assert not store.etag_matches('"abcd"', etag)
+    assert not store.etag_matches('"ab"', etag)  # not a substring test
+    assert not store.etag_matches(None, etag)
+
+
+def test_content_disposition_is_latin1_safe(store):
+    assert store.content_disposition("cv.pdf") == 'attachment; filename="cv.pdf"'
+    value = store.content_disposition('简历 "final".pdf')
+    value.encode("latin-1")
+    assert value == (
+        'attachment; filename="__ _final_.pdf"; '
+        "filename*=UTF-8''%E7%AE%80%E5%8E%86%20%22final%22.pdf"
+    )
+
+
+def test_upload_takes_its_reference_before_the_exists_check(store, monkeypatch):
+    store.store_resume(io.BytesIO(b"same"), "a@x.com", "cv.pdf")
+    exists = store.fs.exists
+
+    def delete_other_user_first(file_id):
+        # The last other reference goes between the check and the write.
+        store.delete_user_files("a@x.com")
+        return exists(file_id)
+
+    monkeypatch.setattr(store.fs, "exists", delete_other_user_first)
+    assert not store.store_resume(io.BytesIO(b"same"), "b@x.com", "cv.pdf")["stored"]
+    assert store.read_resume("b@x.com") == b"same"
+
+
+def test_upload_during_a_release_writes_the_file_again(store, monkeypatch):
+    sha256 = store.store_resume(io.BytesIO(b"same"), "a@x.com", "cv.pdf")["sha256"]
+    delete = store.fs.delete
+    uploads = []
+
+    def slow_delete(file_id):
+        upload = threading.Thread(target=lambda: uploads.append(
+            store.store_resume(io.BytesIO(b"same"), "b@x.com", "cv.pdf")
+        ))
+        upload.start()
+        time.sleep(0.2)  # the upload waits for the release to finish
+        assert not uploads
+        delete(file_id)
+        store.upload = upload
+
+    monkeypatch.setattr(store.fs, "delete", slow_delete)
+    assert store.delete_user_files("a@x.com") == 0
+    store.upload.join(5)
+    assert uploads[0]["stored"]
+    assert store.read_resume("b@x.com") == b"same"
+    [blob] = store.db["blobs"].docs
+    assert blob["_id"] == sha256 and blob["refcount"] == 1 and "deleting" not in blob
@@ -0,0 +1,53 @@
+from importlib.machinery import PathFinder
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import startup
+
+# Light dependencies of the API import graph, stubbed when not installed.
+STUBS = {
+    "pymongo": "class MongoClient:\n    pass\n",
+    "gridfs": "class GridFS:\n    pass\n",
+    "pdfplumber": "",
+    "docx": "",
+    "bs4": "class BeautifulSoup:\n    pass\n",
+}
+
+
+def test_api_imports_within_budget_without_models(tmp_path):
+    stubs = tmp_path / "stubs"
+    for name, source in STUBS.items():
+        # Installed on disk? (Other tests may leave stubs in sys.modules.)
+        if PathFinder.find_spec(name) is None:
+            (stubs / name).mkdir(parents=True)
+            (stubs / name / "__init__.py").write_text(source)
+    model = tmp_path / "models" / "missing.gguf"
+
+    report = startup.import_report(
+        "app.main",
+        extra_paths=[str(stubs)],
+        env={
+            "MODEL_PATH": str(model),
+            # Auto-download stays on: importing must not try it.
+            "MODEL_AUTO_DOWNLOAD": "true",
+            "MODEL_URL": "http://127.0.0.1:9/missing.gguf",
+            "INGEST_QUEUE_DIR": str(tmp_path / "ingest"),
+        },
+    )
+
+    assert report["heavy"] == []
+    assert not report["over_budget"], report["slowest"]
+    assert not model.exists()
+    assert report["slowest"][0]["seconds"] >= report["seconds"] > 0
+
+
+def test_importtime_parsing():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     json.decoder\n"
+        "import time:       300 |        420 |   json\n"
+        "import time:        80 |       2500 | app.main\n"
+    )
+    assert startup._parse_importtime(stderr) == {"json.decoder": 120, "json": 420, "app.main": 2500}
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import generation_cache, inference, tailoring
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_PATH", str(tmp_path / "generations.sqlite"))
+    monkeypatch.setattr(generation_cache, "_cache", None)
+
+
+class RecordingBackend:
+    name = "recording"
+    slots = 2
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def complete(self, prompt, max_tokens, temperature, stop, prefix=None):
+        with self.lock:
+            self.calls.append((prompt, prefix))
+        return inference.GenerationResult(f" {prompt[-40:]} ", 0, 1, 0.0)
+
+
+def test_documents_share_the_resume_prefix():
+    backend = RecordingBackend()
+    scheduler = inference.InferenceScheduler(backend)
+    jobs = [{"title": f"Engineer {n}", "company": "Acme", "requirements": "Python"} for n in range(3)]
+    try:
+        documents = tailoring.tailor_documents("Ten years of Python.", jobs, scheduler=scheduler)
+    finally:
+        scheduler.shutdown(5)
+
+    prefix = tailoring.tailoring_prefix("Ten years of Python.")
+    assert [(d["job"]["title"], d["kind"]) for d in documents] == [
+        (f"Engineer {n}", kind) for n in range(3) for kind in ("resume", "cover_letter")
+    ]
+    assert all(d["text"] == d["text"].strip() for d in documents)
+    assert len(backend.calls) == 6
+    for prompt, passed_prefix in backend.calls:
+        assert passed_prefix == prefix and prompt.startswith(prefix)
+        assert "Ten years of Python." not in prompt[len(prefix):]
+
+
+class FailingBackend(RecordingBackend):
+    def complete(self, prompt, max_tokens, temperature, stop, prefix=None):
+        if "Engineer 0" in prompt:
+            raise RuntimeError("decode failed")
+        return super().complete(prompt, max_tokens, temperature, stop, prefix)
+
+
+def test_completed_documents_are_cached_when_one_fails():
+    jobs = [{"title": f"Engineer {n}", "company": "Acme", "requirements": "Python"} for n in range(3)]
+    scheduler = inference.InferenceScheduler(FailingBackend())
+    try:
+        with pytest.raises(RuntimeError):
+            tailoring.tailor_documents("Ten years of Python.", jobs, scheduler=scheduler)
+    finally:
+        scheduler.shutdown(5)
+
+    backend = RecordingBackend()
+    scheduler = inference.InferenceScheduler(backend)
+    try:
+        documents = tailoring.tailor_documents("Ten years of Python.", jobs, scheduler=scheduler)
+    finally:
+        scheduler.shutdown(5)
+    # Only the two documents of the failed job are generated again.
+    assert len(backend.calls) == 2
+    assert [d["cached"] for d in documents] == [False, False, True, True, True, True]
+
+
+class StuckBackend(RecordingBackend):
+    slots = 4
+
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    def complete(self, prompt, max_tokens, temperature, stop, prefix=None):
+        self.release.wait(5)
+        return super().complete(prompt, max_tokens, temperature, stop, prefix)
+
+
+def test_all_generations_share_one_deadline(monkeypatch):
+    monkeypatch.setenv("INFERENCE_TIMEOUT_SECONDS", "0.3")
+    release = threading.Event()
+    scheduler = inference.InferenceScheduler(StuckBackend(release))
+    jobs = [{"title": f"Engineer {n}", "company": "Acme"} for n in range(2)]
+    started = time.monotonic()
+    try:
+        with pytest.raises(TimeoutError):
+            tailoring.tailor_documents("Ten years of Python.", jobs, scheduler=scheduler)
+        # Four stuck documents: one deadline, not one per document.
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        scheduler.shutdown(5)
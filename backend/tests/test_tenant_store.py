@@ -0,0 +1,200 @@
+import importlib
+import os
+import pickle
+import sys
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class FakeFlatL2:
+    def __init__(self, d):
+        self.d = d
+
+
+class FakeIDSelectorRange:
+    def __init__(self, imin, imax):
+        self.imin, self.imax = imin, imax
+
+    def mask(self, ids):
+        return (ids >= self.imin) & (ids < self.imax)
+
+
+class FakeSearchParameters:
+    def __init__(self, sel=None):
+        self.sel = sel
+
+
+class FakeIDMap2:
+    """Brute-force squared-L2 index with ids and selectors, like faiss.IndexIDMap2."""
+
+    def __init__(self, inner):
+        self.ids = np.zeros(0, dtype="int64")
+        self.vectors = np.zeros((0, inner.d), dtype="float32")
+
+    @property
+    def ntotal(self):
+        return len(self.ids)
+
+    def add_with_ids(self, vectors, ids):
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.ids = np.concatenate([self.ids, ids])
+
+    def remove_ids(self, selector):
+        mask = selector.mask(self.ids) if isinstance(selector, FakeIDSelectorRange) else np.isin(self.ids, selector)
+        keep = ~mask
+        self.ids, self.vectors = self.ids[keep], self.vectors[keep]
+        return int((~keep).sum())
+
+    def reconstruct(self, key):
+        return self.vectors[list(self.ids).index(key)]
+
+    def search(self, queries, k, params=None):
+        allowed = params.sel.mask(self.ids) if params is not None else np.ones(len(self.ids), dtype=bool)
+        ids, vectors = self.ids[allowed], self.vectors[allowed]
+        distances = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        order = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, order, axis=1), ids[order]
+
+
+@pytest.fixture
+def tenant_store(monkeypatch):
+    faiss_mod = types.ModuleType("faiss")
+    faiss_mod.IndexFlatL2 = FakeFlatL2
+    faiss_mod.IndexIDMap2 = FakeIDMap2
+    faiss_mod.IDSelectorRange = FakeIDSelectorRange
+    faiss_mod.SearchParameters = FakeSearchParameters
+
+    def write_index(index, path):
+        with open(path, "wb") as f:
+            pickle.dump(index, f)
+
+    def read_index(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    faiss_mod.write_index = write_index
+    faiss_mod.read_index = read_index
+    monkeypatch.setitem(sys.modules, "faiss", faiss_mod)
+    return importlib.import_module("backend.utils.tenant_store")
+
+
+def test_tenants_are_isolated(tenant_store, tmp_path):
+    store = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    store.add("a@x.com", ["python", "sql"], np.array([[1, 0], [0, 1]]), "m")
+    store.add("b@x.com", ["java"], np.array([[1, 0.1]]), "m")
+
+    assert store.texts("a@x.com") == ["python", "sql"]
+    assert store.vectors("b@x.com").tolist() == [[1.0, pytest.approx(0.1)]]
+    distances, chunks = store.search("a@x.com", np.array([[1, 0.1]]), k=2)
+    assert chunks == [["python", "sql"]]
+    assert distances[0][0] == pytest.approx(0.01)
+    assert store.stats() == {"shards": 1, "tenants": 2, "chunks": 3}
+
+
+def test_delete_tenant_and_reopen(tenant_store, tmp_path):
+    store = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=2)
+    store.add("a@x.com", ["python"], np.array([[1, 0]]), "m")
+    store.add("b@x.com", ["java"], np.array([[0, 1]]), "m")
+
+    assert store.delete_tenant("a@x.com") == 1
+    assert store.delete_tenant("a@x.com") == 0
+    assert not store.has_tenant("a@x.com")
+
+    reopened = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=2)
+    assert reopened.has_tenant("b@x.com")
+    assert reopened.search("b@x.com", np.array([[0, 1]]))[1] == [["java"]]
+
+
+def test_stale_model_is_reembedded(tenant_store, tmp_path, monkeypatch):
+    store = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    store.add("a@x.com", ["python"], np.array([[1, 0]]), "old:model")
+    calls = []
+    monkeypatch.setattr(store, "reembed_tenant", lambda email, spec: calls.append(email))
+
+    assert store.ensure_tenant_current("a@x.com") is True
+    assert calls == ["a@x.com"]
+
+    monkeypatch.setenv("EMBED_REEMBED_ON_MISMATCH", "false")
+    with pytest.raises(RuntimeError):
+        store.ensure_tenant_current("a@x.com")
+
+
+def test_update_applies_an_ingest_plan(tenant_store, tmp_path):
+    from backend.utils.resume_chunks import plan_ingest
+
+    store = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    plan = plan_ingest([], "resume", ["python", "sql"])
+    store.update("a@x.com", plan.add, np.array([[1, 0], [0, 1]]), "m")
+    store.add("a@x.com", ["letter"], np.array([[1, 1]]), "m", document_id="cover_letter")
+
+    plan = plan_ingest(store.stored_chunks("a@x.com"), "resume", ["python", "rust"])
+    assert [c.text for c in plan.add] == ["rust"] and len(plan.delete) == 1
+    store.update("a@x.com", plan.add, np.array([[0.5, 0.5]]), "m", delete=plan.delete)
+
+    assert store.texts("a@x.com") == ["python", "letter", "rust"]
+    assert store.search("a@x.com", np.array([[0, 1]]), k=3)[1] == [["rust", "letter", "python"]]
+
+
+def test_failed_write_leaves_neither_rows_nor_vectors(tenant_store, tmp_path, monkeypatch):
+    store = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    store.add("a@x.com", ["python"], np.array([[1, 0]]), "m")
+
+    def fail(self, conn, faiss_ids, added):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(tenant_store._Shard, "log", fail)
+        with pytest.raises(OSError):
+            store.add("a@x.com", ["sql"], np.array([[0, 1]]), "m")
+    assert store.texts("a@x.com") == ["python"]
+    assert store.search("a@x.com", np.array([[0, 1]]), k=2)[1] == [["python"]]
+
+
+def test_other_processes_replay_the_log(tenant_store, tmp_path, monkeypatch):
+    writer = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    reader = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    writer.add("a@x.com", ["python"], np.array([[1, 0]]), "m")
+    assert reader.search("a@x.com", np.array([[1, 0]]))[1] == [["python"]]
+
+    writer.add("a@x.com", ["sql"], np.array([[0, 1]]), "m")
+    writer.delete_tenant("b@x.com")
+    assert reader.search("a@x.com", np.array([[0, 1]]))[1] == [["sql"]]
+    # Uploads only append to the SQLite log; no index file was rewritten.
+    assert [name for name in os.listdir(tmp_path / "shard-000") if name.endswith(".faiss")] == []
+
+    monkeypatch.setenv("TENANT_CHECKPOINT_OPS", "2")
+    for n in range(4):
+        writer.add("b@x.com", [f"skill {n}"], np.array([[n, n]]), "m")
+    checkpoints = [name for name in os.listdir(tmp_path / "shard-000") if name.endswith(".faiss")]
+    assert 1 <= len(checkpoints) <= 2
+    fresh = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    assert fresh.search("b@x.com", np.array([[3, 3]]))[1] == [["skill 3"]]
+    assert reader.search("a@x.com", np.array([[1, 0]]), k=2)[1] == [["python", "sql"]]
+
+
+def test_legacy_shard_index_is_moved_into_sqlite(tenant_store, tmp_path):
+    import sqlite3
+
+    store = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    store.add("a@x.com", ["python", "sql"], np.array([[1, 0], [0, 1]]), "m")
+    shard_dir = tmp_path / "shard-000"
+    # Rewrite the shard in the layout used before the change log.
+    legacy = FakeIDMap2(FakeFlatL2(2))
+    with sqlite3.connect(shard_dir / "meta.sqlite") as conn:
+        for chunk_id, tenant_id, vector in conn.execute("SELECT id, tenant_id, vector FROM chunks").fetchall():
+            legacy.add_with_ids(np.frombuffer(vector, dtype="float32")[None, :], np.array([(tenant_id << 32) | chunk_id]))
+        conn.execute("UPDATE chunks SET vector = NULL")
+        conn.execute("DELETE FROM log")
+        conn.execute("DELETE FROM meta")
+    with open(shard_dir / "vectors.faiss", "wb") as f:
+        pickle.dump(legacy, f)
+
+    reopened = tenant_store.TenantVectorStore(str(tmp_path), dimension=2, shards=1)
+    assert reopened.search("a@x.com", np.array([[0, 1]]))[1] == [["sql"]]
+    assert reopened.vectors("a@x.com").tolist() == [[1, 0], [0, 1]]
+    assert not (shard_dir / "vectors.faiss").exists()
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+np = pytest.importorskip("numpy")
+
+from backend.utils.vector_scoring import embed_queries, nearest_scores
+
+
+def brute_force_min_l2(queries, vectors):
+    return np.array([min(float(((q - v) ** 2).sum()) for v in vectors) for q in queries])
+
+
+def test_numpy_scores_match_brute_force():
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(50, 8)).astype("float32")
+    vectors = rng.normal(size=(5, 8)).astype("float32")
+
+    scores = nearest_scores(queries, vectors)
+
+    assert scores.shape == (50,)
+    assert np.allclose(scores, brute_force_min_l2(queries, vectors), rtol=1e-4, atol=1e-4)
+
+
+def test_index_like_object_uses_single_search():
+    class FakeIndex:
+        ntotal = 2
+
+        def __init__(self):
+            self.calls = 0
+
+        def search(self, queries, k):
+            self.calls += 1
+            distances = np.full((len(queries), k), 0.8, dtype="float32")
+            ids = np.zeros((len(queries), k), dtype="int64")
+            ids[-1, 0] = -1
+            return distances, ids
+
+    index = FakeIndex()
+    scores = nearest_scores(np.ones((3, 4), dtype="float32"), index)
+
+    assert index.calls == 1
+    assert scores.tolist() == pytest.approx([0.8, 0.8, 0.0])
+
+
+def test_empty_inputs_score_zero():
+    assert nearest_scores(np.zeros((0, 4), dtype="float32"), np.ones((2, 4))).shape == (0,)
+    assert nearest_scores(np.ones((2, 4), dtype="float32"), np.zeros((0, 4))).tolist() == [0, 0]
+
+
+def test_embed_queries_batches_with_query_embed():
+    class Backend:
+        def __init__(self):
+            self.batches = []
+
+        def query_embed(self, texts):
+            self.batches.append(list(texts))
+            return [[float(len(t)), 1.0] for t in texts]
+
+    class Model:
+        _model = Backend()
+
+    model = Model()
+    out = embed_queries(model, ["a", "bb", "ccc"], batch_size=2)
+
+    assert out.dtype == np.float32
+    assert out[:, 0].tolist() == [1.0, 2.0, 3.0]
+    assert model._model.batches == [["a", "bb"], ["ccc"]]
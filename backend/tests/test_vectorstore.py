@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.utils import vectorstore  # noqa: E402
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "faiss_index"
+    for user in ("a@x.com", "b@x.com"):
+        (root / vectorstore.VERSIONS_DIR / user / "v1").mkdir(parents=True)
+        os.symlink(root / vectorstore.VERSIONS_DIR / user / "v1", root / user)
+    (tmp_path / "keep.txt").write_text("app data")
+    return root
+
+
+@pytest.mark.parametrize("email", ["", ".", "..", "../x", "a/b", "a\\b", "a\0b"])
+def test_emails_cannot_escape_the_root(root, email):
+    with pytest.raises(ValueError):
+        vectorstore.remove_user_dir(str(root), email)
+    assert (root.parent / "keep.txt").exists()
+    assert sorted(os.listdir(root)) == [vectorstore.VERSIONS_DIR, "a@x.com", "b@x.com"]
+
+
+def test_symlinked_user_dirs_outside_the_root_are_not_removed(root, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    os.symlink(outside, root / vectorstore.VERSIONS_DIR / "evil@x.com")
+    vectorstore.remove_user_dir(str(root), "evil@x.com")
+    assert outside.exists()
+
+
+def test_user_dir_and_versions_are_removed(root):
+    assert vectorstore.remove_user_dir(str(root), "a@x.com")
+    assert sorted(os.listdir(root)) == [vectorstore.VERSIONS_DIR, "b@x.com"]
+    assert os.listdir(root / vectorstore.VERSIONS_DIR) == ["b@x.com"]
+    assert not vectorstore.remove_user_dir(str(root), "a@x.com")
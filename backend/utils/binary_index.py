@@ -0,0 +1,360 @@
+"""Compact per-user resume index: memory-mapped vectors plus SQLite nodes.
+
+`index.storage_context.persist()` writes the LlamaIndex docstore and index
+store as JSON (with every chunk's embedding as text), and the matcher has to
+parse all of it before it can score anything. The binary layout keeps the
+same `faiss_index/<email>/` directory but stores:
+
+- `vectors-<segment>.npy` - append-only float32 `(n, dim)` segments, opened
+  with `np.load(mmap_mode="r")`, so loading costs an mmap, not a parse,
+- `nodes.sqlite` - one row per live chunk (stable chunk id, document id,
+  text hash, zlib-compressed text, JSON metadata and its segment/row), read
+  only when the query-engine path needs the texts,
+- `embedding.json` - the usual model fingerprint
+  (`backend.utils.embedding_service`).
+
+An upload writes its new vectors as a new segment file and then commits one
+SQLite transaction that inserts the new chunks and deletes the superseded
+ones (see `backend.utils.resume_chunks`). That commit is the atomic swap:
+readers see either the old or the new set of chunks, never a mix, and the
+cost is proportional to the uploaded document. Segments no longer
+referenced are deleted after the commit; once more than
+`BINARY_MAX_SEGMENTS` (default 8) are live they are compacted into one.
+
+Select this layout with `VECTOR_STORE_BACKEND=binary` (see
+`backend.utils.vectorstore`). Existing JSON directories are converted on
+first use, or all at once with:
+
+    python -m backend.utils.binary_index convert [--source faiss_index]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.utils.model_registry import ModelSpec, embedding_spec, registry
+from backend.utils.resume_chunks import DEFAULT_DOCUMENT_ID, Chunk, chunk_hash, make_chunks
+from backend.utils.vectorstore import VERSIONS_DIR
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+NODES_FILE = "nodes.sqlite"
+LEGACY_VECTOR_STORE_FILE = "default__vector_store.json"
+_SEGMENT_RE = re.compile(r"^vectors-(\d+)\.npy$")
+
+_dir_locks: Dict[str, threading.Lock] = {}
+_dir_locks_lock = threading.Lock()
+
+
+def _segment_path(user_dir: str, segment: int) -> str:
+    return os.path.join(user_dir, f"vectors-{segment:06d}.npy")
+
+
+def has_binary_index(user_dir: str) -> bool:
+    return os.path.exists(os.path.join(user_dir, NODES_FILE))
+
+
+def _connect(user_dir: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(user_dir, NODES_FILE), timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, dimension INTEGER NOT NULL)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS nodes ("
+        " position INTEGER PRIMARY KEY, node_id TEXT NOT NULL UNIQUE, document_id TEXT NOT NULL,"
+        " chunk_hash TEXT NOT NULL, text BLOB NOT NULL, metadata TEXT,"
+        " segment INTEGER NOT NULL, row INTEGER NOT NULL)"
+    )
+    return conn
+
+
+@contextmanager
+def _writing(user_dir: str) -> Iterator[sqlite3.Connection]:
+    # Thread lock plus a file lock: several API workers may ingest for one user.
+    key = os.path.abspath(user_dir)
+    with _dir_locks_lock:
+        lock = _dir_locks.setdefault(key, threading.Lock())
+    os.makedirs(user_dir, exist_ok=True)
+    with lock, open(os.path.join(user_dir, "write.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        conn = _connect(user_dir)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def _write_segment(user_dir: str, conn: sqlite3.Connection, vectors: np.ndarray) -> int:
+    """Write `vectors` as a new, not yet referenced segment file; returns its number."""
+    on_disk = [int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(user_dir)) if m]
+    in_db = conn.execute("SELECT MAX(id) FROM segments").fetchone()[0] or 0
+    segment = max(on_disk + [in_db]) + 1
+    tmp_path = _segment_path(user_dir, segment) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp_path, _segment_path(user_dir, segment))
+    return segment
+
+
+def _drop_unused_segments(user_dir: str, conn: sqlite3.Connection) -> None:
+    with conn:
+        conn.execute("DELETE FROM segments WHERE id NOT IN (SELECT DISTINCT segment FROM nodes)")
+    live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    for name in os.listdir(user_dir):
+        match = _SEGMENT_RE.match(name)
+        if match and int(match.group(1)) not in live:
+            os.remove(os.path.join(user_dir, name))
+
+
+def update_binary_index(
+    user_dir: str,
+    chunks: Sequence[Chunk],
+    vectors: Any,
+    delete: Sequence[str] = (),
+    replace: bool = False,
+    metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+) -> int:
+    """Add `chunks` with their `vectors` and delete the chunk ids in `delete`
+    (every stored chunk with `replace=True`) in one commit; returns the live
+    chunk count.
+    """
+    metadata = list(metadata) if metadata is not None else [None] * len(chunks)
+    if chunks:
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if vectors.ndim != 2 or not len(chunks) == len(vectors) == len(metadata):
+            raise ValueError("chunks, metadata and (n, dim) vectors must have the same length")
+
+    with _writing(user_dir) as conn:
+        if chunks:
+            dimensions = {row[0] for row in conn.execute("SELECT dimension FROM segments")}
+            if not replace and dimensions - {vectors.shape[1]}:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match {dimensions} in {user_dir}")
+            segment = _write_segment(user_dir, conn, vectors)
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM nodes")
+            else:
+                conn.executemany("DELETE FROM nodes WHERE node_id = ?", [(node_id,) for node_id in delete])
+            if chunks:
+                conn.execute("INSERT INTO segments (id, dimension) VALUES (?, ?)", (segment, vectors.shape[1]))
+                conn.executemany(
+                    "INSERT INTO nodes (node_id, document_id, chunk_hash, text, metadata, segment, row)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            chunk.id, chunk.document_id, chunk.hash, zlib.compress(chunk.text.encode("utf-8")),
+                            json.dumps(meta) if meta else None, segment, row,
+                        )
+                        for row, (chunk, meta) in enumerate(zip(chunks, metadata))
+                    ],
+                )
+        _drop_unused_segments(user_dir, conn)
+        if conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0] > int(os.getenv("BINARY_MAX_SEGMENTS", "8")):
+            _compact(user_dir, conn)
+        return conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+
+def _compact(user_dir: str, conn: sqlite3.Connection) -> None:
+    """Rewrite the live vectors into one segment."""
+    vectors = _gather(user_dir, conn)
+    segment = _write_segment(user_dir, conn, vectors)
+    positions = [row[0] for row in conn.execute("SELECT position FROM nodes ORDER BY position")]
+    with conn:
+        conn.execute("INSERT INTO segments (id, dimension) VALUES (?, ?)", (segment, vectors.shape[1]))
+        conn.executemany(
+            "UPDATE nodes SET segment = ?, row = ? WHERE position = ?",
+            [(segment, row, position) for row, position in enumerate(positions)],
+        )
+    _drop_unused_segments(user_dir, conn)
+    logger.info("Compacted %s into segment %d", user_dir, segment)
+
+
+def write_binary_index(
+    user_dir: str,
+    texts: Sequence[str],
+    vectors: Any,
+    document_id: str = DEFAULT_DOCUMENT_ID,
+) -> int:
+    """Replace everything in `user_dir` with `texts` (one document) and their
+    `vectors`; duplicate texts are stored once. Returns the chunk count.
+    """
+    vectors = np.asarray(vectors, dtype="float32")
+    first = {}
+    for position, text in enumerate(texts):
+        first.setdefault(chunk_hash(text), position)
+    return update_binary_index(
+        user_dir, make_chunks(document_id, texts), vectors[sorted(first.values())], replace=True
+    )
+
+
+def _gather(user_dir: str, conn: sqlite3.Connection) -> np.ndarray:
+    rows = conn.execute("SELECT segment, row FROM nodes ORDER BY position").fetchall()
+    dimension = conn.execute("SELECT MAX(dimension) FROM segments").fetchone()[0] or 0
+    if not rows:
+        return np.zeros((0, dimension), dtype="float32")
+    segments = np.fromiter((segment for segment, _ in rows), dtype="int64", count=len(rows))
+    indices = np.fromiter((row for _, row in rows), dtype="int64", count=len(rows))
+    arrays = {int(s): np.load(_segment_path(user_dir, int(s)), mmap_mode="r") for s in np.unique(segments)}
+    if len(arrays) == 1:
+        (array,) = arrays.values()
+        if len(array) == len(indices) and np.array_equal(indices, np.arange(len(indices))):
+            return array  # the common case: no copy at all
+    out = np.empty((len(rows), dimension), dtype="float32")
+    for segment, array in arrays.items():
+        mask = segments == segment
+        out[mask] = array[indices[mask]]
+    return out
+
+
+def load_vectors(user_dir: str) -> np.ndarray:
+    """The user's live chunk vectors as an `(n, dim)` array, in chunk order.
+
+    A single fully live segment is returned as its read-only memory map.
+    """
+    conn = _connect(user_dir)
+    try:
+        try:
+            return _gather(user_dir, conn)
+        except FileNotFoundError:
+            # A concurrent writer compacted the segments between our reads.
+            return _gather(user_dir, conn)
+    finally:
+        conn.close()
+
+
+def stored_chunks(user_dir: str) -> List[Tuple[str, str, str]]:
+    """`(chunk id, document id, text hash)` of every stored chunk, in order."""
+    if not has_binary_index(user_dir):
+        return []
+    conn = _connect(user_dir)
+    try:
+        return conn.execute("SELECT node_id, document_id, chunk_hash FROM nodes ORDER BY position").fetchall()
+    finally:
+        conn.close()
+
+
+def load_chunks(user_dir: str) -> List[Chunk]:
+    conn = _connect(user_dir)
+    try:
+        rows = conn.execute("SELECT node_id, document_id, chunk_hash, text FROM nodes ORDER BY position").fetchall()
+    finally:
+        conn.close()
+    return [Chunk(node_id, document, text_hash, zlib.decompress(text).decode("utf-8")) for node_id, document, text_hash, text in rows]
+
+
+def load_texts(user_dir: str) -> List[str]:
+    return [chunk.text for chunk in load_chunks(user_dir)]
+
+
+def read_llama_dir(user_dir: str) -> Tuple[List[Any], Optional[np.ndarray], Optional[str]]:
+    """Nodes, their vectors (or None) and the `backend:model` of a JSON-persisted directory."""
+    import faiss
+    from llama_index.core.storage.docstore import SimpleDocumentStore
+    from llama_index.core.storage.index_store import SimpleIndexStore
+
+    from backend.utils.embedding_service import read_fingerprint
+
+    docs = SimpleDocumentStore.from_persist_dir(user_dir).docs
+    # FaissVectorStore assigns sequential FAISS positions; nodes_dict maps them to node ids.
+    structs = SimpleIndexStore.from_persist_dir(user_dir).index_structs()
+    nodes_dict = getattr(structs[0], "nodes_dict", {}) if structs else {}
+    stored = read_fingerprint(user_dir)
+    model = f"{stored['backend']}:{stored['model']}" if stored else None
+    try:
+        index = faiss.read_index(os.path.join(user_dir, LEGACY_VECTOR_STORE_FILE))
+    except Exception:
+        index = None
+    positions = sorted((int(pos), node_id) for pos, node_id in nodes_dict.items() if node_id in docs)
+    if index is not None and positions and index.ntotal > positions[-1][0]:
+        nodes = [docs[node_id] for _, node_id in positions]
+        vectors = np.stack([index.reconstruct(pos) for pos, _ in positions])
+        return nodes, vectors, model
+    # No usable vector mapping: keep the texts and re-embed them.
+    return list(docs.values()), None, None
+
+
+def reembed_binary_index(user_dir: str, spec: Optional[ModelSpec] = None, chunks: Optional[List[Chunk]] = None) -> int:
+    """Re-embed the stored (or given) chunks of `user_dir` with `spec`; returns the chunk count."""
+    from backend.utils.embedding_service import write_fingerprint
+
+    spec = spec or embedding_spec()
+    chunks = load_chunks(user_dir) if chunks is None else chunks
+    logger.info("Re-embedding %d chunks in %s with %s", len(chunks), user_dir, spec.name)
+    with registry.acquire(spec) as embed_model:
+        vectors = np.asarray(embed_model.get_text_embedding_batch([c.text for c in chunks]), dtype="float32")
+        count = update_binary_index(user_dir, chunks, vectors, replace=True)
+        # Written last: an interrupted rebuild is retried on the next call.
+        write_fingerprint(user_dir, spec, embed_model)
+    return count
+
+
+def convert_dir(user_dir: str) -> int:
+    """Convert a JSON-persisted LlamaIndex directory in place; returns the chunk count.
+
+    The JSON files are left alone, so the per-user backend can still read them.
+    """
+    from backend.utils.embedding_service import fingerprint_matches
+
+    nodes, vectors, _ = read_llama_dir(user_dir)
+    chunks, rows, seen = [], [], set()
+    for row, node in enumerate(nodes):
+        document_id = node.metadata.get("document_id") or DEFAULT_DOCUMENT_ID
+        (chunk,) = make_chunks(document_id, [node.get_content()])
+        if chunk.id not in seen:
+            seen.add(chunk.id)
+            chunks.append(chunk)
+            rows.append(row)
+    if vectors is None or not fingerprint_matches(user_dir):
+        return reembed_binary_index(user_dir, chunks=chunks)
+    count = update_binary_index(user_dir, chunks, vectors[rows], replace=True)
+    logger.info("Converted %s to the binary index format (%d chunks)", user_dir, count)
+    return count
+
+
+def ensure_binary_index(user_dir: str) -> bool:
+    """True if `user_dir` has a binary index, converting a JSON one on first use."""
+    if has_binary_index(user_dir):
+        return True
+    if not os.path.exists(os.path.join(user_dir, LEGACY_VECTOR_STORE_FILE)):
+        return False
+    convert_dir(user_dir)
+    return True
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert per-user indexes to the binary format.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert_cmd = sub.add_parser("convert", help="convert every faiss_index/<email>/ directory")
+    convert_cmd.add_argument("--source", default="faiss_index")
+    args = parser.parse_args(argv)
+
+    converted = 0
+    for email in sorted(os.listdir(args.source)):
+        user_dir = os.path.join(args.source, email)
+        if email == VERSIONS_DIR or not os.path.isdir(user_dir) or has_binary_index(user_dir):
+            continue
+        try:
+            convert_dir(user_dir)
+        except Exception:
+            logger.exception("Failed to convert %s", user_dir)
+            continue
+        converted += 1
+    print(f"Converted {converted} indexes.")
+
+
+if __name__ == "__main__":
+    main()
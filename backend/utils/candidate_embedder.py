@@ -1,50 +1,148 @@
-from llama_index.core.schema import Document
-from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core import Settings
-from llama_index.vector_stores.faiss import FaissVectorStore
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core import VectorStoreIndex
-from pymongo import MongoClient
-import os, faiss, gridfs
+"""Resume ingestion into the user's vector store.
+
+`embed_candidate` splits a document into chunks and applies it as a new
+version of `document_id` (see `backend.utils.resume_chunks`): only chunks
+whose text is not stored yet are embedded, chunks left over from the
+previous version of the same document are deleted, and other documents are
+kept. Vectors from another embedding model are not comparable, so a stale
+store is rebuilt from the new document instead.
+
+The `per_user` (LlamaIndex) backend is not append-only: its docstore and
+index are rewritten as a new version directory and swapped in through the
+`faiss_index/<email>` symlink. The `binary` and `tenant` backends only write
+the changed chunks.
+"""
+import os
 import logging
+from backend.utils.binary_index import ensure_binary_index, read_llama_dir, stored_chunks, update_binary_index
+from backend.utils.embedding_service import (
+    embedding_dimension,
+    fingerprint_matches,
+    ingest_lock,
+    user_ingest_lock,
+    write_fingerprint,
+)
+from backend.utils.model_registry import embedding_spec, registry
+from backend.utils.resume_chunks import DEFAULT_DOCUMENT_ID, chunk_hash, plan_ingest, split_chunks
+from backend.utils.tenant_store import model_key, tenant_store
+from backend.utils.vectorstore import new_version_dir, swap_user_dir, vector_store_backend
+from backend.utils.resume_store import store_resume_file
 
 logger = logging.getLogger(__name__)
 
+# Node metadata used for diffing uploads; kept out of the embedded and LLM text.
+_CHUNK_METADATA_KEYS = ["document_id", "chunk_hash"]
+
+
+def _embed_texts(embed_model, chunks):
+    return embed_model.get_text_embedding_batch([chunk.text for chunk in chunks]) if chunks else []
+
+
+def _log_plan(email, document_id, plan):
+    logger.info(
+        "Ingesting %s for %s: %d new chunks, %d deleted, %d kept",
+        document_id, email, len(plan.add), len(plan.delete), plan.kept,
+    )
+
+
+def _embed_candidate_tenant(email, text, document_id):
+    spec = embedding_spec()
+    store = tenant_store()
+    # Plan and commit under one lock: a plan is only valid for the state it was read from.
+    with ingest_lock(os.path.join(store.root, "locks", f"{email}.lock")):
+        # Vectors from another embedding model are not comparable; start over.
+        current = store.tenant_model(email) in (None, model_key(spec))
+        plan = plan_ingest(store.stored_chunks(email) if current else [], document_id, split_chunks(text))
+        _log_plan(email, document_id, plan)
+        with registry.acquire(spec) as embed_model:
+            vectors = _embed_texts(embed_model, plan.add)
+        return store.update(email, plan.add, vectors, model_key(spec), delete=plan.delete, replace=not current)
 
-def embed_candidate(email, text):
-    document = Document(text=text)
-    embed_model = HuggingFaceEmbedding(model_name="hkunlp/instructor-xl")
-    node_parser = SentenceSplitter(chunk_size=512, chunk_overlap=50)
-    Settings.embed_model = embed_model
-    Settings.node_parser = node_parser
+
+def _embed_candidate_binary(email, text, document_id):
+    user_index_dir = os.path.join("faiss_index", email)
+    spec = embedding_spec()
+    with user_ingest_lock(user_index_dir):
+        current = fingerprint_matches(user_index_dir, spec) and ensure_binary_index(user_index_dir)
+        plan = plan_ingest(stored_chunks(user_index_dir) if current else [], document_id, split_chunks(text))
+        _log_plan(email, document_id, plan)
+        with registry.acquire(spec) as embed_model:
+            vectors = _embed_texts(embed_model, plan.add)
+            count = update_binary_index(user_index_dir, plan.add, vectors, delete=plan.delete, replace=not current)
+            write_fingerprint(user_index_dir, spec, embed_model)
+    return count
+
+
+def _embed_candidate_llama(email, text, document_id):
+    # Deferred: only this backend needs LlamaIndex and FAISS.
+    import faiss
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from llama_index.core.schema import TextNode
+    from llama_index.vector_stores.faiss import FaissVectorStore
 
     user_index_dir = os.path.join("faiss_index", email)
     logger.info("Index path: %s", user_index_dir)
-    index_path = os.path.join(user_index_dir, "index.faiss")
-    os.makedirs(user_index_dir, exist_ok=True)
+    spec = embedding_spec()
+
+    with user_ingest_lock(user_index_dir):
+        nodes, vectors = [], None
+        # Vectors from another embedding model are not comparable; start over.
+        if os.path.exists(os.path.join(user_index_dir, "default__vector_store.json")) and fingerprint_matches(user_index_dir, spec):
+            nodes, vectors, _ = read_llama_dir(user_index_dir)
+            if vectors is None:
+                nodes = []
+        existing = [
+            (position, node.metadata.get("document_id"), node.metadata.get("chunk_hash") or chunk_hash(node.get_content()))
+            for position, node in enumerate(nodes)
+        ]
+        plan = plan_ingest(existing, document_id, split_chunks(text))
+        _log_plan(email, document_id, plan)
+        if not plan.add and not plan.delete and nodes:
+            return len(nodes)
+
+        deleted = set(plan.delete)
+        kept = []
+        for position, node in enumerate(nodes):
+            if position not in deleted:
+                node.embedding = vectors[position].tolist()
+                kept.append(node)
+
+        with registry.acquire(spec) as embed_model:
+            added = [
+                TextNode(
+                    id_=chunk.id,
+                    text=chunk.text,
+                    embedding=vector,
+                    metadata={"document_id": chunk.document_id, "chunk_hash": chunk.hash},
+                    excluded_embed_metadata_keys=_CHUNK_METADATA_KEYS,
+                    excluded_llm_metadata_keys=_CHUNK_METADATA_KEYS,
+                )
+                for chunk, vector in zip(plan.add, _embed_texts(embed_model, plan.add))
+            ]
+            # Kept nodes reuse their stored vectors; only `added` was embedded.
+            faiss_index = faiss.IndexFlatL2(embedding_dimension(spec, embed_model))
+            storage_context = StorageContext.from_defaults(vector_store=FaissVectorStore(faiss_index=faiss_index))
+            index = VectorStoreIndex(kept + added, storage_context=storage_context, embed_model=embed_model)
+
+            new_dir = new_version_dir(user_index_dir)
+            index.storage_context.persist(persist_dir=new_dir)
+            faiss.write_index(faiss_index, os.path.join(new_dir, "index.faiss"))
+            write_fingerprint(new_dir, spec, embed_model)
+        swap_user_dir(new_dir, user_index_dir)
 
-    if os.path.exists(index_path):
-        logger.info("Loading existing FAISS index from: %s", index_path)
-        faiss_index = faiss.read_index(index_path)
-    else:
-        logger.info("Creating new FAISS index for: %s", email)
-        faiss_index = faiss.IndexFlatL2(768)
+    return len(kept) + len(added)
 
-    faiss_store = FaissVectorStore(faiss_index=faiss_index)
-    index = VectorStoreIndex.from_documents([document], vector_store=faiss_store)
-    index.storage_context.persist(persist_dir=user_index_dir)
-    faiss.write_index(faiss_index, index_path)
 
-    return index
+def embed_candidate(email, text, document_id=DEFAULT_DOCUMENT_ID):
+    backend = vector_store_backend()
+    if backend == "tenant":
+        return _embed_candidate_tenant(email, text, document_id)
+    if backend == "binary":
+        return _embed_candidate_binary(email, text, document_id)
+    return _embed_candidate_llama(email, text, document_id)
 
 
-def store_file_in_mongodb(file_path, email):
+def store_file_in_mongodb(file_path, email, filename=None, document_id=DEFAULT_DOCUMENT_ID):
+    """Store the file content-addressed (see `backend.utils.resume_store`); returns its SHA-256."""
     logger.info("Storing file in MongoDB: %s", file_path)
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://mongodb:27017/")
-    client = MongoClient(mongo_uri)
-    db = client[os.getenv("DB_NAME", "candidate_data")]
-    fs = gridfs.GridFS(db)
-    with open(file_path, "rb") as f:
-        file_id = fs.put(f, filename=os.path.basename(file_path), email=email)
-    logger.info("File stored with ID: %s", file_id)
-    return file_id
+    return store_resume_file(file_path, email, filename, document_id)["sha256"]
@@ -4,27 +4,363 @@ This module provides `download_model` so other parts of the project can reuse it
 
 Design goals / notes:
 - Use timeouts and retries to avoid hanging network calls (addresses Bandit B113).
-- Write to a temporary file and atomically replace the destination to avoid partial files.
-- Optional SHA256 verification to ensure integrity of large model files.
+- Download into `<dest>.part` next to the destination (same filesystem, so the
+  final `os.replace` is an atomic rename, not a copy of several GB).
+- When the server supports HTTP ranges, the file is fetched as parallel
+  segments written in place. Progress is kept in `<dest>.part.json`, so a
+  dropped connection resumes from the last received byte, within the call
+  (per-segment retries) and across calls / restarts.
+- Chunk sizes scale with the segment size instead of fixed 8 KB reads.
+- The SHA-256 is computed incrementally: the contiguous downloaded prefix of
+  `.part` is hashed while the later segments are still arriving.
+- A verified file gets a `<dest>.manifest.json` sidecar (hash, size, mtime);
+  `verify_file` trusts it while the file is unchanged, so a multi-GB model is
+  not re-hashed on every startup.
+- Downloads of one destination are serialized with an exclusive lock on
+  `<dest>.lock` (threads and processes, e.g. several uvicorn workers); a
+  caller that waited re-checks the destination and skips the download when
+  the lock holder already finished it.
 - Keep imports lightweight so this module can be used in tests and CI.
+
+Environment variables:
+- `DOWNLOAD_SEGMENTS` - parallel range requests (default 4).
+- `DOWNLOAD_MIN_SEGMENT_BYTES` - smallest segment worth a connection (default 32 MiB).
+- `DOWNLOAD_CHUNK_BYTES` - read size when ranges are not supported (default 1 MiB).
 """
 from __future__ import annotations
 
 import hashlib
+import json
 import logging
 import os
-import tempfile
+import threading
 import time
-from typing import Optional, Tuple
+from contextlib import contextmanager
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
 from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from urllib3.util.retry import Retry
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+MIN_CHUNK_BYTES = 64 * 1024
+MAX_CHUNK_BYTES = 4 * 1024 * 1024
+HASH_READ_BYTES = 4 * 1024 * 1024
+STATE_SAVE_BYTES = 16 * 1024 * 1024
+
+
+def part_path(dest_path: str) -> str:
+    return dest_path + ".part"
+
+
+def _state_path(dest_path: str) -> str:
+    return dest_path + ".part.json"
+
+
+def manifest_path(dest_path: str) -> str:
+    return dest_path + ".manifest.json"
+
+
+def lock_path(dest_path: str) -> str:
+    return dest_path + ".lock"
+
+
+_dest_locks: Dict[str, threading.Lock] = {}
+_dest_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _exclusive(dest_path: str) -> Iterator[None]:
+    # Thread lock plus a file lock: several API workers may fetch the same model.
+    key = os.path.abspath(dest_path)
+    with _dest_locks_lock:
+        lock = _dest_locks.setdefault(key, threading.Lock())
+    with lock, open(lock_path(dest_path), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _hash_range(path: str, digest, start: int, end: int) -> int:
+    """Feed bytes `start..end-1` of `path` into `digest`; returns `end`."""
+    if end <= start:
+        return start
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining:
+            block = f.read(min(HASH_READ_BYTES, remaining))
+            if not block:
+                raise RuntimeError(f"{path} is shorter than expected")
+            digest.update(block)
+            remaining -= len(block)
+    return end
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    _hash_range(path, digest, 0, os.path.getsize(path))
+    return digest.hexdigest()
+
+
+def write_manifest(path: str, sha256: str, url: Optional[str] = None) -> None:
+    """Record that `path`, as it is now, has the given SHA-256."""
+    st = os.stat(path)
+    manifest = {"sha256": sha256, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "url": url}
+    tmp = manifest_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path(path))
+
+
+def verify_file(path: str, sha256: str) -> bool:
+    """Whether `path` has this SHA-256; hashes it only when the manifest is stale."""
+    st = os.stat(path)
+    try:
+        with open(manifest_path(path)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest and manifest.get("size") == st.st_size and manifest.get("mtime_ns") == st.st_mtime_ns:
+        return manifest.get("sha256") == sha256.lower()
+    logger.info("Verifying SHA256 of %s", path)
+    digest = _hash_file(path)
+    write_manifest(path, digest, manifest.get("url") if manifest else None)
+    return digest == sha256.lower()
+
+
+def _session(total_retries: int, backoff_factor: float, connections: int) -> requests.Session:
+    session = requests.Session()
+    retries = Retry(
+        total=total_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+    )
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=max(connections, 10))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _chunk_size(length: int) -> int:
+    """Read size for a body of `length` bytes: about 256 reads, within bounds."""
+    return max(MIN_CHUNK_BYTES, min(MAX_CHUNK_BYTES, length // 256))
+
+
+def _ranged_total(response) -> Optional[int]:
+    """Total size from a `206` response's `Content-Range`, or None without range support."""
+    content_range = response.headers.get("content-range")
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def _validator(response) -> Optional[str]:
+    return response.headers.get("etag") or response.headers.get("last-modified")
+
+
+class _Progress:
+    def __init__(self, total: Optional[int], enabled: bool) -> None:
+        self.total = total
+        self.enabled = enabled
+        self.start = time.time()
+        self.last = 0.0
+
+    def log(self, downloaded: int, force: bool = False) -> None:
+        now = time.time()
+        if not self.enabled or (not force and now - self.last < 2):
+            return
+        self.last = now
+        elapsed = now - self.start
+        if self.total:
+            logger.info("Downloaded %d/%d bytes (%.1f%%) in %.1fs", downloaded, self.total, downloaded / self.total * 100, elapsed)
+        else:
+            logger.info("Downloaded %d bytes in %.1fs", downloaded, elapsed)
+
+
+def _content_length(response) -> Optional[int]:
+    total_header = response.headers.get("content-length")
+    try:
+        return int(total_header) if total_header is not None else None
+    except (TypeError, ValueError):
+        # If header is malformed, treat as unknown size.
+        return None
+
+
+def _download_stream(response, part: str, progress: _Progress) -> str:
+    """Sequential download of a full (non-ranged) response; returns the SHA-256."""
+    sha256 = hashlib.sha256()
+    downloaded = 0
+    chunk_size = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    with open(part, "wb") as f:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            f.write(chunk)
+            sha256.update(chunk)
+            downloaded += len(chunk)
+            progress.log(downloaded)
+    progress.log(downloaded, force=True)
+    return sha256.hexdigest()
+
+
+def _plan_segments(total: int, segments: int) -> List[List[int]]:
+    """`[start, end, next]` per segment (`end` inclusive, `next` = first missing byte)."""
+    min_bytes = int(os.getenv("DOWNLOAD_MIN_SEGMENT_BYTES", str(32 * 1024 * 1024)))
+    count = max(1, min(segments, total // max(1, min_bytes)))
+    size = max(1, -(-total // count))
+    return [[start, min(start + size, total) - 1, start] for start in range(0, total, size)]
+
+
+def _load_state(dest_path: str, url: str, total: int, validator: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Saved progress of an interrupted download of the same remote file."""
+    part = part_path(dest_path)
+    try:
+        with open(_state_path(dest_path)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        state.get("url") != url
+        or state.get("size") != total
+        or state.get("validator") != validator
+        or not os.path.exists(part)
+        or os.path.getsize(part) != total
+    ):
+        logger.info("Discarding partial download of %s (remote file changed)", dest_path)
+        return None
+    return state
+
+
+def _save_state(dest_path: str, state: Dict[str, Any]) -> None:
+    tmp = _state_path(dest_path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, _state_path(dest_path))
+
+
+def _frontier(segments: List[List[int]]) -> int:
+    """End of the contiguous downloaded prefix."""
+    for start, end, next_byte in segments:
+        if next_byte <= end:
+            return next_byte
+    return segments[-1][1] + 1 if segments else 0
+
+
+def _download_ranged(
+    session: requests.Session,
+    url: str,
+    dest_path: str,
+    total: int,
+    validator: Optional[str],
+    segments: int,
+    timeout: Tuple[int, int],
+    total_retries: int,
+    backoff_factor: float,
+    progress: _Progress,
+) -> str:
+    """Parallel segmented download into `.part`, resumable; returns the SHA-256."""
+    part = part_path(dest_path)
+    state = _load_state(dest_path, url, total, validator)
+    if state is None:
+        state = {"url": url, "size": total, "validator": validator, "segments": _plan_segments(total, segments)}
+        with open(part, "wb") as f:
+            f.truncate(total)
+        _save_state(dest_path, state)
+    else:
+        done = sum(next_byte - start for start, _, next_byte in state["segments"])
+        logger.info("Resuming download of %s at %d/%d bytes", dest_path, done, total)
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    unsaved = [0]
+    headers = {"If-Range": validator} if validator else {}
+    fd = os.open(part, os.O_WRONLY)
+
+    def fetch(segment: List[int]) -> None:
+        chunk_size = _chunk_size(segment[1] - segment[0] + 1)
+        attempt = 0
+        while segment[2] <= segment[1] and not stop.is_set():
+            try:
+                with session.get(
+                    url,
+                    stream=True,
+                    timeout=timeout,
+                    headers={**headers, "Range": f"bytes={segment[2]}-{segment[1]}"},
+                ) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise RuntimeError(f"{url} changed or stopped honouring range requests")
+                    for block in response.iter_content(chunk_size=chunk_size):
+                        if stop.is_set():
+                            return
+                        block = block[: segment[1] + 1 - segment[2]]
+                        os.pwrite(fd, block, segment[2])
+                        with lock:
+                            segment[2] += len(block)
+                            unsaved[0] += len(block)
+                            if unsaved[0] >= STATE_SAVE_BYTES:
+                                unsaved[0] = 0
+                                _save_state(dest_path, state)
+                        attempt = 0
+            except RequestException as e:
+                attempt += 1
+                if attempt > total_retries:
+                    raise
+                delay = backoff_factor * 2 ** (attempt - 1)
+                logger.warning("Segment at byte %d interrupted (%s); retrying in %.1fs", segment[2], e, delay)
+                time.sleep(delay)
+
+    digest = hashlib.sha256()
+    hashed = 0
+    pending = [segment for segment in state["segments"] if segment[2] <= segment[1]]
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="download") as pool:
+            futures = [pool.submit(fetch, segment) for segment in pending]
+            try:
+                while True:
+                    finished, running = wait(futures, timeout=0.5, return_when=FIRST_EXCEPTION)
+                    if any(future.exception() for future in finished):
+                        break
+                    with lock:
+                        frontier = _frontier(state["segments"])
+                        downloaded = sum(next_byte - start for start, _, next_byte in state["segments"])
+                    hashed = _hash_range(part, digest, hashed, frontier)
+                    progress.log(downloaded)
+                    if not running:
+                        break
+            finally:
+                stop.set()
+            for future in futures:
+                future.result()
+    finally:
+        os.close(fd)
+        with lock:
+            _save_state(dest_path, state)
+
+    hashed = _hash_range(part, digest, hashed, total)
+    progress.log(total, force=True)
+    return digest.hexdigest()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as remove_err:
+        logger.warning("Failed to remove temporary file %s: %s", path, remove_err)
+
 
 def download_model(
     url: str,
@@ -35,83 +371,82 @@ def download_model(
     total_retries: int = 5,
     backoff_factor: float = 1.0,
     progress: bool = False,
+    segments: Optional[int] = None,
 ) -> None:
     """Download a model from `url` to `dest_path`.
 
     Parameters
-    - url: remote HTTP(S) URL to stream-download.
+    - url: remote HTTP(S) URL to download.
     - dest_path: local filesystem path where the model will be saved.
-    - model_sha256: optional lower-hex SHA256 checksum to verify the download.
+    - model_sha256: optional lower-hex SHA256 checksum to verify the download;
+      a `dest_path` already verified with it is not downloaded again.
     - timeout: pair (connect_timeout, read_timeout) passed to requests.
-    - total_retries/backoff_factor: retry policy for transient failures.
+    - total_retries/backoff_factor: retry policy for transient failures,
+      also applied to each interrupted segment.
     - progress: when True, emits periodic INFO logs about progress.
+    - segments: parallel range requests (default `DOWNLOAD_SEGMENTS`).
 
-    Raises RuntimeError on network failures or checksum mismatch.
+    Raises RuntimeError on network failures or checksum mismatch. After a
+    network failure the partial download is kept and the next call resumes it.
     """
+    if model_sha256 and os.path.exists(dest_path) and verify_file(dest_path, model_sha256):
+        logger.info("Model at %s is already downloaded and verified.", dest_path)
+        return
 
-    logger.info("Model file not found at %s. Downloading from %s...", dest_path, url)
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    existed = os.path.exists(dest_path)
+    with _exclusive(dest_path):
+        # Another caller may have finished the download while this one waited.
+        if model_sha256 and os.path.exists(dest_path) and verify_file(dest_path, model_sha256):
+            logger.info("Model at %s was downloaded by another process.", dest_path)
+            return
+        if not model_sha256 and not existed and os.path.exists(dest_path):
+            logger.info("Model at %s was downloaded by another process.", dest_path)
+            return
+        _download_locked(url, dest_path, model_sha256, timeout, total_retries, backoff_factor, progress, segments)
 
-    session = requests.Session()
-    retries = Retry(
-        total=total_retries,
-        backoff_factor=backoff_factor,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "POST"],
-    )
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
+
+def _download_locked(
+    url: str,
+    dest_path: str,
+    model_sha256: Optional[str],
+    timeout: Tuple[int, int],
+    total_retries: int,
+    backoff_factor: float,
+    progress: bool,
+    segments: Optional[int],
+) -> None:
+    logger.info("Model file not found at %s. Downloading from %s...", dest_path, url)
+    segments = segments or int(os.getenv("DOWNLOAD_SEGMENTS", "4"))
+    session = _session(total_retries, backoff_factor, segments)
+    part = part_path(dest_path)
 
     try:
-        with session.get(url, stream=True, timeout=timeout) as response:
+        # The probe asks for the whole file as a range: a 206 tells the size
+        # and that segments can be requested; anything else is read as is.
+        with session.get(url, stream=True, timeout=timeout, headers={"Range": "bytes=0-"}) as response:
             response.raise_for_status()
-
-            # Read content-length header and convert to int when present.
-            # Use a separate variable to avoid `str | None` -> `int` assignment
-            # which mypy flags as incompatible.
-            total_header = response.headers.get("content-length")
-            total: Optional[int] = None
-            if total_header is not None:
-                try:
-                    total = int(total_header)
-                except (TypeError, ValueError):
-                    # If header is malformed, treat as unknown size.
-                    total = None
-
-            with tempfile.NamedTemporaryFile(delete=False) as tmpf:
-                tmp_path = tmpf.name
-                sha256 = hashlib.sha256()
-                downloaded = 0
-                start = time.time()
-                for chunk in response.iter_content(chunk_size=8192):
-                    if not chunk:
-                        continue
-                    tmpf.write(chunk)
-                    if model_sha256:
-                        sha256.update(chunk)
-                    downloaded += len(chunk)
-
-                    if progress and (downloaded % (1024 * 1024) < len(chunk) or (total and downloaded == total)):
-                        elapsed = time.time() - start
-                        percent = (downloaded / total * 100) if total is not None and total != 0 else None
-                        if percent is not None:
-                            logger.info("Downloaded %d/%d bytes (%.1f%%) in %.1fs", downloaded, total, percent, elapsed)
-                        else:
-                            logger.info("Downloaded %d bytes in %.1fs", downloaded, elapsed)
-
-            if model_sha256:
-                digest = sha256.hexdigest()
-                if digest != model_sha256.lower():
-                    try:
-                        os.remove(tmp_path)
-                    except Exception as remove_err:
-                        logger.warning("Failed to remove temporary file %s: %s", tmp_path, remove_err)
-                    raise RuntimeError(
-                        f"SHA256 mismatch for downloaded model: expected {model_sha256}, got {digest}"
-                    )
-
-            os.replace(tmp_path, dest_path)
-
-        logger.info("Model downloaded to %s.", dest_path)
+            total = _ranged_total(response)
+            validator = _validator(response)
+            if total is None:
+                _remove(_state_path(dest_path))
+                digest = _download_stream(response, part, _Progress(_content_length(response), progress))
+        if total is not None:
+            digest = _download_ranged(
+                session, url, dest_path, total, validator, segments,
+                timeout, total_retries, backoff_factor, _Progress(total, progress),
+            )
     except RequestException as e:
         raise RuntimeError(f"Failed to download model from {url}: {e}") from e
+
+    if model_sha256 and digest != model_sha256.lower():
+        _remove(part)
+        _remove(_state_path(dest_path))
+        raise RuntimeError(
+            f"SHA256 mismatch for downloaded model: expected {model_sha256}, got {digest}"
+        )
+
+    os.replace(part, dest_path)
+    _remove(_state_path(dest_path))
+    write_manifest(dest_path, digest, url)
+    logger.info("Model downloaded to %s.", dest_path)
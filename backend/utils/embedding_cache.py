@@ -0,0 +1,173 @@
+"""Persistent cache of job-posting embeddings shared by every user.
+
+Postings are the same for all users, but retrieval matching used to embed
+every job text again on each `match_jobs` call. `EmbeddingCache` stores each
+posting's query embedding once on disk:
+
+- vectors are appended to `vectors.f32`, a raw float32 matrix read through
+  `numpy.memmap` (no load step, pages shared between processes),
+- `index.sqlite` maps the SHA-256 of the normalized job text to its row,
+- one cache directory exists per embedding model (backend + model name +
+  dimension), so changing `EMBED_MODEL` never mixes vectors.
+
+`embed_job_texts()` returns vectors for any list of job texts, embedding only
+the ones missing from the cache; scraper ingestion calls it in batch
+(`backend.utils.job_ingest`) so matching normally does no job-side embedding.
+
+Environment variables:
+- `EMBED_CACHE_DIR` - root directory of the caches (default `embedding_cache`).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from backend.utils.embedding_service import embedding_dimension
+from backend.utils.model_registry import ModelSpec, embedding_spec, registry
+from backend.utils.vector_scoring import embed_queries
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_LOOKUP_BATCH = 900  # below SQLite's default bound-parameter limit
+
+
+def text_hash(text: str) -> str:
+    """Key of a job text: SHA-256 of the whitespace-normalized text."""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def model_id(spec: ModelSpec, dimension: int) -> str:
+    """Directory-safe id of the embedding model a cache belongs to."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{spec.kind}-{spec.name}")
+    return f"{slug}-{dimension}"
+
+
+class EmbeddingCache:
+    """Append-only float32 matrix on disk plus a text-hash -> row index."""
+
+    def __init__(self, directory: str, dimension: int) -> None:
+        self.directory = directory
+        self.dimension = dimension
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._lock_path = os.path.join(directory, "write.lock")
+        self._db_path = os.path.join(directory, "index.sqlite")
+        self._lock = threading.Lock()
+        self._memmap: Optional[np.memmap] = None
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rows (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def lookup(self, hashes: Sequence[str]) -> Dict[str, int]:
+        """Return the stored row of every hash in `hashes` that is cached."""
+        found: Dict[str, int] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._connect() as conn:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(f"SELECT hash, row FROM rows WHERE hash IN ({placeholders})", batch))
+        return found
+
+    def _matrix(self, min_rows: int) -> np.ndarray:
+        # Re-map only when rows were appended since the last mapping.
+        with self._lock:
+            if self._memmap is None or self._memmap.shape[0] < min_rows:
+                rows = os.path.getsize(self._vectors_path) // (4 * self.dimension)
+                self._memmap = np.memmap(self._vectors_path, dtype="float32", mode="r", shape=(rows, self.dimension))
+            return self._memmap
+
+    def get(self, rows: Sequence[int]) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.asarray(self._matrix(max(rows) + 1)[list(rows)])
+
+    def put(self, hashes: Sequence[str], vectors: np.ndarray) -> int:
+        """Append vectors for hashes not cached yet; returns how many were added."""
+        vectors = np.ascontiguousarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            # Serialize appends across processes (API workers, scraper CLIs).
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._connect() as conn:
+                known = set(self.lookup(hashes))
+                new = {}
+                for h, vector in zip(hashes, vectors):
+                    if h not in known and h not in new:
+                        new[h] = vector
+                if not new:
+                    return 0
+                with open(self._vectors_path, "ab") as f:
+                    # Drop a torn row left by an interrupted append so rows stay aligned.
+                    row_bytes = 4 * self.dimension
+                    size = f.tell()
+                    if size % row_bytes:
+                        f.truncate(size - size % row_bytes)
+                        f.seek(0, os.SEEK_END)
+                    start = f.tell() // row_bytes
+                    f.write(np.stack(list(new.values())).tobytes())
+                conn.executemany(
+                    "INSERT INTO rows (hash, row) VALUES (?, ?)",
+                    [(h, start + i) for i, h in enumerate(new)],
+                )
+            return len(new)
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def cache_for(spec: Optional[ModelSpec] = None, embed_model: Any = None) -> EmbeddingCache:
+    """The process-wide cache for `spec` (default: the configured embedding model)."""
+    spec = spec or embedding_spec()
+    dimension = embedding_dimension(spec, embed_model)
+    directory = os.path.join(os.getenv("EMBED_CACHE_DIR", "embedding_cache"), model_id(spec, dimension))
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = EmbeddingCache(directory, dimension)
+        return _caches[directory]
+
+
+def embed_job_texts(texts: Sequence[str], batch_size: int = 256, spec: Optional[ModelSpec] = None) -> np.ndarray:
+    """Return one query embedding per text, embedding only cache misses.
+
+    The embedding model is only loaded when some text is not cached yet.
+    """
+    spec = spec or embedding_spec()
+    cache = cache_for(spec)
+    hashes = [text_hash(text) for text in texts]
+    rows = cache.lookup(hashes)
+    missing: List[int] = [i for i, h in enumerate(hashes) if h not in rows]
+    if missing:
+        logger.info("Embedding %d of %d job texts not in the cache", len(missing), len(texts))
+        with registry.acquire(spec) as embed_model:
+            vectors = embed_queries(embed_model, [texts[i] for i in missing], batch_size=batch_size)
+        cache.put([hashes[i] for i in missing], vectors)
+        rows = cache.lookup(hashes)
+    return cache.get([rows[h] for h in hashes])
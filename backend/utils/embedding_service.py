@@ -0,0 +1,194 @@
+"""One embedding model for resume ingestion and job matching.
+
+Resume vectors and job queries are only comparable when they come from the
+same model. This module ties every per-user index to the model that built it:
+
+- `embedding_spec()` (from `backend.utils.model_registry`) is the single
+  configured model; FastEmbed's quantized ONNX CPU runtime is the default,
+- `embed_candidate` writes a fingerprint (`embedding.json`: backend, model,
+  params and vector dimension) next to each user's index,
+- `ensure_index_current()` compares that fingerprint with the configured
+  model before matching and, on a mismatch (or a legacy index without a
+  fingerprint), re-embeds the stored resume chunks into a fresh FAISS index
+  with the current model - for the per-user backend as a new version
+  directory swapped in like an upload, under the same `user_ingest_lock`.
+
+Environment variables:
+- `EMBED_BACKEND`, `EMBED_MODEL`, `EMBED_THREADS` - see `model_registry`.
+- `EMBED_REEMBED_ON_MISMATCH` - set to `false` to raise instead of
+  re-embedding a stale index.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from backend.utils.model_registry import ModelSpec, embedding_spec, registry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FILE = "embedding.json"
+
+# Output sizes of common models, so fingerprints can be computed without
+# loading the model. Other models are probed once with a test embedding.
+KNOWN_DIMENSIONS = {
+    "BAAI/bge-small-en-v1.5": 384,
+    "BAAI/bge-base-en-v1.5": 768,
+    "BAAI/bge-large-en-v1.5": 1024,
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+    "nomic-ai/nomic-embed-text-v1.5": 768,
+    "hkunlp/instructor-xl": 768,
+}
+
+_probed_dimensions: Dict[ModelSpec, int] = {}
+_dir_locks: Dict[str, threading.Lock] = {}
+_dir_locks_lock = threading.Lock()
+
+
+def embedding_dimension(spec: Optional[ModelSpec] = None, embed_model: Any = None) -> int:
+    """Vector size of `spec`, probing `embed_model` (or loading it) when unknown."""
+    spec = spec or embedding_spec()
+    if spec.name in KNOWN_DIMENSIONS:
+        return KNOWN_DIMENSIONS[spec.name]
+    if spec not in _probed_dimensions:
+        if embed_model is not None:
+            _probed_dimensions[spec] = len(embed_model.get_text_embedding("dimension probe"))
+        else:
+            with registry.acquire(spec) as model:
+                _probed_dimensions[spec] = len(model.get_text_embedding("dimension probe"))
+    return _probed_dimensions[spec]
+
+
+def fingerprint(spec: Optional[ModelSpec] = None, embed_model: Any = None) -> Dict[str, Any]:
+    spec = spec or embedding_spec()
+    return {
+        "backend": spec.kind,
+        "model": spec.name,
+        "params": spec.kwargs(),
+        "dimension": embedding_dimension(spec, embed_model),
+    }
+
+
+def read_fingerprint(user_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(user_dir, FINGERPRINT_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_fingerprint(user_dir: str, spec: Optional[ModelSpec] = None, embed_model: Any = None) -> None:
+    path = os.path.join(user_dir, FINGERPRINT_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprint(spec, embed_model), f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def fingerprint_matches(user_dir: str, spec: Optional[ModelSpec] = None) -> bool:
+    """True if the index in `user_dir` was built by the configured model."""
+    stored = read_fingerprint(user_dir)
+    if stored is None:
+        return False
+    spec = spec or embedding_spec()
+    # Runtime-only params (e.g. ONNX threads) do not change the vectors.
+    return stored.get("backend") == spec.kind and stored.get("model") == spec.name
+
+
+@contextmanager
+def ingest_lock(lock_path: str) -> Iterator[None]:
+    """Serialize one user's ingests (read stored chunks, plan, embed, commit).
+
+    Chunk ids are deterministic, so two ingests planned from the same stored
+    state would both insert the same ids. Thread lock plus a file lock:
+    several ingest workers and API processes may ingest for one user.
+    """
+    key = "ingest:" + os.path.abspath(lock_path)
+    with _dir_locks_lock:
+        lock = _dir_locks.setdefault(key, threading.Lock())
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with lock, open(lock_path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def user_ingest_lock(user_dir: str):
+    """The `ingest_lock` of one user's index directory `root/<email>`.
+
+    Binary indexes are updated in place and lock inside the directory; the
+    per-user backend swaps `root/<email>` between versions, so its lock lives
+    next to them in `root/.versions/<email>/`.
+    """
+    from backend.utils.vectorstore import VERSIONS_DIR, vector_store_backend
+
+    if vector_store_backend() == "binary":
+        return ingest_lock(os.path.join(user_dir, "ingest.lock"))
+    root, name = os.path.split(os.path.normpath(user_dir))
+    return ingest_lock(os.path.join(root, VERSIONS_DIR, name, "ingest.lock"))
+
+
+def reembed_index(user_dir: str, spec: Optional[ModelSpec] = None) -> int:
+    """Rebuild the FAISS index of `user_dir` from its stored chunks; returns the chunk count.
+
+    A per-user (LlamaIndex) index is written to a new version directory and
+    swapped in, so readers never see a half-written one.
+    """
+    from backend.utils.binary_index import has_binary_index, reembed_binary_index
+
+    if has_binary_index(user_dir):
+        return reembed_binary_index(user_dir, spec)
+
+    import faiss
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from llama_index.core.storage.docstore import SimpleDocumentStore
+    from llama_index.vector_stores.faiss import FaissVectorStore
+
+    from backend.utils.vectorstore import new_version_dir, swap_user_dir
+
+    spec = spec or embedding_spec()
+    nodes = list(SimpleDocumentStore.from_persist_dir(user_dir).docs.values())
+    for node in nodes:
+        node.embedding = None
+    logger.info("Re-embedding %d chunks in %s with %s", len(nodes), user_dir, spec.name)
+
+    with registry.acquire(spec) as embed_model:
+        faiss_index = faiss.IndexFlatL2(embedding_dimension(spec, embed_model))
+        storage_context = StorageContext.from_defaults(vector_store=FaissVectorStore(faiss_index=faiss_index))
+        index = VectorStoreIndex(nodes, storage_context=storage_context, embed_model=embed_model)
+        new_dir = new_version_dir(user_dir)
+        index.storage_context.persist(persist_dir=new_dir)
+        faiss.write_index(faiss_index, os.path.join(new_dir, "index.faiss"))
+        write_fingerprint(new_dir, spec, embed_model)
+    swap_user_dir(new_dir, user_dir)
+    return len(nodes)
+
+
+def ensure_index_current(user_dir: str) -> bool:
+    """Re-embed `user_dir` if it was built by another model; returns True if it did.
+
+    Raises RuntimeError instead when `EMBED_REEMBED_ON_MISMATCH=false`.
+    """
+    spec = embedding_spec()
+    if fingerprint_matches(user_dir, spec):
+        return False
+    # Same lock as uploads: other processes may ingest or re-embed this user.
+    with user_ingest_lock(user_dir):
+        if fingerprint_matches(user_dir, spec):
+            return False
+        if os.getenv("EMBED_REEMBED_ON_MISMATCH", "true").lower() in ("0", "false", "no"):
+            raise RuntimeError(
+                f"Index in {user_dir} was not built with {spec.name}. Please upload resume again."
+            )
+        logger.warning("Embedding model changed for %s (stored: %s)", user_dir, read_fingerprint(user_dir))
+        reembed_index(user_dir, spec)
+    return True
@@ -0,0 +1,225 @@
+"""Bounded execution pools that keep blocking work off the asyncio event loop.
+
+The FastAPI handlers are `async def` but call blocking code (LLM and
+embedding inference, FAISS, pdf parsing, MongoDB/GridFS, scraping). Running
+that code directly on the event loop serializes every request. This module
+routes such calls through one pool per workload class:
+
+- `inference` - LLM / query-engine matching and agent runs,
+- `embedding` - document parsing and embedding,
+- `io` - MongoDB, GridFS, file and network I/O.
+
+Each pool accepts at most `workers + queue` pending calls; past that
+`run_in_pool` (or `submit_to_pool` for fire-and-forget work) raises
+`PoolSaturatedError`, which the API maps to `429 Too Many Requests`. Per-pool counters (active, queued, completed,
+failed, rejected) are available from `pool_stats()`.
+
+Pools are configured with `POOL_<NAME>_WORKERS`, `POOL_<NAME>_QUEUE` and
+`POOL_<NAME>_KIND` (`thread` or `process`), e.g. `POOL_INFERENCE_WORKERS=2`.
+Process pools require picklable callables and arguments.
+
+The `inference` pool only submits prompts to the inference scheduler and
+waits, so by default it has one worker per scheduler slot
+(`INFERENCE_SLOTS`: 4 with `INFERENCE_SERVER_URL`, else 1); fewer workers
+would leave decode slots idle however many requests are queued.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# name -> (kind, workers, queue); workers None = one per inference slot
+DEFAULT_POOLS = {
+    "inference": ("thread", None, 16),
+    "embedding": ("thread", 2, 32),
+    "io": ("thread", 16, 128),
+}
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when a pool's queue is full and the call is rejected."""
+
+    def __init__(self, pool: str) -> None:
+        super().__init__(f"The '{pool}' pool is at capacity, please retry later")
+        self.pool = pool
+
+
+class WorkloadPool:
+    """An executor with a bounded number of pending calls and usage counters."""
+
+    def __init__(self, name: str, kind: str = "thread", workers: int = 1, queue: int = 0) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.workers = workers
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"pool-{self.name}")
+            return self._executor
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise PoolSaturatedError(self.name)
+            self._pending += 1
+
+    def _finish(self, ok: bool) -> None:
+        with self._lock:
+            self._pending -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _tracked(self, fn: Callable[[], Any]) -> Any:
+        # Runs inside a worker thread: counts calls that are actually executing.
+        with self._lock:
+            self._active += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Start `fn(*args, **kwargs)` in the pool, raising PoolSaturatedError when full."""
+        self._reserve()
+        call = functools.partial(fn, *args, **kwargs)
+        if self.kind == "thread":
+            call = functools.partial(self._tracked, call)
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._finish(False)
+            raise
+        # Released when the call actually ends, not when the awaiting task is
+        # cancelled: a cancelled request must not free a slot that is still busy.
+        future.add_done_callback(lambda f: self._finish(not f.cancelled() and f.exception() is None))
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` in the pool, raising PoolSaturatedError when full."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            # Process pools cannot report from inside the workers, so running
+            # calls are approximated by the pending count capped at `workers`.
+            active = self._active if self.kind == "thread" else min(self._pending, self.workers)
+            return {
+                "name": self.name,
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.queue,
+                "active": active,
+                "queued": max(self._pending - active, 0),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _inference_slots() -> int:
+    # Same default as `backend.utils.inference`, read here so that importing
+    # the pools does not import the inference backends.
+    return int(os.getenv("INFERENCE_SLOTS", "4" if os.getenv("INFERENCE_SERVER_URL") else "1"))
+
+
+_pools: Dict[str, WorkloadPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str) -> WorkloadPool:
+    """Return the pool called `name`, creating it from env/defaults on first use."""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if name not in DEFAULT_POOLS:
+                raise KeyError(f"Unknown pool: {name}")
+            kind, workers, queue = DEFAULT_POOLS[name]
+            if workers is None:
+                workers = _inference_slots()
+            prefix = f"POOL_{name.upper()}_"
+            pool = _pools[name] = WorkloadPool(
+                name,
+                kind=os.getenv(prefix + "KIND", kind),
+                workers=int(os.getenv(prefix + "WORKERS", str(workers))),
+                queue=int(os.getenv(prefix + "QUEUE", str(queue))),
+            )
+        return pool
+
+
+async def run_in_pool(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking callable in the named pool and await its result."""
+    return await get_pool(name).run(fn, *args, **kwargs)
+
+
+def submit_to_pool(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Start a blocking callable in the named pool without waiting for it.
+
+    The slot is reserved before this returns, so a saturated pool raises
+    `PoolSaturatedError` to the caller instead of failing later unseen.
+    Failures of the call itself are logged.
+    """
+    future = get_pool(name).submit(fn, *args, **kwargs)
+
+    def _log_failure(f: Future) -> None:
+        if not f.cancelled() and f.exception() is not None:
+            logger.error("Background call in the '%s' pool failed", name, exc_info=f.exception())
+
+    future.add_done_callback(_log_failure)
+    return future
+
+
+async def iterate_in_pool(name: str, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Drive a blocking iterator from the event loop, one `next()` per pool call."""
+    done = object()
+    while True:
+        item = await run_in_pool(name, next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    return [get_pool(name).stats() for name in DEFAULT_POOLS]
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
@@ -0,0 +1,203 @@
+"""Persistent cache of generated documents and application answers.
+
+Re-running the tailoring or the agents for the same user regenerated every
+document even when neither the resume nor the posting had changed. Outputs
+are now stored in a local SQLite file under a content-addressed key:
+
+- `cache_key(*parts)` hashes the canonical JSON of everything that
+  determines an output - prompt template and its version, model id,
+  sampling parameters, the profile (resume) hash and the job content hash -
+  so a change in any of them is a miss and nothing needs invalidating,
+- entries also carry a `scope` (the key parts except the subject, e.g. one
+  user's answers for one job) and optionally a normalized embedding;
+  `nearest()` finds the most similar earlier subject in the same scope, used
+  to reuse answers to near-identical application questions,
+- the file is bounded by `GENERATION_CACHE_BYTES`: the least recently used
+  entries are evicted after a write pushes it over (the total is kept in
+  memory; it is summed once when the cache is opened).
+
+Environment variables:
+- `GENERATION_CACHE` - set to `false` to disable the cache (default true).
+- `GENERATION_CACHE_PATH` - SQLite file (default `generation_cache.sqlite`).
+- `GENERATION_CACHE_BYTES` - size bound of the cached texts and vectors (default 512 MiB).
+- `GENERATION_CACHE_SIMILARITY` - cosine similarity from which a cached
+  answer is reused for a different question, e.g. 0.95 (default 0: only
+  exact matches are reused).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts: Any) -> str:
+    """Content address of a generation: SHA-256 of its canonical JSON parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def similarity_threshold() -> float:
+    return float(os.getenv("GENERATION_CACHE_SIMILARITY", "0"))
+
+
+class GenerationCache:
+    """SQLite store of generated texts with LRU eviction by size."""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.semantic_hits = self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, scope TEXT, text TEXT NOT NULL, vector BLOB,"
+                " bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_scope ON entries(scope)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+            self._bytes = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self._count("hits")
+        return row[0]
+
+    def put(self, key: str, text: str, scope: Optional[str] = None, vector: Optional[np.ndarray] = None) -> None:
+        blob = None
+        if vector is not None:
+            vector = np.asarray(vector, dtype="float32").ravel()
+            norm = float(np.linalg.norm(vector))
+            blob = (vector / norm if norm else vector).tobytes()
+        size = len(text.encode("utf-8")) + (len(blob) if blob else 0)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            replaced = conn.execute("SELECT bytes FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, scope, text, vector, bytes, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, text, blob, size, now, now),
+            )
+            conn.execute("COMMIT")
+            with self._lock:
+                self._bytes += size - (replaced[0] if replaced else 0)
+                total = self._bytes
+            if total > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Only runs once the bound is crossed, so the exact sum (which also
+        # resyncs the running total) is cheap enough here.
+        conn.execute("BEGIN IMMEDIATE")
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+        # Evict down to 90% so a full cache does not evict on every write.
+        target = self.max_bytes * 0.9
+        evicted = []
+        for key, size in conn.execute("SELECT key, bytes FROM entries ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        conn.execute("COMMIT")
+        with self._lock:
+            self._bytes = total
+            self.evictions += len(evicted)
+        logger.info("Evicted %d generation cache entries", len(evicted))
+
+    def nearest(self, scope: str, vector: np.ndarray, threshold: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """`(text, similarity)` of the most similar entry in `scope` at or above `threshold`."""
+        threshold = similarity_threshold() if threshold is None else threshold
+        if threshold <= 0:
+            return None
+        query = np.asarray(vector, dtype="float32").ravel()
+        norm = float(np.linalg.norm(query))
+        if not norm:
+            return None
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, text, vector FROM entries WHERE scope = ? AND vector IS NOT NULL", (scope,)
+            ).fetchall()
+            candidates = [row for row in rows if len(row[2]) == query.nbytes]
+            if not candidates:
+                return None
+            matrix = np.frombuffer(b"".join(row[2] for row in candidates), dtype="float32").reshape(len(candidates), -1)
+            scores = matrix @ (query / norm)
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+            conn.execute(
+                "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), candidates[best][0])
+            )
+        self._count("semantic_hits")
+        return candidates[best][1], float(scores[best])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[GenerationCache] = None
+_cache_lock = threading.Lock()
+
+
+def generation_cache() -> Optional[GenerationCache]:
+    """The process-wide cache, or None when `GENERATION_CACHE=false`."""
+    global _cache
+    if os.getenv("GENERATION_CACHE", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = GenerationCache(
+                os.getenv("GENERATION_CACHE_PATH", "generation_cache.sqlite"),
+                int(os.getenv("GENERATION_CACHE_BYTES", str(512 << 20))),
+            )
+        return _cache
@@ -0,0 +1,133 @@
+"""In-process LRU cache of loaded per-user indexes.
+
+`load_index_from_storage` parses the JSON docstore and vector store of a
+user's `faiss_index/<email>` directory on every call. `IndexCache` keeps the
+loaded objects in memory and reuses them while the persist directory is
+unchanged:
+
+- entries are keyed by the caller (e.g. `(email, "llama_index")`),
+- each entry remembers a version of its persist dir (name, mtime and size of
+  every file), so a new `/upload-resume/` that rewrites the files is picked
+  up on the next lookup,
+- the cache is bounded by an entry count and a byte budget (estimated from
+  the on-disk size of the persist dir) with least-recently-used eviction,
+- hit/miss/eviction counters are exposed through `stats()`.
+
+Environment variables:
+- `INDEX_CACHE_MAX_ENTRIES` - default 64.
+- `INDEX_CACHE_MAX_BYTES` - default 1 GiB.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DirVersion = Tuple[Tuple[str, int, int], ...]
+
+
+def dir_version(path: str) -> DirVersion:
+    """Return a cheap fingerprint of the files directly under `path`."""
+    entries = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((entry.name, st.st_mtime_ns, st.st_size))
+    except FileNotFoundError:
+        return ()
+    return tuple(sorted(entries))
+
+
+class _CacheEntry:
+    __slots__ = ("value", "version", "nbytes")
+
+    def __init__(self, value: Any, version: DirVersion, nbytes: int) -> None:
+        self.value = value
+        self.version = version
+        self.nbytes = nbytes
+
+
+class IndexCache:
+    """LRU cache of loaded indexes invalidated by persist-dir version."""
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "64"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("INDEX_CACHE_MAX_BYTES", str(1 << 30)))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, persist_dir: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, calling `loader()` on a miss.
+
+        A cached value is only reused while `persist_dir` has the same version
+        it had when the value was loaded.
+        """
+        version = dir_version(persist_dir)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            if entry is not None:
+                logger.debug("Index cache entry for %s is stale, reloading", key)
+                self._remove(key)
+            self.misses += 1
+
+        value = loader()
+        nbytes = sum(size for _, _, size in version)
+        with self._lock:
+            if nbytes > self.max_bytes:
+                logger.info("Not caching index %s: %d bytes exceeds budget", key, nbytes)
+                return value
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(value, version, nbytes)
+            self._bytes += nbytes
+            self._evict()
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop `key` (or everything when None)."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif key in self._entries:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self.evictions += 1
+            logger.debug("Evicted index %s from cache", key)
+
+
+index_cache = IndexCache()
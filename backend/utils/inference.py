@@ -0,0 +1,580 @@
+"""Process-wide LLM inference scheduler.
+
+The agents (`langchain` LlamaCpp) and the matcher (`llama_index` LlamaCPP)
+used to load the GGUF separately, and concurrent generations either
+serialized on one model in no particular order or doubled the memory. Both
+now submit prompts to one `InferenceScheduler`, which owns the model:
+
+- prompts wait in a priority queue (`PRIORITY_INTERACTIVE` for request
+  handlers such as job matching, `PRIORITY_BACKGROUND` for agent runs;
+  FIFO within a priority),
+- `slots` worker threads take the next prompt as soon as a slot frees up,
+- with `INFERENCE_SERVER_URL` the prompts go to a llama.cpp server sidecar
+  (`llama-server -m model.gguf --parallel N --cont-batching`), which decodes
+  the requests of all busy slots together in one batch; set `INFERENCE_SLOTS`
+  to the server's `--parallel`,
+- without it the GGUF is loaded once in process (`llama_cpp.Llama`, through
+  the model registry). llama-cpp-python's high-level API decodes one
+  sequence at a time, so this backend has a single slot.
+
+Prompts that share a long prefix - e.g. one candidate's resume followed by
+each job's posting (`backend.utils.tailoring`) - can pass it as `prefix`:
+
+- in process, the model state right after evaluating the prefix is kept in a
+  `PrefixCache` (LRU by bytes, optionally spilled to disk) and restored for
+  the next prompt with that prefix, so only the job-specific suffix is
+  evaluated, even when other users' prompts ran in between,
+- with a server, prompts with the same prefix are pinned to the same slot
+  (`id_slot`), whose KV cache already holds it (`cache_prompt`).
+
+`stats()` reports queue depth, queue wait (avg/p50/p95), tokens per second
+(completion tokens over the time any slot was busy) and batch occupancy (the
+average fraction of slots busy while decoding).
+
+`llama_index_llm()` / `langchain_llm()` wrap the scheduler in the LLM
+interfaces the matcher and the agents expect; the model registry builds them
+for the `scheduler.*` specs (see `backend.utils.model_registry`). The agents'
+completions are stored in the generation cache by exact prompt
+(`backend.utils.generation_cache`), so re-running the agents for an unchanged
+profile and job list does not generate again.
+
+Environment variables:
+- `INFERENCE_SERVER_URL` - llama.cpp server base URL (default: in-process model).
+- `INFERENCE_SLOTS` - concurrent requests (default 4 with a server, 1 in process).
+- `INFERENCE_CTX` - context window of the in-process model (default 4096).
+- `INFERENCE_GPU_LAYERS` - layers offloaded by the in-process model (default 35).
+- `INFERENCE_TIMEOUT_SECONDS` - limit for one generation incl. queueing (default 600).
+- `PREFIX_CACHE_BYTES` - memory for cached prefix states (default 2 GiB; 0 disables).
+- `PREFIX_CACHE_DIR` - spill evicted prefix states to this directory (default: drop them).
+- `PREFIX_CACHE_DISK_BYTES` - size limit of the spill directory (default 20 GiB).
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+_WAIT_WINDOW = 1000
+
+
+class GenerationResult(NamedTuple):
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    seconds: float
+
+
+def prefix_key(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+class PrefixCache:
+    """LRU of model states captured right after a prompt prefix was evaluated.
+
+    Entries are keyed by `prefix_key()`. When the states exceed
+    `capacity_bytes`, the least recently used ones are pickled to `spill_dir`
+    (itself bounded by `disk_bytes`, oldest files first) or dropped.
+    """
+
+    def __init__(self, capacity_bytes: int, spill_dir: Optional[str] = None, disk_bytes: int = 20 << 30) -> None:
+        self.capacity_bytes = capacity_bytes
+        self.spill_dir = spill_dir
+        self.disk_bytes = disk_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.spills = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.state")
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.spill_dir and os.path.exists(self._spill_path(key)):
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    state, size = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                logger.warning("Unreadable spilled prefix state %s", key)
+            else:
+                os.utime(self._spill_path(key))
+                with self._lock:
+                    self.disk_hits += 1
+                self.put(key, state, size)
+                return state
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, state: Any, size: int) -> None:
+        if size > self.capacity_bytes:
+            return
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (state, size)
+            self._bytes += size
+            while self._bytes > self.capacity_bytes:
+                old_key, (old_state, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                evicted.append((old_key, old_state, old_size))
+        for old_key, old_state, old_size in evicted:
+            self._spill(old_key, old_state, old_size)
+
+    def _spill(self, key: str, state: Any, size: int) -> None:
+        if not self.spill_dir:
+            return
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump((state, size), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        with self._lock:
+            self.spills += 1
+        self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        files = []
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".state"):
+                path = os.path.join(self.spill_dir, name)
+                st = os.stat(path)
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "capacity_bytes": self.capacity_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "spills": self.spills,
+            }
+
+
+def prefix_cache_from_env() -> Optional[PrefixCache]:
+    capacity = int(os.getenv("PREFIX_CACHE_BYTES", str(2 << 30)))
+    if capacity <= 0:
+        return None
+    return PrefixCache(
+        capacity,
+        os.getenv("PREFIX_CACHE_DIR") or None,
+        int(os.getenv("PREFIX_CACHE_DISK_BYTES", str(20 << 30))),
+    )
+
+
+class LlamaServerBackend:
+    """Completions from a llama.cpp server (`/completion`), one HTTP call per slot."""
+
+    def __init__(self, url: str, slots: int, timeout: float) -> None:
+        self.url = url.rstrip("/")
+        self.slots = slots
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(slots, 10))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def name(self) -> str:
+        return self.url
+
+    def complete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        stop: Optional[List[str]],
+        prefix: Optional[str] = None,
+    ) -> GenerationResult:
+        start = time.perf_counter()
+        payload = {
+            "prompt": prompt,
+            "n_predict": max_tokens,
+            "temperature": temperature,
+            "stop": stop or [],
+            # Reuse the slot's KV cache for a shared prompt prefix.
+            "cache_prompt": True,
+        }
+        if prefix:
+            # Same prefix, same slot: its KV cache still holds the prefix.
+            payload["id_slot"] = int(prefix_key(prefix)[:8], 16) % self.slots
+        response = self.session.post(f"{self.url}/completion", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        return GenerationResult(
+            body.get("content", ""),
+            int(body.get("tokens_evaluated", 0)),
+            int(body.get("tokens_predicted", 0)),
+            time.perf_counter() - start,
+        )
+
+
+class LlamaCppBackend:
+    """The GGUF loaded once in process; one sequence is decoded at a time."""
+
+    slots = 1
+
+    def __init__(self, model_path: str, n_ctx: int, n_gpu_layers: int, cache: Optional[PrefixCache] = None) -> None:
+        from backend.utils.model_registry import ModelSpec, registry
+
+        self.spec = ModelSpec.create("llama_cpp", model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers)
+        self.model = registry.get(self.spec)
+        self.cache = cache
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def _restore_prefix(self, prefix: str) -> None:
+        """Put the model in the state right after `prefix`, evaluating it only on a cache miss."""
+        key = prefix_key(prefix)
+        state = self.cache.get(key)
+        if state is not None:
+            self.model.load_state(state)
+            return
+        self.model.reset()
+        self.model.eval(self.model.tokenize(prefix.encode("utf-8")))
+        state = self.model.save_state()
+        self.cache.put(key, state, int(getattr(state, "llama_state_size", 0)))
+
+    def complete(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        stop: Optional[List[str]],
+        prefix: Optional[str] = None,
+    ) -> GenerationResult:
+        start = time.perf_counter()
+        with self._lock:
+            if prefix and self.cache is not None and prompt.startswith(prefix):
+                self._restore_prefix(prefix)
+            # The completion only evaluates the tokens after the longest
+            # prefix the model's context already holds.
+            output = self.model(prompt, max_tokens=max_tokens, temperature=temperature, stop=stop or [])
+        usage = output.get("usage", {})
+        return GenerationResult(
+            output["choices"][0]["text"],
+            int(usage.get("prompt_tokens", 0)),
+            int(usage.get("completion_tokens", 0)),
+            time.perf_counter() - start,
+        )
+
+
+class _Request:
+    __slots__ = ("prompt", "max_tokens", "temperature", "stop", "prefix", "future", "enqueued_at")
+
+    def __init__(self, prompt, max_tokens, temperature, stop, prefix) -> None:
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.stop = stop
+        self.prefix = prefix
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """Priority queue of prompts served by `slots` concurrent workers."""
+
+    def __init__(self, backend: Any, slots: Optional[int] = None) -> None:
+        self.backend = backend
+        self.slots = slots or backend.slots
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        # Metrics.
+        self._busy = 0
+        self._last_change = 0.0
+        self._active_seconds = 0.0
+        self._slot_seconds = 0.0
+        self._completed = 0
+        self._failed = 0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._waits: deque = deque(maxlen=_WAIT_WINDOW)
+
+    def _start(self) -> None:
+        # Called with the lock held.
+        if self._threads:
+            return
+        for n in range(self.slots):
+            thread = threading.Thread(target=self._worker, name=f"inference-slot-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(
+        self,
+        prompt: str,
+        *,
+        priority: int = PRIORITY_INTERACTIVE,
+        max_tokens: int = 512,
+        temperature: float = 0.1,
+        stop: Optional[List[str]] = None,
+        prefix: Optional[str] = None,
+    ) -> Future:
+        """Queue a prompt; the future resolves to a `GenerationResult`.
+
+        `prefix` marks the start of `prompt` shared with other prompts (see
+        the module docstring).
+        """
+        request = _Request(prompt, max_tokens, temperature, stop, prefix)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Inference scheduler is shut down")
+            self._start()
+        self._queue.put((priority, next(self._seq), request))
+        return request.future
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, **kwargs: Any) -> GenerationResult:
+        timeout = timeout if timeout is not None else float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "600"))
+        future = self.submit(prompt, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Still queued: drop it rather than let it take a slot later.
+            future.cancel()
+            raise
+
+    def _account(self, delta: int) -> None:
+        # Integrates busy slots over time; called with the lock held.
+        now = time.perf_counter()
+        if self._busy:
+            elapsed = now - self._last_change
+            self._active_seconds += elapsed
+            self._slot_seconds += elapsed * self._busy
+        self._busy += delta
+        self._last_change = now
+
+    def _worker(self) -> None:
+        while True:
+            _, _, request = self._queue.get()
+            if request is None:
+                return
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._waits.append(time.perf_counter() - request.enqueued_at)
+                self._account(+1)
+            try:
+                result = self.backend.complete(
+                    request.prompt, request.max_tokens, request.temperature, request.stop, prefix=request.prefix
+                )
+            except Exception as exc:
+                with self._lock:
+                    self._account(-1)
+                    self._failed += 1
+                request.future.set_exception(exc)
+                continue
+            with self._lock:
+                self._account(-1)
+                self._completed += 1
+                self._prompt_tokens += result.prompt_tokens
+                self._completion_tokens += result.completion_tokens
+            request.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._account(0)
+            waits = sorted(self._waits)
+            active = self._active_seconds
+            cache = getattr(self.backend, "cache", None)
+
+            def wait_ms(q: float) -> float:
+                return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+
+            return {
+                "backend": type(self.backend).__name__,
+                "model": self.backend.name,
+                "slots": self.slots,
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "completed": self._completed,
+                "failed": self._failed,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "tokens_per_second": round(self._completion_tokens / active, 2) if active else 0.0,
+                "occupancy": round(self._slot_seconds / (active * self.slots), 3) if active else 0.0,
+                "queue_wait_ms": {
+                    "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "p50": wait_ms(0.5),
+                    "p95": wait_ms(0.95),
+                },
+                "prefix_cache": cache.stats() if cache is not None else None,
+            }
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers after the queued prompts are served."""
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            # Sorts after every real priority, so queued prompts run first.
+            self._queue.put((float("inf"), next(self._seq), None))
+        for thread in threads:
+            thread.join(timeout)
+
+
+_scheduler: Optional[InferenceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def _create_backend() -> Any:
+    from backend.utils.model_registry import model_path
+
+    url = os.getenv("INFERENCE_SERVER_URL")
+    if url:
+        slots = int(os.getenv("INFERENCE_SLOTS", "4"))
+        return LlamaServerBackend(url, slots, float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "600")))
+    return LlamaCppBackend(
+        model_path(),
+        int(os.getenv("INFERENCE_CTX", "4096")),
+        int(os.getenv("INFERENCE_GPU_LAYERS", "35")),
+        prefix_cache_from_env(),
+    )
+
+
+def inference_scheduler() -> InferenceScheduler:
+    """The process-wide scheduler, created (and its model loaded) on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler(_create_backend())
+            logger.info("Inference scheduler ready: %s with %d slot(s)", _scheduler.backend.name, _scheduler.slots)
+        return _scheduler
+
+
+def inference_stats() -> Optional[Dict[str, Any]]:
+    """Scheduler metrics, or None when nothing has used the scheduler yet."""
+    with _scheduler_lock:
+        scheduler = _scheduler
+    return scheduler.stats() if scheduler is not None else None
+
+
+def shutdown_inference_scheduler(timeout: Optional[float] = None) -> None:
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.shutdown(timeout)
+
+
+def llama_index_llm(temperature: float, max_tokens: int, context_window: int, priority: int) -> Any:
+    """A LlamaIndex LLM whose completions go through the scheduler."""
+    from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+    from llama_index.core.llms.callbacks import llm_completion_callback
+
+    class ScheduledLLM(CustomLLM):
+        model_name: str
+        temperature: float
+        max_tokens: int
+        context_window: int
+        priority: int
+
+        @property
+        def metadata(self) -> LLMMetadata:
+            return LLMMetadata(
+                context_window=self.context_window,
+                num_output=self.max_tokens,
+                model_name=self.model_name,
+            )
+
+        def _generate(self, prompt: str) -> str:
+            return inference_scheduler().generate(
+                prompt,
+                priority=self.priority,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+            ).text
+
+        @llm_completion_callback()
+        def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+            return CompletionResponse(text=self._generate(prompt))
+
+        @llm_completion_callback()
+        def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+            text = self._generate(prompt)
+            yield CompletionResponse(text=text, delta=text)
+
+    return ScheduledLLM(
+        model_name=inference_scheduler().backend.name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        context_window=context_window,
+        priority=priority,
+    )
+
+
+def langchain_llm(temperature: float, max_tokens: int, priority: int) -> Any:
+    """A LangChain LLM (as used by the crewai agents) backed by the scheduler."""
+    from langchain_core.language_models.llms import LLM
+
+    class ScheduledLangChainLLM(LLM):
+        temperature: float
+        max_tokens: int
+        priority: int
+
+        @property
+        def _llm_type(self) -> str:
+            return "scheduled-llama-cpp"
+
+        def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+            from backend.utils.generation_cache import cache_key, generation_cache
+
+            scheduler = inference_scheduler()
+            cache = generation_cache()
+            key = cache_key("agent", scheduler.backend.name, self.temperature, self.max_tokens, stop, prompt)
+            text = cache.get(key) if cache is not None else None
+            if text is None:
+                text = scheduler.generate(
+                    prompt,
+                    priority=self.priority,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    stop=stop,
+                ).text
+                if cache is not None:
+                    cache.put(key, text)
+            return text
+
+    inference_scheduler()  # load the model now (e.g. during warm-up), not on the first prompt
+    return ScheduledLangChainLLM(temperature=temperature, max_tokens=max_tokens, priority=priority)
@@ -0,0 +1,320 @@
+"""Durable background queue for resume ingestion.
+
+`/upload-resume/` used to parse and embed inside the request (and wrote every
+upload to the same `temp{ext}` path). Uploads are now stored in GridFS and
+recorded as a job in a local SQLite queue; a pool of worker threads claims
+jobs, runs the ingestion handler (which copies the upload to a unique
+`upload_path()` while parsing it) and records progress events, and the API
+answers with the job id right away.
+
+- jobs survive restarts: a job whose worker died is re-claimed once its
+  lease expires, up to `INGEST_MAX_ATTEMPTS` attempts,
+- claiming is a single `BEGIN IMMEDIATE` transaction, so several API
+  processes can share one queue file,
+- handlers report progress with `progress(stage, message)`; each call
+  updates the job and appends an event (`events()` / `/jobs/{id}/events`),
+- a running job's lease is renewed by a heartbeat and on every progress
+  call; progress and completion are only recorded while the worker still
+  owns the claimed attempt, so a worker whose lease was lost (and whose job
+  was re-claimed) cannot overwrite the new attempt.
+
+Environment variables:
+- `INGEST_QUEUE_DIR` - queue database and uploads being parsed (default `ingest_queue`).
+- `INGEST_WORKERS` - worker threads per process (default 2).
+- `INGEST_MAX_ATTEMPTS` - attempts before a job is marked failed (default 3).
+- `INGEST_LEASE_SECONDS` - how long a claimed job may go without a lease
+  renewal before it is considered abandoned (default 900); workers renew
+  it every third of this.
+- `INGEST_POLL_SECONDS` - idle workers look for jobs from other processes
+  this often (default 1).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("done", "failed")
+
+Handler = Callable[[Dict[str, Any], Callable[..., None]], Any]
+
+
+class LeaseLostError(RuntimeError):
+    """The job was re-claimed by another worker after this worker's lease expired."""
+
+
+def lease_seconds() -> float:
+    return float(os.getenv("INGEST_LEASE_SECONDS", "900"))
+
+
+class IngestQueue:
+    """SQLite-backed job queue with leases, attempts and progress events."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.uploads_dir = os.path.join(directory, "uploads")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self._path = os.path.join(directory, "jobs.sqlite")
+        self._available = threading.Condition()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,"
+                " status TEXT NOT NULL, stage TEXT, attempts INTEGER NOT NULL DEFAULT 0,"
+                " error TEXT, result TEXT, lease_until REAL,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL,"
+                " at REAL NOT NULL, stage TEXT NOT NULL, message TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS events_job ON events(job_id, seq)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def upload_path(self, suffix: str = "") -> str:
+        """A fresh, unique path for a saved upload."""
+        return os.path.join(self.uploads_dir, uuid.uuid4().hex + suffix)
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, stage, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+            self._add_event(conn, job_id, "queued", None)
+        with self._available:
+            self._available.notify()
+        return job_id
+
+    @staticmethod
+    def _add_event(conn: sqlite3.Connection, job_id: str, stage: str, message: Optional[str]) -> None:
+        conn.execute(
+            "INSERT INTO events (job_id, at, stage, message) VALUES (?, ?, ?, ?)", (job_id, time.time(), stage, message)
+        )
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest runnable job (queued, or running with an expired lease).
+
+        The returned job's `attempt` identifies this claim; pass it to
+        `progress`, `renew` and `finish`.
+        """
+        now = time.time()
+        lease = lease_seconds()
+        max_attempts = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= max_attempts:
+                    # Its worker died on every attempt; stop retrying.
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                        ("abandoned after %d attempts" % row["attempts"], now, row["id"]),
+                    )
+                    self._add_event(conn, row["id"], "failed", "abandoned")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'started', attempts = attempts + 1,"
+                    " lease_until = ?, updated_at = ? WHERE id = ?",
+                    (now + lease, now, row["id"]),
+                )
+                self._add_event(conn, row["id"], "started", f"attempt {row['attempts'] + 1}")
+                job = dict(row)
+                job["payload"] = json.loads(job["payload"])
+                job["attempt"] = row["attempts"] + 1
+                return job
+
+    @staticmethod
+    def _owner_clause(attempt: Optional[int]) -> str:
+        # Without an attempt (e.g. an operator marking a job) the update is unconditional.
+        return "" if attempt is None else " AND status = 'running' AND attempts = ?"
+
+    def renew(self, job_id: str, attempt: Optional[int] = None) -> bool:
+        """Extend the lease of the claimed `attempt`; False if it was lost."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ?" + self._owner_clause(attempt),
+                (now + lease_seconds(), job_id) + (() if attempt is None else (attempt,)),
+            )
+        return cursor.rowcount > 0
+
+    def progress(self, job_id: str, stage: str, message: Optional[str] = None, attempt: Optional[int] = None) -> None:
+        """Record a stage (and renew the lease); raises LeaseLostError if `attempt` no longer owns the job."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET stage = ?, lease_until = ?, updated_at = ? WHERE id = ?" + self._owner_clause(attempt),
+                (stage, now + lease_seconds(), now, job_id) + (() if attempt is None else (attempt,)),
+            )
+            if cursor.rowcount == 0:
+                raise LeaseLostError(f"Job {job_id} attempt {attempt} was re-claimed")
+            self._add_event(conn, job_id, stage, message)
+
+    def finish(self, job_id: str, result: Any = None, error: Optional[str] = None, attempt: Optional[int] = None) -> bool:
+        """Mark the job done or failed; False (and nothing recorded) if `attempt` no longer owns it."""
+        status = "failed" if error is not None else "done"
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, result = ?, error = ?, lease_until = NULL, updated_at = ?"
+                " WHERE id = ?" + self._owner_clause(attempt),
+                (status, status, json.dumps(result), error, time.time(), job_id) + (() if attempt is None else (attempt,)),
+            )
+            if cursor.rowcount == 0:
+                logger.warning("Ingest job %s attempt %s was re-claimed; dropping its %s result", job_id, attempt, status)
+                return False
+            self._add_event(conn, job_id, status, error)
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's public status (without its payload), or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, stage, attempts, error, result, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, at, stage, message FROM events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return {status: n for status, n in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+    def wait_for_work(self, timeout: float) -> None:
+        with self._available:
+            self._available.wait(timeout)
+
+    def wake_all(self) -> None:
+        with self._available:
+            self._available.notify_all()
+
+
+class IngestWorkers:
+    """Threads that claim jobs from `queue` and run `handlers[job["kind"]]`."""
+
+    def __init__(self, queue: IngestQueue, handlers: Dict[str, Handler], workers: Optional[int] = None) -> None:
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers if workers is not None else int(os.getenv("INGEST_WORKERS", "2"))
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self.queue.wake_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def run_one(self) -> bool:
+        """Claim and process one job; False if there was none."""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        job_id, attempt = job["id"], job["attempt"]
+        handler = self.handlers.get(job["kind"])
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job_id, attempt, stop_heartbeat), name=f"ingest-heartbeat-{job_id}", daemon=True
+        )
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {job['kind']!r}")
+            result = handler(job, lambda stage, message=None: self.queue.progress(job_id, stage, message, attempt))
+        except LeaseLostError:
+            logger.warning("Ingest job %s attempt %d lost its lease; abandoning it", job_id, attempt)
+        except Exception as exc:
+            logger.exception("Ingest job %s failed", job_id)
+            self.queue.finish(job_id, error=str(exc) or exc.__class__.__name__, attempt=attempt)
+        else:
+            self.queue.finish(job_id, result=result, attempt=attempt)
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+        return True
+
+    def _heartbeat(self, job_id: str, attempt: int, stop: threading.Event) -> None:
+        while not stop.wait(max(lease_seconds() / 3, 0.01)):
+            try:
+                if not self.queue.renew(job_id, attempt):
+                    return
+            except Exception:
+                logger.exception("Could not renew the lease of ingest job %s", job_id)
+
+    def _run(self) -> None:
+        poll = float(os.getenv("INGEST_POLL_SECONDS", "1"))
+        while not self._stop.is_set():
+            try:
+                if not self.run_one():
+                    self.queue.wait_for_work(poll)
+            except Exception:
+                # Queue database errors (e.g. locked) must not kill the worker.
+                logger.exception("Ingest worker error")
+                self._stop.wait(poll)
+
+
+_queue: Optional[IngestQueue] = None
+_queue_lock = threading.Lock()
+
+
+def ingest_queue() -> IngestQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestQueue(os.getenv("INGEST_QUEUE_DIR", "ingest_queue"))
+        return _queue
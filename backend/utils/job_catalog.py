@@ -0,0 +1,420 @@
+"""Catalog-wide ANN index of scraped job postings for reverse matching.
+
+`match_jobs` scores a given list of jobs against one user's index. The job
+catalog answers the reverse question, "top K jobs for this resume", with one
+search over every posting in the `job_data` collections:
+
+- one FAISS index (`hnsw` by default, `ivf` or `flat`) of normalized job
+  embeddings wrapped in an `IndexIDMap2`, so scores are cosine similarities,
+- a SQLite table (`catalog.sqlite`) maps index ids to the posting, its
+  collection and the filterable fields (location, workplace, parsed salary),
+- `add_jobs()` / `remove_jobs()` update it incrementally as scrapes land
+  (called from `backend.utils.job_ingest`); a re-scraped posting replaces
+  its previous vector,
+- `search()` over-fetches from FAISS and filters by metadata in SQLite,
+  widening the fetch until K postings pass the filters.
+
+HNSW cannot delete vectors, so removed postings are tombstoned (inactive in
+SQLite, skipped at search time) and the index is rebuilt from the job
+embedding cache once tombstones exceed `CATALOG_COMPACT_RATIO`.
+
+An IVF index is trained on the batch that creates it, so its lists (and
+their number) would stay fitted to the first scrape. The training size is
+recorded, and the index is rebuilt - retrained on every active posting -
+once the catalog grows to `CATALOG_IVF_RETRAIN_FACTOR` times that size;
+growing geometrically keeps the rebuilds amortized linear.
+
+Environment variables:
+- `CATALOG_DIR` - root directory (default `job_catalog`), one subdir per
+  embedding model.
+- `CATALOG_INDEX` - `hnsw` (default), `ivf` or `flat`.
+- `CATALOG_HNSW_M` (default 32), `CATALOG_EF_CONSTRUCTION` (default 80),
+  `CATALOG_EF_SEARCH` (default 64).
+- `CATALOG_IVF_NLIST` (default 1024), `CATALOG_NPROBE` (default 16).
+- `CATALOG_IVF_RETRAIN_FACTOR` - growth over the training size that
+  triggers retraining (default 2).
+- `CATALOG_COMPACT_RATIO` - tombstone fraction that triggers a rebuild
+  (default 0.2).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.utils.embedding_cache import embed_job_texts, model_id
+from backend.utils.embedding_service import embedding_dimension
+from backend.utils.job_ingest import job_content_key
+from backend.utils.job_text import job_to_text
+from backend.utils.model_registry import ModelSpec, embedding_spec
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("hnsw", "ivf", "flat")
+HOURS_PER_YEAR = 2080
+# Fields added by ingestion/Mongo that are not part of the posting itself.
+_STORED_EXCLUDE = {"_id", "first_seen_at", "updated_at"}
+_SALARY_NUMBER = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([kK])?")
+
+
+def parse_salary(text: Any) -> Tuple[Optional[float], Optional[float]]:
+    """Parse "$120,000 - $150,000", "120k+" or "$45/hr" into a yearly (min, max)."""
+    if not text or not isinstance(text, str):
+        return None, None
+    hourly = bool(re.search(r"/\s*h(ou)?r|per hour|an hour|hourly", text, re.IGNORECASE))
+    values = []
+    for number, thousands in _SALARY_NUMBER.findall(text):
+        value = float(number.replace(",", ""))
+        if thousands:
+            value *= 1000
+        if hourly:
+            value *= HOURS_PER_YEAR
+        if value >= 1000:  # skip stray small numbers ("2 days", "3+ years")
+            values.append(value)
+    if not values:
+        return None, None
+    return min(values), max(values)
+
+
+def _job_fields(job: Dict[str, Any]) -> Tuple[str, str, Optional[float], Optional[float]]:
+    location = job.get("location") or job.get("job-location") or ""
+    salary_min, salary_max = parse_salary(job.get("salary") or job.get("job-salary"))
+    return location, job.get("workplace") or "", salary_min, salary_max
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.array(vectors, dtype="float32", ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class JobCatalog:
+    """FAISS index + SQLite metadata over every ingested job posting."""
+
+    def __init__(self, directory: str, dimension: int, kind: Optional[str] = None) -> None:
+        self.directory = directory
+        self.dimension = dimension
+        self.kind = (kind or os.getenv("CATALOG_INDEX", "hnsw")).lower()
+        if self.kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown CATALOG_INDEX {self.kind!r}; expected one of {INDEX_KINDS}")
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "catalog.faiss")
+        self._db_path = os.path.join(directory, "catalog.sqlite")
+        self._lock_path = os.path.join(directory, "write.lock")
+        self._lock = threading.RLock()
+        self._index = None
+        self._index_version: Optional[int] = None
+        self._bulk_loading = False
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, job_key TEXT NOT NULL, collection TEXT,"
+                " location TEXT, workplace TEXT, salary_min REAL, salary_max REAL,"
+                " active INTEGER NOT NULL DEFAULT 1, doc TEXT NOT NULL)"
+            )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs(job_key) WHERE active = 1")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        # Thread lock plus a file lock: the API and scraper CLIs share the files.
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            yield
+
+    # -- FAISS index -----------------------------------------------------
+
+    def _new_index(self, training_vectors: Optional[np.ndarray] = None):
+        import faiss
+
+        if self.kind == "hnsw":
+            inner = faiss.IndexHNSWFlat(self.dimension, int(os.getenv("CATALOG_HNSW_M", "32")), faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = int(os.getenv("CATALOG_EF_CONSTRUCTION", "80"))
+        elif self.kind == "ivf" and training_vectors is not None and len(training_vectors):
+            # IVF needs ~39 training points per list; shrink nlist for small catalogs.
+            nlist = max(1, min(int(os.getenv("CATALOG_IVF_NLIST", "1024")), len(training_vectors) // 39))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            inner = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            inner.train(training_vectors)
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('ivf_trained_on', ?)", (len(training_vectors),))
+        else:
+            inner = faiss.IndexFlatIP(self.dimension)
+        return faiss.IndexIDMap2(inner)
+
+    def _refresh(self) -> None:
+        """(Re)load the index if another process rewrote it since we read it."""
+        try:
+            version = os.stat(self._index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if self._index is None or version != self._index_version:
+            import faiss
+
+            self._index = faiss.read_index(self._index_path)
+            self._index_version = version
+
+    def _save(self) -> None:
+        import faiss
+
+        tmp_path = self._index_path + ".tmp"
+        faiss.write_index(self._index, tmp_path)
+        os.replace(tmp_path, self._index_path)
+        self._index_version = os.stat(self._index_path).st_mtime_ns
+
+    def _configure_search(self, fetch: int) -> None:
+        import faiss
+
+        inner = faiss.downcast_index(self._index.index)
+        if hasattr(inner, "hnsw"):
+            inner.hnsw.efSearch = max(int(os.getenv("CATALOG_EF_SEARCH", "64")), fetch)
+        if hasattr(inner, "nprobe"):
+            inner.nprobe = int(os.getenv("CATALOG_NPROBE", "16"))
+
+    def _remove_ids(self, ids: List[int]) -> None:
+        if not ids or self._index is None:
+            return
+        try:
+            self._index.remove_ids(np.asarray(ids, dtype="int64"))
+        except RuntimeError:
+            # HNSW does not support removal; the rows stay as tombstones.
+            pass
+
+    # -- Updates ---------------------------------------------------------
+
+    def add_jobs(
+        self,
+        jobs: Sequence[Dict[str, Any]],
+        collection: Optional[str] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> int:
+        """Add (or replace) postings; `vectors` defaults to the job embedding cache."""
+        if not jobs:
+            return 0
+        if vectors is None:
+            vectors = embed_job_texts([job_to_text(job) for job in jobs])
+        vectors = _normalized(vectors)
+        with self._writing():
+            old_ids: List[int] = []
+            new_ids: List[int] = []
+            with self._connect() as conn:
+                for job in jobs:
+                    key = job.get("job_key") or job_content_key(job)
+                    row = conn.execute("SELECT id FROM jobs WHERE job_key = ? AND active = 1", (key,)).fetchone()
+                    if row:
+                        old_ids.append(row[0])
+                        conn.execute("UPDATE jobs SET active = 0 WHERE id = ?", (row[0],))
+                    location, workplace, salary_min, salary_max = _job_fields(job)
+                    doc = {k: v for k, v in job.items() if k not in _STORED_EXCLUDE}
+                    cursor = conn.execute(
+                        "INSERT INTO jobs (job_key, collection, location, workplace, salary_min, salary_max, doc)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, collection, location, workplace, salary_min, salary_max, json.dumps(doc, default=str)),
+                    )
+                    new_ids.append(cursor.lastrowid)
+            if self._index is None:
+                self._index = self._new_index(vectors)
+            self._remove_ids(old_ids)
+            self._index.add_with_ids(vectors, np.asarray(new_ids, dtype="int64"))
+            self._maybe_retrain()
+            self._maybe_compact()
+            self._save()
+        logger.info("Added %d jobs to the catalog (%d replaced)", len(new_ids), len(old_ids))
+        return len(new_ids)
+
+    def remove_jobs(self, job_keys: Iterable[str]) -> int:
+        keys = list(job_keys)
+        if not keys:
+            return 0
+        with self._writing():
+            with self._connect() as conn:
+                placeholders = ",".join("?" * len(keys))
+                ids = [
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT id FROM jobs WHERE active = 1 AND job_key IN ({placeholders})", keys
+                    )
+                ]
+                conn.executemany("UPDATE jobs SET active = 0 WHERE id = ?", [(i,) for i in ids])
+            self._remove_ids(ids)
+            self._maybe_compact()
+            if self._index is not None:
+                self._save()
+        return len(ids)
+
+    def _active_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE active = 1").fetchone()[0]
+
+    def _maybe_compact(self) -> None:
+        if self._index is None or not self._index.ntotal:
+            return
+        tombstones = self._index.ntotal - self._active_count()
+        if tombstones > float(os.getenv("CATALOG_COMPACT_RATIO", "0.2")) * self._index.ntotal:
+            self._rebuild_index()
+
+    def _maybe_retrain(self) -> None:
+        if self.kind != "ivf" or self._index is None or self._bulk_loading:
+            return
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'ivf_trained_on'").fetchone()
+        # Indexes written before the training size was recorded retrain once.
+        trained_on = row[0] if row else 0
+        if self._active_count() >= float(os.getenv("CATALOG_IVF_RETRAIN_FACTOR", "2")) * trained_on:
+            logger.info("Retraining the IVF catalog index (trained on %d postings)", trained_on)
+            self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, doc FROM jobs WHERE active = 1 ORDER BY id").fetchall()
+            conn.execute("DELETE FROM jobs WHERE active = 0")
+        ids = np.asarray([row[0] for row in rows], dtype="int64")
+        vectors = (
+            _normalized(embed_job_texts([job_to_text(json.loads(row[1])) for row in rows]))
+            if rows
+            else np.zeros((0, self.dimension), dtype="float32")
+        )
+        self._index = self._new_index(vectors)
+        if len(ids):
+            self._index.add_with_ids(vectors, ids)
+        logger.info("Rebuilt the job catalog index with %d postings", len(ids))
+
+    def rebuild(self, jobs_by_collection: Dict[str, Sequence[Dict[str, Any]]]) -> int:
+        """Replace the whole catalog with `jobs_by_collection` (e.g. all of `job_data`)."""
+        with self._writing():
+            with self._connect() as conn:
+                conn.execute("DELETE FROM jobs")
+            self._index = self._index_version = None
+            if os.path.exists(self._index_path):
+                os.remove(self._index_path)
+        # Trained once at the end instead of at every doubling on the way.
+        self._bulk_loading = True
+        try:
+            added = sum(self.add_jobs(jobs, collection) for collection, jobs in jobs_by_collection.items())
+        finally:
+            self._bulk_loading = False
+        if self.kind == "ivf" and added:
+            # Retrain the coarse quantizer on the full catalog, not the first batch.
+            with self._writing():
+                self._rebuild_index()
+                self._save()
+        return added
+
+    # -- Queries ---------------------------------------------------------
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int = 20,
+        location: Optional[str] = None,
+        workplace: Optional[str] = None,
+        min_salary: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top `k` postings closest to any of `query_vectors` that pass the filters.
+
+        Each result is the stored posting plus `similarity` (cosine x 100) and
+        `collection`.
+        """
+        queries = _normalized(query_vectors)
+        with self._lock:
+            self._refresh()
+            if self._index is None or self._index.ntotal == 0 or len(queries) == 0 or k <= 0:
+                return []
+            filters, params = ["active = 1"], []
+            if location:
+                filters.append("location LIKE ?")
+                params.append(f"%{location}%")
+            if workplace:
+                filters.append("workplace LIKE ?")
+                params.append(workplace)
+            if min_salary is not None:
+                filters.append("COALESCE(salary_max, salary_min) >= ?")
+                params.append(min_salary)
+
+            fetch = min(max(k * 4, k), self._index.ntotal)
+            while True:
+                self._configure_search(fetch)
+                distances, ids = self._index.search(queries, fetch)
+                best: Dict[int, float] = {}
+                for row_ids, row_scores in zip(ids, distances):
+                    for job_id, score in zip(row_ids, row_scores):
+                        if job_id >= 0 and score > best.get(int(job_id), -np.inf):
+                            best[int(job_id)] = float(score)
+                results = self._filter(best, filters, params)
+                if len(results) >= k or fetch >= self._index.ntotal:
+                    break
+                fetch = min(fetch * 4, self._index.ntotal)
+        results.sort(key=lambda job: job["similarity"], reverse=True)
+        return results[:k]
+
+    def _filter(self, best: Dict[int, float], filters: List[str], params: List[Any]) -> List[Dict[str, Any]]:
+        if not best:
+            return []
+        ids = list(best)
+        placeholders = ",".join("?" * len(ids))
+        query = f"SELECT id, collection, doc FROM jobs WHERE id IN ({placeholders}) AND " + " AND ".join(filters)
+        with self._connect() as conn:
+            rows = conn.execute(query, ids + params).fetchall()
+        return [
+            {**json.loads(doc), "collection": collection, "similarity": round(best[job_id] * 100, 2)}
+            for job_id, collection, doc in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            indexed = self._index.ntotal if self._index is not None else 0
+        active = self._active_count()
+        return {"kind": self.kind, "indexed": indexed, "active": active, "tombstones": indexed - active}
+
+
+_catalogs: Dict[str, JobCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def job_catalog(spec: Optional[ModelSpec] = None) -> JobCatalog:
+    """The process-wide catalog for `spec` (default: the configured embedding model)."""
+    spec = spec or embedding_spec()
+    dimension = embedding_dimension(spec)
+    directory = os.path.join(os.getenv("CATALOG_DIR", "job_catalog"), model_id(spec, dimension))
+    with _catalogs_lock:
+        if directory not in _catalogs:
+            _catalogs[directory] = JobCatalog(directory, dimension)
+        return _catalogs[directory]
+
+
+def rebuild_from_mongo() -> int:
+    """Rebuild the catalog from every collection in the jobs database."""
+    from backend.utils.mongo import jobs_db
+
+    db = jobs_db()
+    jobs_by_collection = {name: list(db[name].find({})) for name in db.list_collection_names()}
+    return job_catalog().rebuild(jobs_by_collection)
+
+
+if __name__ == "__main__":
+    print(f"Indexed {rebuild_from_mongo()} jobs into the catalog.")
@@ -0,0 +1,173 @@
+"""Incremental, deduplicating ingestion of scraped job postings.
+
+Scrapers used to `insert_many` every run, duplicating each posting on every
+re-scrape. `upsert_jobs` instead:
+
+1. computes a stable `job_key` per posting: a SHA-256 of the canonical URL
+   (lower-cased host, no fragment, no tracking params, sorted query) plus
+   the normalized title and company,
+2. computes a `content_hash` of the posting's fields,
+3. looks up the stored hashes for the batch and skips postings whose content
+   is unchanged,
+4. writes new/changed postings with one unordered `bulk_write` of upserts,
+   backed by a unique index on `job_key`.
+
+It returns `{"inserted", "updated", "unchanged", "duplicates"}` counts so a
+nightly re-scrape only writes what changed.
+
+New and changed postings are also embedded in one batch into the shared
+job-embedding cache (`backend.utils.embedding_cache`), so matching users
+against the catalog does not embed job texts again, and added to the
+catalog-wide ANN index (`backend.utils.job_catalog`). Set `INGEST_EMBED_JOBS`
+to `false` to skip both (e.g. on hosts without the embedding model) or
+`INGEST_CATALOG` to `false` to skip only the catalog; a failure is logged and
+does not fail the ingest.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from backend.utils.job_text import job_to_text
+from backend.utils.mongo import jobs_db
+
+logger = logging.getLogger(__name__)
+
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid", "ref", "referrer", "source", "src", "trk"}
+# Fields added by the ingestion itself; excluded from the content hash.
+INTERNAL_FIELDS = {"_id", "job_key", "content_hash", "first_seen_at", "updated_at"}
+LOOKUP_BATCH = 1000
+
+_indexed_collections = set()
+_indexed_lock = threading.Lock()
+
+
+def canonical_url(url: Optional[str]) -> str:
+    """Normalize a posting URL so the same page always maps to the same string."""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def _normalize(text: Any) -> str:
+    return re.sub(r"\s+", " ", str(text or "")).strip().casefold()
+
+
+def _job_url(job: Dict[str, Any]) -> Optional[str]:
+    # Scrapers name the link differently (EY/Motion, Glassdoor, Handshake).
+    return job.get("url") or job.get("job-link") or job.get("job_url")
+
+
+def job_content_key(job: Dict[str, Any]) -> str:
+    """Stable identity of a posting: canonical URL + normalized title/company."""
+    title = job.get("title") or job.get("job-title")
+    parts = [canonical_url(_job_url(job)), _normalize(title), _normalize(job.get("company"))]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def job_content_hash(job: Dict[str, Any]) -> str:
+    """Hash of every scraped field, used to detect changed postings."""
+    payload = {k: v for k, v in job.items() if k not in INTERNAL_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def ensure_indexes(collection) -> None:
+    """Create the unique `job_key` index once per collection and process.
+
+    The index is partial: documents stored by the old `insert_many` path
+    have no `job_key` and would all collide as `null` in a plain unique index.
+    """
+    name = getattr(collection, "full_name", collection.name)
+    with _indexed_lock:
+        if name in _indexed_collections:
+            return
+        collection.create_index("job_key", unique=True, partialFilterExpression={"job_key": {"$exists": True}})
+        _indexed_collections.add(name)
+
+
+def _existing_hashes(collection, keys: List[str]) -> Dict[str, str]:
+    existing: Dict[str, str] = {}
+    for start in range(0, len(keys), LOOKUP_BATCH):
+        cursor = collection.find(
+            {"job_key": {"$in": keys[start:start + LOOKUP_BATCH]}},
+            {"job_key": 1, "content_hash": 1},
+        )
+        for doc in cursor:
+            existing[doc["job_key"]] = doc.get("content_hash")
+    return existing
+
+
+def upsert_jobs(jobs: Iterable[Dict[str, Any]], collection_name: str, collection=None) -> Dict[str, int]:
+    """Upsert scraped `jobs` into `collection_name` and return write counts."""
+    from pymongo import UpdateOne
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+    latest: Dict[str, Dict[str, Any]] = {}
+    for job in jobs:
+        key = job_content_key(job)
+        if key in latest:
+            counts["duplicates"] += 1
+        latest[key] = job
+    if not latest:
+        return counts
+
+    collection = collection if collection is not None else jobs_db()[collection_name]
+    ensure_indexes(collection)
+    existing = _existing_hashes(collection, list(latest))
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    operations = []
+    changed = []
+    for key, job in latest.items():
+        content_hash = job_content_hash(job)
+        if existing.get(key) == content_hash:
+            counts["unchanged"] += 1
+            continue
+        changed.append(job)
+        fields = {k: v for k, v in job.items() if k not in INTERNAL_FIELDS}
+        fields.update(job_key=key, content_hash=content_hash, updated_at=now)
+        operations.append(
+            UpdateOne({"job_key": key}, {"$set": fields, "$setOnInsert": {"first_seen_at": now}}, upsert=True)
+        )
+
+    if operations:
+        result = collection.bulk_write(operations, ordered=False)
+        counts["inserted"] = result.upserted_count
+        counts["updated"] = result.modified_count
+        _index_changed_jobs(changed, collection_name)
+    logger.info("Ingested jobs into %s: %s", collection_name, counts)
+    return counts
+
+
+def _index_changed_jobs(jobs: List[Dict[str, Any]], collection_name: str) -> None:
+    if not jobs or os.getenv("INGEST_EMBED_JOBS", "true").lower() in ("0", "false", "no"):
+        return
+    try:
+        from backend.utils.embedding_cache import embed_job_texts
+
+        vectors = embed_job_texts([job_to_text(job) for job in jobs])
+        if os.getenv("INGEST_CATALOG", "true").lower() not in ("0", "false", "no"):
+            from backend.utils.job_catalog import job_catalog
+
+            job_catalog().add_jobs(jobs, collection_name, vectors)
+    except Exception:
+        logger.exception("Failed to index %d ingested jobs", len(jobs))
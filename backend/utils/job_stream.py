@@ -0,0 +1,132 @@
+"""Incremental parsing of uploaded job files.
+
+`iter_jobs` yields job postings one at a time from a binary file object
+without reading the whole upload into memory. Two layouts are accepted:
+
+- a top-level JSON array (`[{...}, {...}]`), the format written by the
+  scrapers' `save_to_json`/`json.dump`,
+- newline-delimited JSON (one object per line).
+
+Only the bytes of the item currently being decoded are buffered, so memory
+stays constant however large the file is. While an item is incomplete the
+reads grow with the buffer, so a large item is re-decoded a logarithmic
+number of times, and input that is malformed before the end of the buffer
+fails at once instead of reading on.
+
+Environment variables:
+- `JOB_STREAM_MAX_ITEM_BYTES` - largest single job item accepted (default 16 MiB).
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import os
+from typing import IO, Any, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+# Longest token a decode error can be stuck on when it is only cut off by
+# the end of the buffer (a surrogate pair of \uXXXX escapes is 12).
+_TOKEN_MARGIN = 16
+
+
+def max_item_chars() -> int:
+    return int(os.getenv("JOB_STREAM_MAX_ITEM_BYTES", str(16 << 20)))
+
+
+class _Reader:
+    """Buffered UTF-8 text view over a binary file object."""
+
+    def __init__(self, fileobj: IO[bytes], chunk_size: int) -> None:
+        self._file = fileobj
+        self._chunk_size = chunk_size
+        self._max_item = max_item_chars()
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, grow: bool = False) -> bool:
+        """Append the next chunk to the buffer; returns False at end of file.
+
+        With `grow`, at least as much as is already buffered is read, so an
+        incomplete item at most doubles in size between decode attempts.
+        """
+        if self.eof:
+            return False
+        size = self._chunk_size
+        if grow:
+            pending = len(self.buf) - self.pos
+            if pending > self._max_item:
+                raise json.JSONDecodeError(f"Job item exceeds {self._max_item} characters", self.buf, self.pos)
+            size = max(size, pending)
+        chunk = self._file.read(size)
+        if not chunk:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self._utf8.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self._utf8.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def decode_value(self) -> Any:
+        """Decode one JSON value starting at the next non-whitespace character."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                # Only an error at the end of the buffer (or a string running
+                # into it) can be fixed by reading more.
+                truncated = exc.msg.startswith("Unterminated string") or exc.pos >= len(self.buf) - _TOKEN_MARGIN
+                if truncated and self.fill(grow=True):
+                    continue
+                raise
+            # A number (or literal) ending exactly at the buffer boundary may
+            # continue in the next chunk: read more before accepting it.
+            if end == len(self.buf) and not self.eof:
+                self.fill(grow=True)
+                continue
+            self.pos = end
+            return value
+
+
+def iter_jobs(fileobj: IO[bytes], chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """Yield the items of a JSON array or NDJSON stream one at a time.
+
+    Raises ValueError (`json.JSONDecodeError`) on malformed input.
+    """
+    reader = _Reader(fileobj, chunk_size)
+    first = reader.peek()
+    if first == "":
+        return
+    if first != "[":
+        # NDJSON: a sequence of whitespace separated values.
+        while reader.peek() != "":
+            yield reader.decode_value()
+        return
+
+    reader.pos += 1
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.decode_value()
+        sep = reader.peek()
+        if sep == ",":
+            reader.pos += 1
+            continue
+        if sep == "]":
+            reader.pos += 1
+            return
+        raise json.JSONDecodeError("Expected ',' or ']'", reader.buf, reader.pos)
@@ -0,0 +1,9 @@
+"""Text representation of job postings shared by matching and ingestion."""
+
+
+def job_to_text(job: dict) -> str:
+    """Build the text that is embedded/queried for a job posting."""
+    return (
+        f"{job.get('title', 'No Title')} at {job.get('company', 'EY')}. "
+        f"Requirements: {job.get('requirements', 'Not specified')}"
+    )
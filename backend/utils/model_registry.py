@@ -0,0 +1,374 @@
+"""Process-wide registry of loaded embedding models and LLMs.
+
+Loading `FastEmbedEmbedding` or a multi-GB GGUF through `LlamaCPP` costs
+seconds to tens of seconds and several GB of RSS, so models must be built
+once per process and shared. This module provides `ModelRegistry`, a small
+thread-safe cache keyed by `ModelSpec` (kind, model name, constructor
+params) with:
+
+- lazy loading on first `get()` (concurrent callers for the same spec wait
+  for a single load instead of loading twice),
+- reference counting via `get()`/`release()` or the `acquire()` context
+  manager,
+- an explicit `unload()` API (only idle models are dropped unless forced),
+- `warm_up()` used by the FastAPI startup hook.
+
+Model specs used across the backend are built by the `*_spec()` helpers so
+the matcher, the ingestion path, the agents and the warm-up hook all resolve
+to the same registry entries.
+
+Environment variables:
+- `MODEL_PATH` / `MODEL_URL` - local GGUF path and download URL.
+- `MODEL_AUTO_DOWNLOAD` - set to `false` to never download the GGUF.
+- `EMBED_BACKEND` - embedding factory kind, `fastembed` (default; quantized
+  ONNX on CPU) or `huggingface`.
+- `EMBED_MODEL` - embedding model used for both resume ingestion and job
+  matching (default `BAAI/bge-base-en-v1.5`; `MATCH_EMBED_MODEL` is still
+  honoured as a fallback).
+- `EMBED_THREADS` - ONNX runtime threads for FastEmbed (default: runtime choice).
+- `INFERENCE_BACKEND` - `scheduler` (default): the matcher's and the agents'
+  LLMs submit prompts to the shared `backend.utils.inference` scheduler, which
+  owns the only copy of the model; `direct`: each loads its own LlamaCPP.
+- `MODEL_WARMUP` - comma separated list of `embed`, `ingest`, `llm`, `agent_llm`
+  to load at startup (default `embed`). Use `none` to disable.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from backend.utils.download import download_model, verify_file
+from backend.utils.inference import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.abspath("models/mistral-7b-instruct-v0.2.Q4_K_M.gguf")
+DEFAULT_MODEL_URL = "https://huggingface.co/TheBloke/Mistral-7B-Instruct-v0.2-GGUF/resolve/main/mistral-7b-instruct-v0.2.Q4_K_M.gguf"
+DEFAULT_EMBED_BACKEND = "fastembed"
+DEFAULT_EMBED_MODEL = "BAAI/bge-base-en-v1.5"
+
+
+class ModelSpec(NamedTuple):
+    """Identity of a loaded model: factory kind, model name/path and params.
+
+    Params are constructor keyword arguments and must be hashable scalars.
+    """
+
+    kind: str
+    name: str
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    @classmethod
+    def create(cls, kind: str, name: str, **params: Any) -> "ModelSpec":
+        return cls(kind, name, tuple(sorted(params.items())))
+
+    def kwargs(self) -> Dict[str, Any]:
+        return dict(self.params)
+
+
+class _Entry:
+    __slots__ = ("model", "refcount", "loaded_at", "load_seconds", "lock")
+
+    def __init__(self) -> None:
+        self.model: Any = None
+        self.refcount = 0
+        self.loaded_at: Optional[float] = None
+        self.load_seconds = 0.0
+        self.lock = threading.Lock()
+
+
+def _fastembed_factory(spec: ModelSpec) -> Any:
+    from llama_index.embeddings.fastembed import FastEmbedEmbedding
+
+    return FastEmbedEmbedding(model_name=spec.name, **spec.kwargs())
+
+
+def _huggingface_factory(spec: ModelSpec) -> Any:
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    return HuggingFaceEmbedding(model_name=spec.name, **spec.kwargs())
+
+
+def _llama_index_llamacpp_factory(spec: ModelSpec) -> Any:
+    from llama_index.llms.llama_cpp import LlamaCPP
+
+    ensure_model_file(spec.name)
+    return LlamaCPP(model_path=spec.name, **spec.kwargs())
+
+
+def _langchain_llamacpp_factory(spec: ModelSpec) -> Any:
+    from langchain_community.llms import LlamaCpp
+
+    ensure_model_file(spec.name)
+    return LlamaCpp(model_path=spec.name, **spec.kwargs())
+
+
+def _llama_cpp_factory(spec: ModelSpec) -> Any:
+    from llama_cpp import Llama
+
+    ensure_model_file(spec.name)
+    return Llama(model_path=spec.name, verbose=False, **spec.kwargs())
+
+
+def _scheduler_llama_index_factory(spec: ModelSpec) -> Any:
+    from backend.utils.inference import llama_index_llm
+
+    return llama_index_llm(**spec.kwargs())
+
+
+def _scheduler_langchain_factory(spec: ModelSpec) -> Any:
+    from backend.utils.inference import langchain_llm
+
+    return langchain_llm(**spec.kwargs())
+
+
+class ModelRegistry:
+    """Thread-safe, reference counted cache of loaded models."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[ModelSpec, _Entry] = {}
+        self._factories: Dict[str, Callable[[ModelSpec], Any]] = {}
+
+    def register_factory(self, kind: str, factory: Callable[[ModelSpec], Any]) -> None:
+        """Register (or replace) the constructor used for specs of `kind`."""
+        with self._lock:
+            self._factories[kind] = factory
+
+    def _entry(self, spec: ModelSpec) -> _Entry:
+        with self._lock:
+            if spec.kind not in self._factories:
+                raise RuntimeError(f"No model factory registered for kind '{spec.kind}'")
+            entry = self._entries.get(spec)
+            if entry is None:
+                entry = self._entries[spec] = _Entry()
+            return entry
+
+    def _load(self, spec: ModelSpec, entry: _Entry) -> Any:
+        # Per-entry lock: concurrent callers for the same spec wait for one load
+        # while loads of unrelated models proceed in parallel.
+        with entry.lock:
+            if entry.model is None:
+                logger.info("Loading model %s (%s)", spec.name, spec.kind)
+                start = time.perf_counter()
+                entry.model = self._factories[spec.kind](spec)
+                entry.load_seconds = time.perf_counter() - start
+                entry.loaded_at = time.time()
+                logger.info("Loaded model %s in %.1fs", spec.name, entry.load_seconds)
+            return entry.model
+
+    def get(self, spec: ModelSpec) -> Any:
+        """Return the model for `spec`, loading it on first use, and take a reference."""
+        entry = self._entry(spec)
+        model = self._load(spec, entry)
+        with self._lock:
+            entry.refcount += 1
+        return model
+
+    def release(self, spec: ModelSpec) -> None:
+        """Drop a reference taken with `get()`. The model stays warm until unloaded."""
+        with self._lock:
+            entry = self._entries.get(spec)
+            if entry is None or entry.refcount == 0:
+                logger.warning("release() called for model without references: %s", spec.name)
+                return
+            entry.refcount -= 1
+
+    @contextmanager
+    def acquire(self, spec: ModelSpec) -> Iterator[Any]:
+        """Context manager pairing `get()` and `release()`."""
+        model = self.get(spec)
+        try:
+            yield model
+        finally:
+            self.release(spec)
+
+    def unload(self, spec: Optional[ModelSpec] = None, *, force: bool = False) -> List[ModelSpec]:
+        """Unload `spec` (or every model when None) and return the unloaded specs.
+
+        Models that still hold references are kept unless `force` is True.
+        """
+        with self._lock:
+            candidates = [spec] if spec is not None else list(self._entries)
+            unloaded = []
+            for candidate in candidates:
+                entry = self._entries.get(candidate)
+                if entry is None:
+                    continue
+                if entry.refcount and not force:
+                    logger.info("Not unloading %s: %d reference(s) held", candidate.name, entry.refcount)
+                    continue
+                del self._entries[candidate]
+                unloaded.append(candidate)
+        for candidate in unloaded:
+            logger.info("Unloaded model %s (%s)", candidate.name, candidate.kind)
+        return unloaded
+
+    def is_loaded(self, spec: ModelSpec) -> bool:
+        with self._lock:
+            entry = self._entries.get(spec)
+            return entry is not None and entry.model is not None
+
+    def warm_up(self, specs: List[ModelSpec]) -> None:
+        """Load `specs` without keeping references. Failures are logged, not raised."""
+        for spec in specs:
+            try:
+                self._load(spec, self._entry(spec))
+            except Exception:
+                logger.exception("Failed to warm up model %s", spec.name)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "kind": spec.kind,
+                    "name": spec.name,
+                    "params": dict(spec.params),
+                    "loaded": entry.model is not None,
+                    "refcount": entry.refcount,
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "loaded_at": entry.loaded_at,
+                }
+                for spec, entry in self._entries.items()
+            ]
+
+
+registry = ModelRegistry()
+registry.register_factory("fastembed", _fastembed_factory)
+registry.register_factory("huggingface", _huggingface_factory)
+registry.register_factory("llama_index.llamacpp", _llama_index_llamacpp_factory)
+registry.register_factory("langchain.llamacpp", _langchain_llamacpp_factory)
+registry.register_factory("llama_cpp", _llama_cpp_factory)
+registry.register_factory("scheduler.llama_index", _scheduler_llama_index_factory)
+registry.register_factory("scheduler.langchain", _scheduler_langchain_factory)
+
+
+def model_path() -> str:
+    return os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH)
+
+
+def model_auto_download_enabled() -> bool:
+    return os.getenv("MODEL_AUTO_DOWNLOAD", "true").lower() not in ("0", "false", "no")
+
+
+def ensure_model_file(path: Optional[str] = None, url: Optional[str] = None) -> str:
+    """Download the GGUF to `path` when missing and auto-download is enabled.
+
+    With `MODEL_SHA256` set, an existing file is verified first (cheaply,
+    through the manifest written after a verified download) and downloaded
+    again if it does not match.
+    """
+    path = path or model_path()
+    expected = os.getenv("MODEL_SHA256")
+    if os.path.exists(path) and (not expected or verify_file(path, expected)):
+        return path
+    if not model_auto_download_enabled():
+        if os.path.exists(path):
+            raise RuntimeError(f"{path} does not match MODEL_SHA256 and MODEL_AUTO_DOWNLOAD is disabled")
+        return path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    download_model(
+        url or os.getenv("MODEL_URL", DEFAULT_MODEL_URL),
+        path,
+        model_sha256=expected,
+        progress=os.getenv("MODEL_DOWNLOAD_PROGRESS", "false").lower() in ("1", "true", "yes"),
+    )
+    return path
+
+
+def embedding_spec() -> ModelSpec:
+    """The single embedding model shared by ingestion and matching.
+
+    Indexes are only comparable with queries embedded by the same model, so
+    both paths resolve to this spec (see `backend.utils.embedding_service`).
+    """
+    backend = os.getenv("EMBED_BACKEND", DEFAULT_EMBED_BACKEND)
+    name = os.getenv("EMBED_MODEL") or os.getenv("MATCH_EMBED_MODEL") or DEFAULT_EMBED_MODEL
+    params = {}
+    if backend == "fastembed" and os.getenv("EMBED_THREADS"):
+        params["threads"] = int(os.environ["EMBED_THREADS"])
+    return ModelSpec.create(backend, name, **params)
+
+
+def matcher_embed_spec() -> ModelSpec:
+    return embedding_spec()
+
+
+def ingest_embed_spec() -> ModelSpec:
+    return embedding_spec()
+
+
+def inference_backend() -> str:
+    backend = os.getenv("INFERENCE_BACKEND", "scheduler")
+    if backend not in ("scheduler", "direct"):
+        raise ValueError(f"Unknown INFERENCE_BACKEND: {backend}")
+    return backend
+
+
+def _inference_model_name() -> str:
+    return os.getenv("INFERENCE_SERVER_URL") or model_path()
+
+
+def matcher_llm_spec() -> ModelSpec:
+    if inference_backend() == "scheduler":
+        return ModelSpec.create(
+            "scheduler.llama_index",
+            _inference_model_name(),
+            temperature=0.1,
+            max_tokens=512,
+            context_window=2048,
+            priority=PRIORITY_INTERACTIVE,
+        )
+    return ModelSpec.create(
+        "llama_index.llamacpp",
+        model_path(),
+        temperature=0.1,
+        max_new_tokens=512,
+        context_window=2048,
+    )
+
+
+def agent_llm_spec() -> ModelSpec:
+    if inference_backend() == "scheduler":
+        return ModelSpec.create(
+            "scheduler.langchain",
+            _inference_model_name(),
+            temperature=0.2,
+            max_tokens=1024,
+            priority=PRIORITY_BACKGROUND,
+        )
+    return ModelSpec.create(
+        "langchain.llamacpp",
+        model_path(),
+        temperature=0.2,
+        max_tokens=1024,
+        n_ctx=4096,
+        n_gpu_layers=35,
+        verbose=True,
+    )
+
+
+_WARMUP_SPECS: Dict[str, Callable[[], ModelSpec]] = {
+    "embed": matcher_embed_spec,
+    "ingest": ingest_embed_spec,
+    "llm": matcher_llm_spec,
+    "agent_llm": agent_llm_spec,
+}
+
+
+def warm_up_from_env() -> None:
+    """Warm up the models listed in `MODEL_WARMUP` (see module docstring)."""
+    names = [n.strip() for n in os.getenv("MODEL_WARMUP", "embed").split(",") if n.strip()]
+    specs = []
+    for name in names:
+        if name == "none":
+            return
+        if name not in _WARMUP_SPECS:
+            logger.warning("Unknown MODEL_WARMUP entry: %s", name)
+            continue
+        specs.append(_WARMUP_SPECS[name]())
+    registry.warm_up(specs)
@@ -0,0 +1,136 @@
+"""Shared, pooled MongoDB clients for the whole backend.
+
+`MongoClient` owns a connection pool and is meant to be created once per
+process; building one per call pays a TCP + auth handshake every time. All
+data access goes through the helpers below, which lazily create a single
+client (and a single `motor` client for async handlers) and agree on the
+URI and database names.
+
+Environment variables:
+- `MONGO_URI` - full connection string. When unset it is built from
+  `MONGO_HOST` (default `mongodb`), `MONGO_PORT` (default `27017`) and the
+  optional `MONGO_INITDB_ROOT_USERNAME` / `MONGO_INITDB_ROOT_PASSWORD`.
+- `CANDIDATE_DB_NAME` - resumes, GridFS files and profiles (default `DB_NAME`
+  or `candidate_data`).
+- `JOBS_DB_NAME` - scraped job postings (default `job_data`).
+- `MONGO_MAX_POOL_SIZE` (100), `MONGO_MIN_POOL_SIZE` (0),
+  `MONGO_MAX_IDLE_TIME_MS` (300000), `MONGO_CONNECT_TIMEOUT_MS` (5000),
+  `MONGO_SOCKET_TIMEOUT_MS` (30000), `MONGO_SERVER_SELECTION_TIMEOUT_MS` (5000).
+
+`connect()` / `close()` are the lifecycle hooks wired to FastAPI startup and
+shutdown.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import quote_plus
+
+import gridfs
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client: Optional[MongoClient] = None
+_async_client: Any = None
+_gridfs: Optional[gridfs.GridFS] = None
+
+
+def mongo_uri() -> str:
+    uri = os.getenv("MONGO_URI")
+    if uri:
+        return uri
+    host = os.getenv("MONGO_HOST", "mongodb")
+    port = os.getenv("MONGO_PORT", "27017")
+    user = os.getenv("MONGO_INITDB_ROOT_USERNAME")
+    password = os.getenv("MONGO_INITDB_ROOT_PASSWORD")
+    if user and password:
+        return f"mongodb://{quote_plus(user)}:{quote_plus(password)}@{host}:{port}/"
+    return f"mongodb://{host}:{port}/"
+
+
+def candidate_db_name() -> str:
+    return os.getenv("CANDIDATE_DB_NAME", os.getenv("DB_NAME", "candidate_data"))
+
+
+def jobs_db_name() -> str:
+    return os.getenv("JOBS_DB_NAME", "job_data")
+
+
+def client_options() -> Dict[str, int]:
+    """Pool size and timeout options shared by the sync and async clients."""
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    }
+
+
+def get_client() -> MongoClient:
+    """Return the process-wide pooled `MongoClient`."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = MongoClient(mongo_uri(), **client_options())
+        return _client
+
+
+def candidate_db():
+    return get_client()[candidate_db_name()]
+
+
+def jobs_db():
+    return get_client()[jobs_db_name()]
+
+
+def candidate_gridfs() -> gridfs.GridFS:
+    """Return the shared GridFS handle for uploaded candidate files."""
+    global _gridfs
+    db = candidate_db()
+    with _lock:
+        if _gridfs is None:
+            _gridfs = gridfs.GridFS(db)
+        return _gridfs
+
+
+def get_async_client():
+    """Return the process-wide `motor` client for use inside async handlers."""
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            _async_client = AsyncIOMotorClient(mongo_uri(), **client_options())
+        return _async_client
+
+
+def async_candidate_db():
+    return get_async_client()[candidate_db_name()]
+
+
+def async_jobs_db():
+    return get_async_client()[jobs_db_name()]
+
+
+def connect() -> None:
+    """Startup hook: create the pooled client so the first request does not pay for it."""
+    get_client()
+    logger.info("MongoDB client pool created for %s", candidate_db_name())
+
+
+def close() -> None:
+    """Shutdown hook: close the pooled clients."""
+    global _client, _async_client, _gridfs
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = _gridfs = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        async_client.close()
@@ -0,0 +1,95 @@
+"""Chunking and incremental-update planning for uploaded candidate documents.
+
+Every stored resume chunk carries the id of the document it came from
+(`resume` by default, e.g. `cover_letter` for a second upload) and the
+SHA-256 of its text. `plan_ingest()` compares a new version of one document
+with what is already stored and returns:
+
+- the chunks to embed and add (text not stored yet for that document;
+  duplicate chunks within the upload are collapsed),
+- the stored chunks to delete (left over from the superseded version),
+- how many stored chunks are kept as they are.
+
+Chunks of other documents are never touched, so re-uploading an unchanged
+resume embeds nothing and adding a cover letter costs only that document.
+Chunk ids (`chunk_id()`) are derived from the document id and the text
+hash, so an unchanged chunk keeps its id across uploads.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+DEFAULT_DOCUMENT_ID = "resume"
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+
+class Chunk(NamedTuple):
+    id: str
+    document_id: str
+    hash: str
+    text: str
+
+
+class IngestPlan(NamedTuple):
+    add: List[Chunk]
+    delete: List[Any]
+    kept: int
+
+
+def split_chunks(text: Union[str, Iterable[str]]) -> List[str]:
+    """Split a document into chunks; an iterable of page texts (e.g. from
+    `backend.utils.resume_parser.iter_pdf_pages`) is split page by page as
+    the pages arrive, so chunks never span pages.
+    """
+    from llama_index.core.node_parser import SentenceSplitter
+
+    splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    if isinstance(text, str):
+        return splitter.split_text(text)
+    return [chunk for page in text if page.strip() for chunk in splitter.split_text(page)]
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(document_id: str, text_hash: str) -> str:
+    return hashlib.sha256(f"{document_id}\0{text_hash}".encode("utf-8")).hexdigest()[:32]
+
+
+def make_chunks(document_id: str, texts: Iterable[str]) -> List[Chunk]:
+    """Chunks of `texts` for `document_id`, in order, without duplicate texts."""
+    chunks = {}
+    for text in texts:
+        text_hash = chunk_hash(text)
+        if text_hash not in chunks:
+            chunks[text_hash] = Chunk(chunk_id(document_id, text_hash), document_id, text_hash, text)
+    return list(chunks.values())
+
+
+def plan_ingest(
+    existing: Iterable[Tuple[Any, Optional[str], str]],
+    document_id: str,
+    texts: Iterable[str],
+) -> IngestPlan:
+    """Diff a new version of `document_id` against the stored chunks.
+
+    `existing` yields `(key, document_id, text_hash)` per stored chunk;
+    chunks stored without a document id count as the default document. The
+    returned `delete` list holds the keys of chunks to remove.
+    """
+    wanted = {chunk.hash: chunk for chunk in make_chunks(document_id, texts)}
+    present = set()
+    delete = []
+    kept = 0
+    for key, stored_document, text_hash in existing:
+        if (stored_document or DEFAULT_DOCUMENT_ID) != document_id:
+            kept += 1
+        elif text_hash in wanted and text_hash not in present:
+            present.add(text_hash)
+            kept += 1
+        else:
+            delete.append(key)
+    return IngestPlan([chunk for h, chunk in wanted.items() if h not in present], delete, kept)
@@ -1,21 +1,248 @@
+"""Text extraction from uploaded PDF and DOCX resumes.
+
+PDF pages are yielded one at a time by `iter_pdf_pages`, so chunking can
+consume them as they are extracted:
+
+- pages are read with pypdfium2 when it is installed (much faster than
+  pdfplumber); a page whose pdfium text looks unusable (almost empty, or
+  mostly replacement characters - typical for layout-heavy or oddly encoded
+  pages) is re-read with pdfplumber,
+- pages are extracted in worker processes, in ranges of
+  `PDF_PAGES_PER_TASK`; documents with at least `PDF_PARALLEL_MIN_PAGES`
+  pages use several (pdfium is not thread-safe), still yielding pages in
+  order,
+- at most `PDF_MAX_PAGES` pages are read, and extraction taking longer than
+  `PDF_TIMEOUT_SECONDS` raises `TimeoutError` and terminates the workers,
+  so one pathological file (or page) cannot hold an ingest worker.
+
+`iter_docx_blocks` yields DOCX headers, body paragraphs and table rows (in
+document order) and footers; table rows are `cell | cell | ...`.
+
+Environment variables:
+- `PDF_ENGINE` - `auto` (default: pdfium if installed), `pdfium` or `pdfplumber`.
+- `PDF_MAX_PAGES` - page cap per document (default 100).
+- `PDF_TIMEOUT_SECONDS` - extraction deadline per document, counting only the
+  time spent waiting for the workers (default 60).
+- `PDF_WORKERS` - processes for large documents (default: CPUs, at most 4).
+- `PDF_PARALLEL_MIN_PAGES` - page count from which the pool is used (default 16).
+- `PDF_PAGES_PER_TASK` - pages per pool task (default 8).
+- `PDF_START_METHOD` - multiprocessing start method of the workers (default `spawn`).
+- `PDF_MIN_PAGE_CHARS` - pdfium text shorter than this falls back to pdfplumber (default 20).
+"""
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import time
+from typing import Iterator, List, Optional, Tuple
+
 import pdfplumber
 import docx
-import logging
+
+try:
+    import pypdfium2
+except ImportError:  # optional fast path
+    pypdfium2 = None
 
 logger = logging.getLogger(__name__)
 
+DOCUMENT_EXTENSIONS = (".pdf", ".docx")
 
-def extract_text_from_pdf(file_path):
-    logger.info("Extracting text from PDF: %s", file_path)
-    text = ""
+
+def _engine() -> str:
+    engine = os.getenv("PDF_ENGINE", "auto")
+    if engine not in ("auto", "pdfium", "pdfplumber"):
+        raise ValueError(f"Unknown PDF_ENGINE: {engine}")
+    if engine == "pdfium" and pypdfium2 is None:
+        raise RuntimeError("PDF_ENGINE=pdfium requires the pypdfium2 package")
+    if engine == "auto":
+        return "pdfium" if pypdfium2 is not None else "pdfplumber"
+    return engine
+
+
+def _needs_layout_pass(text: str) -> bool:
+    stripped = text.strip()
+    if len(stripped) < int(os.getenv("PDF_MIN_PAGE_CHARS", "20")):
+        return True
+    return stripped.count("\ufffd") > len(stripped) // 20
+
+
+def _page_count(file_path: str, engine: str) -> int:
+    if engine == "pdfium":
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            logger.debug("Extracting page: %s", page.page_number)
-            text += page.extract_text() or ""
-    return text.strip()
+        return len(pdf.pages)
 
 
-def extract_text_from_docx(file_path):
+def _iter_range(file_path: str, start: int, stop: int, engine: str) -> Iterator[str]:
+    """Text of pages `start..stop-1`, pdfium first with a pdfplumber fallback."""
+    pdfium_doc = pypdfium2.PdfDocument(file_path) if engine == "pdfium" else None
+    plumber_doc = None
+    try:
+        for number in range(start, stop):
+            text = None
+            if pdfium_doc is not None:
+                page = pdfium_doc[number]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range().replace("\r\n", "\n")
+                textpage.close()
+                page.close()
+            if text is None or _needs_layout_pass(text):
+                if plumber_doc is None:
+                    plumber_doc = pdfplumber.open(file_path)
+                logger.debug("Extracting page %d with pdfplumber", number + 1)
+                text = plumber_doc.pages[number].extract_text() or ""
+            yield text
+    finally:
+        if pdfium_doc is not None:
+            pdfium_doc.close()
+        if plumber_doc is not None:
+            plumber_doc.close()
+
+
+def _extract_range(args: Tuple[str, int, int, str]) -> List[str]:
+    # Pool task: runs in a worker process.
+    return list(_iter_range(*args))
+
+
+def _count_pages(args: Tuple[str, str]) -> int:
+    # Pool task: opening a damaged file can hang as well.
+    return _page_count(*args)
+
+
+class _Budget:
+    """Extraction time left for one document.
+
+    Only the time the caller spends blocked on the workers is charged, so a
+    slow consumer of the yielded pages does not use up the deadline.
+    """
+
+    def __init__(self, file_path: str, timeout: float) -> None:
+        self.file_path = file_path
+        self.timeout = timeout
+        self.left = timeout
+
+    def wait(self, result) -> object:
+        started = time.monotonic()
+        try:
+            if isinstance(result, multiprocessing.pool.AsyncResult):
+                return result.get(timeout=max(0.0, self.left))
+            return result.next(timeout=max(0.0, self.left))
+        except multiprocessing.TimeoutError:
+            raise TimeoutError(f"PDF extraction exceeded {self.timeout:g}s: {self.file_path}") from None
+        finally:
+            self.left -= time.monotonic() - started
+
+
+def iter_pdf_pages(
+    file_path: str,
+    max_pages: Optional[int] = None,
+    timeout: Optional[float] = None,
+    workers: Optional[int] = None,
+) -> Iterator[str]:
+    """Yield the text of each page of a PDF, in order."""
+    max_pages = max_pages if max_pages is not None else int(os.getenv("PDF_MAX_PAGES", "100"))
+    timeout = timeout if timeout is not None else float(os.getenv("PDF_TIMEOUT_SECONDS", "60"))
+    workers = workers if workers is not None else int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+    engine = _engine()
+    budget = _Budget(file_path, timeout)
+    context = multiprocessing.get_context(os.getenv("PDF_START_METHOD", "spawn"))
+
+    # Every document is read in a worker process, which is killed when the
+    # budget runs out; a page stuck in native code cannot be interrupted
+    # in-process.
+    pool = context.Pool(1)
+    try:
+        total = budget.wait(pool.apply_async(_count_pages, ((file_path, engine),)))
+        logger.info("Extracting text from PDF: %s (%d pages, %s)", file_path, total, engine)
+        if total > max_pages:
+            logger.warning("Only reading the first %d of %d pages of %s", max_pages, total, file_path)
+            total = max_pages
+
+        per_task = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+        ranges = [
+            (file_path, start, min(start + per_task, total), engine)
+            for start in range(0, total, per_task)
+        ]
+        if workers > 1 and len(ranges) > 1 and total >= int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16")):
+            pool.terminate()
+            pool = context.Pool(min(workers, len(ranges)))
+        results = pool.imap(_extract_range, ranges)
+        for _ in ranges:
+            yield from budget.wait(results)
+    finally:
+        # Also kills workers still stuck on a page after a timeout.
+        pool.terminate()
+
+
+def extract_text_from_pdf(file_path):
+    return "\n".join(iter_pdf_pages(file_path)).strip()
+
+
+def _table_rows(table) -> Iterator[str]:
+    for row in table.rows:
+        cells, previous = [], None
+        for cell in row.cells:
+            # Merged cells are repeated once per grid column.
+            if cell._tc is previous:
+                continue
+            previous = cell._tc
+            if cell.text.strip():
+                cells.append(cell.text.strip())
+        if cells:
+            yield " | ".join(cells)
+
+
+def _part_blocks(part) -> Iterator[str]:
+    for paragraph in part.paragraphs:
+        if paragraph.text.strip():
+            yield paragraph.text
+    for table in part.tables:
+        yield from _table_rows(table)
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[str]:
+    """Yield DOCX headers, body paragraphs and table rows, then footers."""
+    from docx.oxml.ns import qn
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
     logger.info("Extracting text from Docx: %s", file_path)
-    doc = docx.Document(file_path)
-    return "\n".join([para.text for para in doc.paragraphs])
+    document = docx.Document(file_path)
+    # Sections usually share ("link to previous") their header and footer.
+    seen = set()
+    for section in document.sections:
+        for block in _part_blocks(section.header):
+            if block not in seen:
+                seen.add(block)
+                yield block
+    for child in document.element.body.iterchildren():
+        if child.tag == qn("w:p"):
+            yield Paragraph(child, document).text
+        elif child.tag == qn("w:tbl"):
+            yield from _table_rows(Table(child, document))
+    for section in document.sections:
+        for block in _part_blocks(section.footer):
+            if block not in seen:
+                seen.add(block)
+                yield block
+
+
+def extract_text_from_docx(file_path):
+    return "\n".join(iter_docx_blocks(file_path))
+
+
+def iter_document_text(file_path: str, ext: str) -> Iterator[str]:
+    """Text of an uploaded document in pieces for `split_chunks`: PDF pages as
+    they are extracted, or the whole DOCX (its blocks are too short to chunk
+    one by one).
+    """
+    if ext == ".pdf":
+        return iter_pdf_pages(file_path)
+    if ext == ".docx":
+        return iter([extract_text_from_docx(file_path)])
+    raise ValueError(f"Unsupported document type: {ext}")
@@ -0,0 +1,283 @@
+"""Content-addressed storage of uploaded resume files in GridFS.
+
+`fs.put` of every upload stored the same bytes again on each re-upload, and
+reading "the" file was an arbitrary `find_one({"email": ...})`. Files are
+now stored once per content:
+
+- the GridFS file id is the SHA-256 of the bytes; the upload stream is
+  hashed in one pass and only written when no file with that id exists, so a
+  repeat upload costs one hash and no blob write,
+- `resume_uploads` records each `(email, document, sha256)` reference and
+  `resume_blobs` keeps the number of references per blob; a blob is deleted
+  when its last reference goes (`delete_user_files`). An upload takes its
+  reference before checking for the file, and the file is only deleted
+  while a conditional update still sees no references,
+- `resume_latest` points at the latest upload of each `(email, document)`,
+  which is what `read_resume` / `open_resume` return.
+
+Files uploaded before this layout (GridFS files with an `email` field) are
+still found: the newest one is used when a user has no latest pointer.
+
+`GET /resume/{email}` streams the stored file: `byte_range` parses a single
+`Range: bytes=...` header and `iter_range` reads only those bytes, chunk by
+chunk, from the GridFS stream. `resume_etag` is the content hash, so the ETag
+of an unchanged resume never changes.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from backend.utils.mongo import candidate_db, candidate_gridfs
+from backend.utils.resume_chunks import DEFAULT_DOCUMENT_ID
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 1 << 20
+RELEASE_WAIT_SECONDS = 30
+
+_indexed = False
+_indexed_lock = threading.Lock()
+
+
+def hash_stream(fileobj: BinaryIO) -> Dict[str, Any]:
+    """SHA-256 and size of `fileobj` read from its current position to the end."""
+    digest = hashlib.sha256()
+    size = 0
+    for block in iter(lambda: fileobj.read(READ_CHUNK_BYTES), b""):
+        digest.update(block)
+        size += len(block)
+    return {"sha256": digest.hexdigest(), "size": size}
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def store_resume(
+    fileobj: BinaryIO,
+    email: str,
+    filename: str,
+    document: str = DEFAULT_DOCUMENT_ID,
+    content_type: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Store an upload read from `fileobj` (seekable; e.g. `UploadFile.file`).
+
+    Returns `sha256`, `size` and `stored` (False when the bytes were
+    already in GridFS and nothing was written).
+    """
+    from gridfs.errors import FileExists
+
+    ensure_indexes()
+    start = fileobj.tell()
+    info = hash_stream(fileobj)
+    sha256 = info["sha256"]
+    fs = candidate_gridfs()
+    db = candidate_db()
+
+    # Take the blob reference before relying on the file, so a concurrent
+    # `_release` of the last other reference cannot delete it under us.
+    now = _now()
+    reference = db.resume_uploads.update_one(
+        {"email": email, "document": document, "sha256": sha256},
+        {"$set": {"uploaded_at": now, "filename": filename}, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+    )
+    if reference.upserted_id is not None:
+        db.resume_blobs.update_one(
+            {"_id": sha256},
+            {"$inc": {"refcount": 1}, "$setOnInsert": {"size": info["size"], "created_at": now}},
+            upsert=True,
+        )
+    _wait_for_release(sha256)
+
+    stored = False
+    if not fs.exists(sha256):
+        fileobj.seek(start)
+        try:
+            fs.put(fileobj, _id=sha256, filename=filename, content_type=content_type, sha256=sha256)
+            stored = True
+        except FileExists:
+            pass  # a concurrent upload of the same bytes won the race
+        except Exception:
+            if reference.upserted_id is not None:
+                db.resume_uploads.delete_one({"_id": reference.upserted_id})
+                _release(sha256)
+            raise
+    db.resume_latest.update_one(
+        {"email": email, "document": document},
+        {"$set": {
+            "sha256": sha256,
+            "filename": filename,
+            "size": info["size"],
+            "content_type": content_type,
+            "uploaded_at": now,
+        }},
+        upsert=True,
+    )
+    logger.info("Stored %s for %s (%s, %s)", filename, email, sha256[:12], "new" if stored else "deduplicated")
+    return {"sha256": sha256, "size": info["size"], "stored": stored}
+
+
+def store_resume_file(file_path: str, email: str, filename: Optional[str] = None, document: str = DEFAULT_DOCUMENT_ID) -> Dict[str, Any]:
+    with open(file_path, "rb") as f:
+        return store_resume(f, email, filename or os.path.basename(file_path), document)
+
+
+def latest_resume(email: str, document: str = DEFAULT_DOCUMENT_ID) -> Optional[Dict[str, Any]]:
+    """Metadata of the user's latest upload of `document`, or None."""
+    return candidate_db().resume_latest.find_one({"email": email, "document": document})
+
+
+def open_blob(sha256: str):
+    """A GridFS read stream of the stored file with this hash."""
+    return candidate_gridfs().get(sha256)
+
+
+def copy_blob_to(sha256: str, path: str) -> None:
+    with open(path, "wb") as f:
+        shutil.copyfileobj(open_blob(sha256), f, READ_CHUNK_BYTES)
+
+
+def open_resume(email: str, document: str = DEFAULT_DOCUMENT_ID):
+    """A GridFS read stream of the user's latest `document`, or None."""
+    latest = latest_resume(email, document)
+    if latest is not None:
+        return open_blob(latest["sha256"])
+    if document != DEFAULT_DOCUMENT_ID:
+        return None
+    # Uploaded before content addressing: use the newest legacy file.
+    for legacy in candidate_gridfs().find({"email": email}).sort("uploadDate", -1).limit(1):
+        return legacy
+    return None
+
+
+def resume_etag(stream) -> str:
+    """Strong ETag of a GridFS read stream: the SHA-256 id, or the legacy file id."""
+    return f'"{stream._id}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an `If-None-Match` header (`*` or a list of tags) matches `etag`.
+
+    Uses the weak comparison RFC 9110 prescribes for `If-None-Match`.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+def content_disposition(filename: str) -> str:
+    """`attachment` header value for any filename (RFC 6266 / RFC 5987).
+
+    Header values must be latin-1, so non-ASCII names go in `filename*` as
+    percent-encoded UTF-8, with an ASCII `filename` fallback for old clients.
+    """
+    fallback = "".join(c if 32 <= ord(c) < 127 and c not in '"\\' else "_" for c in filename) or "download"
+    value = f'attachment; filename="{fallback}"'
+    if fallback != filename:
+        value += f"; filename*=UTF-8''{quote(filename, safe='')}"
+    return value
+
+
+def byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive `(start, end)` of a single-range `Range: bytes=...` header.
+
+    Returns None when there is no usable range (absent, malformed or several
+    ranges - the whole file is sent) and raises ValueError when the range
+    lies outside a file of `size` bytes.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    if not sep or not (first + last).isdigit():
+        return None
+    if not first:  # suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError(f"Unsatisfiable range: {header}")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+def iter_range(stream, start: int, end: int) -> Iterator[bytes]:
+    """Blocks of bytes `start..end` (inclusive) of a seekable read stream."""
+    stream.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        block = stream.read(min(READ_CHUNK_BYTES, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        yield block
+
+
+def read_resume(email: str, document: str = DEFAULT_DOCUMENT_ID) -> bytes:
+    """Bytes of the user's latest `document`; raises RuntimeError if there is none."""
+    stream = open_resume(email, document)
+    if stream is None:
+        raise RuntimeError(f"Files for {email} not found. Please upload resume first.")
+    return stream.read()
+
+
+def _wait_for_release(sha256: str) -> None:
+    """Wait until no `_release` is deleting the blob's file."""
+    deadline = time.monotonic() + RELEASE_WAIT_SECONDS
+    while candidate_db().resume_blobs.find_one({"_id": sha256, "deleting": True}) is not None:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Blob {sha256} is still being deleted")
+        time.sleep(0.05)
+
+
+def _release(sha256: str) -> bool:
+    """Drop one reference to a blob; deletes it with its last reference."""
+    db = candidate_db()
+    db.resume_blobs.update_one({"_id": sha256}, {"$inc": {"refcount": -1}})
+    # Only the release whose conditional update still sees no references
+    # deletes the file; `store_resume` waits for `deleting` to be cleared.
+    claimed = db.resume_blobs.update_one(
+        {"_id": sha256, "refcount": {"$lte": 0}, "deleting": {"$exists": False}},
+        {"$set": {"deleting": True}},
+    )
+    if not claimed.modified_count:
+        return False
+    candidate_gridfs().delete(sha256)
+    if db.resume_blobs.delete_one({"_id": sha256, "refcount": {"$lte": 0}}).deleted_count:
+        return True
+    # Referenced again meanwhile: that upload writes the file again.
+    db.resume_blobs.update_one({"_id": sha256}, {"$unset": {"deleting": ""}})
+    return False
+
+
+def delete_user_files(email: str) -> int:
+    """Delete every upload reference of `email`; returns the number of blobs freed."""
+    db = candidate_db()
+    references = list(db.resume_uploads.find({"email": email}))
+    db.resume_uploads.delete_many({"email": email})
+    db.resume_latest.delete_many({"email": email})
+    freed = sum(_release(reference["sha256"]) for reference in references)
+    logger.info("Deleted %d file references of %s (%d blobs freed)", len(references), email, freed)
+    return freed
+
+
+def ensure_indexes() -> None:
+    """Create the unique reference and pointer indexes once per process."""
+    global _indexed
+    with _indexed_lock:
+        if _indexed:
+            return
+        db = candidate_db()
+        db.resume_uploads.create_index([("email", 1), ("document", 1), ("sha256", 1)], unique=True)
+        db.resume_latest.create_index([("email", 1), ("document", 1)], unique=True)
+        _indexed = True
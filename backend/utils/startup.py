@@ -0,0 +1,113 @@
+"""Import-time budget of the API.
+
+Importing `app.main` used to download and load the agents' GGUF and import
+crewai, LlamaIndex, FAISS and Playwright before the first request could be
+served. Those are now deferred to first use; `import_report()` measures the
+import in a fresh interpreter (`python -X importtime`) so regressions show up:
+
+- `seconds` - cumulative import time of the module,
+- `slowest` - the modules with the highest cumulative import time,
+- `heavy` - which of `HEAVY_MODULES` were imported (should be none),
+- `over_budget` - whether `seconds` exceeds `STARTUP_BUDGET_SECONDS`.
+
+`python -m backend.utils.startup` prints the report and exits with status 1
+when the budget is exceeded or a heavy module was imported.
+
+Environment variables:
+- `STARTUP_BUDGET_SECONDS` - import budget of the API module (default 5).
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+from typing import Any, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+HEAVY_MODULES = ("crewai", "llama_index", "faiss", "playwright", "langchain_community", "llama_cpp")
+
+
+def startup_budget() -> float:
+    return float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+
+
+def _parse_importtime(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds per module from `-X importtime` output."""
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # the header line
+        name = fields[2].strip()
+        cumulative[name] = max(cumulative.get(name, 0), int(fields[1]))
+    return cumulative
+
+
+def import_report(
+    module: str = "app.main",
+    top: int = 15,
+    budget: Optional[float] = None,
+    extra_paths: Sequence[str] = (),
+    env: Optional[Dict[str, str]] = None,
+    timeout: float = 120,
+) -> Dict[str, Any]:
+    """Import `module` in a new interpreter (from `backend/`, like uvicorn) and report.
+
+    `extra_paths` are put first on `PYTHONPATH`; `env` overrides variables of
+    the current environment. Raises RuntimeError when the import fails.
+    """
+    budget = startup_budget() if budget is None else budget
+    child_env = dict(os.environ)
+    child_env.update(env or {})
+    child_env["PYTHONPATH"] = os.pathsep.join([*extra_paths, BACKEND_DIR, REPO_DIR])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=child_env,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-4000:]}")
+
+    cumulative = _parse_importtime(result.stderr)
+    seconds = cumulative.get(module, 0) / 1e6
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    heavy = sorted({name.split(".")[0] for name in cumulative} & set(HEAVY_MODULES))
+    return {
+        "module": module,
+        "seconds": round(seconds, 3),
+        "budget_seconds": budget,
+        "over_budget": seconds > budget,
+        "heavy": heavy,
+        "slowest": [{"module": name, "seconds": round(us / 1e6, 3)} for name, us in slowest],
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the import time of the API.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    report = import_report(args.module, top=args.top, budget=args.budget)
+    print(f"{report['module']}: {report['seconds']:.3f}s (budget {report['budget_seconds']:g}s)")
+    for entry in report["slowest"]:
+        print(f"  {entry['seconds']:8.3f}s  {entry['module']}")
+    if report["heavy"]:
+        print(f"Heavy modules imported at startup: {', '.join(report['heavy'])}")
+    if report["over_budget"] or report["heavy"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Tailored resumes and cover letters for many jobs from one resume.
+
+Every prompt starts with the same instructions and the candidate's resume
+(`tailoring_prefix`), followed by a short job-specific part. The prefix is
+handed to the inference scheduler separately (`prefix=`), so the model
+evaluates the resume once and restores its state for every further document
+(`backend.utils.inference.PrefixCache`): 30 cover letters for one candidate
+cost about one resume evaluation plus 30 short job evaluations.
+
+All documents are submitted at once; the scheduler decodes them as slots
+free up and `tailor_documents` returns them in job order.
+
+Outputs are kept in the generation cache (`backend.utils.generation_cache`)
+under the template version, model, sampling parameters, resume hash and job
+text hash, so a rerun only generates documents for new or changed jobs; bump
+`TEMPLATE_VERSION` whenever a prompt above changes. `answer_questions` also
+reuses the answer to a near-identical earlier question for the same resume
+and job (by embedding similarity).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.utils.generation_cache import cache_key, generation_cache, similarity_threshold, text_hash
+from backend.utils.inference import PRIORITY_BACKGROUND, InferenceScheduler, inference_scheduler
+from backend.utils.job_text import job_to_text
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_VERSION = 1
+TEMPERATURE = 0.2
+
+DOCUMENT_INSTRUCTIONS = {
+    "resume": (
+        "Rewrite the candidate's resume for this job. Keep every fact true to the resume above, "
+        "lead with the most relevant experience and skills, and use the job's own terminology. "
+        "Return Markdown."
+    ),
+    "cover_letter": (
+        "Write a persuasive, professional cover letter (at most 350 words) from the candidate "
+        "for this job, citing concrete experience from the resume above."
+    ),
+}
+
+
+def tailoring_prefix(resume_text: str) -> str:
+    """The part shared by all of a candidate's prompts: instructions and resume."""
+    return (
+        "[INST] You are a career assistant who tailors application documents to job postings.\n\n"
+        f"Candidate resume:\n{resume_text.strip()}\n\n"
+    )
+
+
+def tailoring_prompt(prefix: str, job: Dict[str, Any], kind: str) -> str:
+    if kind not in DOCUMENT_INSTRUCTIONS:
+        raise ValueError(f"Unknown document kind: {kind}")
+    return f"{prefix}Job posting:\n{job_to_text(job)}\n\n{DOCUMENT_INSTRUCTIONS[kind]} [/INST]"
+
+
+def answer_prompt(prefix: str, job: Optional[Dict[str, Any]], question: str) -> str:
+    job_part = f"Job posting:\n{job_to_text(job)}\n\n" if job else ""
+    return (
+        f"{prefix}{job_part}Answer this application question as the candidate, truthfully, "
+        f"concisely and in the first person:\n{question.strip()} [/INST]"
+    )
+
+
+def _timeout() -> float:
+    return float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "600"))
+
+
+def _collect(pending: List[Tuple[Any, ...]], store: Callable[..., None]) -> None:
+    """Wait for each `(result, future, *entry)` and `store(result, *entry)` it.
+
+    A failed or timed-out generation does not abandon the others: every one
+    that completes is stored before the first error is re-raised. All of them
+    share one `INFERENCE_TIMEOUT_SECONDS` deadline.
+    """
+    deadline = time.monotonic() + _timeout()
+    error: Optional[BaseException] = None
+    for result, future, *entry in pending:
+        try:
+            result["text"] = future.result(timeout=max(0.0, deadline - time.monotonic())).text.strip()
+        except Exception as exc:
+            future.cancel()
+            error = error or exc
+            continue
+        store(result, *entry)
+    if error is not None:
+        raise error
+
+
+def tailor_documents(
+    resume_text: str,
+    jobs: Iterable[Dict[str, Any]],
+    kinds: Sequence[str] = ("resume", "cover_letter"),
+    scheduler: Optional[InferenceScheduler] = None,
+    priority: int = PRIORITY_BACKGROUND,
+    max_tokens: int = 1024,
+) -> List[Dict[str, Any]]:
+    """Generate each of `kinds` for every job; returns `{"job", "kind", "text", "cached"}` dicts."""
+    scheduler = scheduler or inference_scheduler()
+    cache = generation_cache()
+    prefix = tailoring_prefix(resume_text)
+    profile = text_hash(resume_text)
+    results: List[Dict[str, Any]] = []
+    pending = []
+    for job in jobs:
+        for kind in kinds:
+            prompt = tailoring_prompt(prefix, job, kind)
+            key = cache_key(
+                "tailoring", TEMPLATE_VERSION, kind, scheduler.backend.name,
+                {"temperature": TEMPERATURE, "max_tokens": max_tokens}, profile, text_hash(job_to_text(job)),
+            )
+            result = {"job": job, "kind": kind, "text": cache.get(key) if cache is not None else None, "cached": True}
+            if result["text"] is None:
+                future = scheduler.submit(
+                    prompt, prefix=prefix, priority=priority, max_tokens=max_tokens, temperature=TEMPERATURE
+                )
+                result["cached"] = False
+                pending.append((result, future, key))
+            results.append(result)
+    logger.info(
+        "Tailoring %d documents (%d cached) from one %d-character resume",
+        len(results), len(results) - len(pending), len(resume_text),
+    )
+    def store(result: Dict[str, Any], key: str) -> None:
+        if cache is not None:
+            cache.put(key, result["text"])
+
+    _collect(pending, store)
+    return results
+
+
+def _embed_questions(questions: Sequence[str]) -> Any:
+    from backend.utils.model_registry import embedding_spec, registry
+    from backend.utils.vector_scoring import embed_queries
+
+    with registry.acquire(embedding_spec()) as embed_model:
+        return embed_queries(embed_model, list(questions))
+
+
+def answer_questions(
+    resume_text: str,
+    questions: Sequence[str],
+    job: Optional[Dict[str, Any]] = None,
+    scheduler: Optional[InferenceScheduler] = None,
+    priority: int = PRIORITY_BACKGROUND,
+    max_tokens: int = 512,
+) -> List[Dict[str, Any]]:
+    """Answer application `questions`; returns `{"question", "text", "cached"}` dicts.
+
+    `cached` is `"exact"` for the same question, `"similar"` for a reused
+    answer to a near-identical one, or False for a fresh generation.
+    """
+    scheduler = scheduler or inference_scheduler()
+    cache = generation_cache()
+    prefix = tailoring_prefix(resume_text)
+    scope = cache_key(
+        "answer", TEMPLATE_VERSION, scheduler.backend.name,
+        {"temperature": TEMPERATURE, "max_tokens": max_tokens},
+        text_hash(resume_text), text_hash(job_to_text(job)) if job else None,
+    )
+    vectors = None
+    if cache is not None and similarity_threshold() > 0 and questions:
+        vectors = _embed_questions(questions)
+    results: List[Dict[str, Any]] = []
+    pending = []
+    for n, question in enumerate(questions):
+        key = cache_key(scope, question.strip())
+        result = {"question": question, "text": None, "cached": False}
+        if cache is not None:
+            result["text"] = cache.get(key)
+            if result["text"] is not None:
+                result["cached"] = "exact"
+            elif vectors is not None:
+                match = cache.nearest(scope, vectors[n])
+                if match is not None:
+                    result["text"], result["cached"] = match[0], "similar"
+        if result["text"] is None:
+            future = scheduler.submit(
+                answer_prompt(prefix, job, question),
+                prefix=prefix, priority=priority, max_tokens=max_tokens, temperature=TEMPERATURE,
+            )
+            pending.append((result, future, key, vectors[n] if vectors is not None else None))
+        results.append(result)
+    def store(result: Dict[str, Any], key: str, vector: Any) -> None:
+        if cache is not None:
+            cache.put(key, result["text"], scope=scope, vector=vector)
+
+    _collect(pending, store)
+    return results
+
+
+def resume_text(email: str) -> str:
+    """Text of the user's latest uploaded resume."""
+    from backend.utils.resume_parser import iter_document_text
+    from backend.utils.resume_store import open_resume
+
+    stream = open_resume(email)
+    if stream is None:
+        raise RuntimeError(f"Files for {email} not found. Please upload resume first.")
+    ext = os.path.splitext(stream.filename or "")[-1].lower()
+    fd, path = tempfile.mkstemp(suffix=ext)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(stream.read())
+        return "\n".join(iter_document_text(path, ext))
+    finally:
+        os.remove(path)
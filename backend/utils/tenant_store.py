@@ -0,0 +1,550 @@
+"""Sharded multi-tenant store of resume chunk vectors.
+
+The per-user layout (`faiss_index/<email>/` with an `IndexFlatL2` plus the
+LlamaIndex JSON docstore) means one directory, a handful of small files and a
+full JSON parse per user. `TenantVectorStore` keeps every user's chunks in a
+fixed number of shards instead:
+
+- a tenant (email) maps to shard `crc32(email) % TENANT_SHARDS`,
+- each shard is one SQLite file (`meta.sqlite`) with the tenants, their
+  chunk texts (zlib-compressed) and vectors, and a change log; it is the only
+  source of truth, and every change is one SQLite commit,
+- the shard's `IndexIDMap2(IndexFlatL2)` is derived from it: each process
+  brings its index up to date by replaying the log entries it has not seen,
+  and a checkpoint (`vectors-<seq>.faiss`) is written only every
+  `TENANT_CHECKPOINT_OPS` changes, so an upload does not rewrite the shard's
+  whole index file and a failed write cannot leave rows without vectors,
+- a vector's FAISS id is `(tenant_id << 32) | chunk_row`, so a tenant's
+  vectors form one contiguous id range: searches are restricted to it with an
+  `IDSelectorRange`, and `delete_tenant()` removes it in one call,
+- chunks record their document id and text hash, so `update()` applies an
+  incremental upload (`backend.utils.resume_chunks.plan_ingest`) as one
+  SQLite commit that adds and removes only the changed chunks,
+- each tenant records the embedding model that produced its vectors, so a
+  model change re-embeds that tenant from the stored texts.
+
+Scores are squared L2 distances, as with the per-user `IndexFlatL2`, so
+`match_score` keeps its meaning. Select this backend with
+`VECTOR_STORE_BACKEND=tenant` (see `backend.utils.vectorstore`) and migrate
+existing directories with:
+
+    python -m backend.utils.tenant_store migrate [--source faiss_index] [--delete-source]
+
+Environment variables:
+- `TENANT_STORE_DIR` - root directory (default `vector_store`).
+- `TENANT_SHARDS` - number of shards (default 16); fixed once data exists.
+- `TENANT_CHECKPOINT_OPS` - logged changes between index checkpoints (default 5000).
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.utils.binary_index import read_llama_dir
+from backend.utils.model_registry import ModelSpec, embedding_spec, registry
+from backend.utils.resume_chunks import DEFAULT_DOCUMENT_ID, Chunk, chunk_hash
+from backend.utils.vectorstore import VERSIONS_DIR, remove_user_dir
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_ROW_BITS = 32
+_ROW_MASK = (1 << _ROW_BITS) - 1
+_CHECKPOINT_RE = re.compile(r"^vectors-(\d+)\.faiss$")
+_SQL_BATCH = 500
+
+
+def model_key(spec: ModelSpec) -> str:
+    return f"{spec.kind}:{spec.name}"
+
+
+def _tenant_range(tenant_id: int) -> Tuple[int, int]:
+    return tenant_id << _ROW_BITS, (tenant_id + 1) << _ROW_BITS
+
+
+class _Shard:
+    """One SQLite file holding many tenants, and the FAISS index derived from it."""
+
+    def __init__(self, directory: str, dimension: int) -> None:
+        self.directory = directory
+        self.dimension = dimension
+        os.makedirs(directory, exist_ok=True)
+        self._legacy_index_path = os.path.join(directory, "vectors.faiss")
+        self._db_path = os.path.join(directory, "meta.sqlite")
+        self._lock_path = os.path.join(directory, "write.lock")
+        self._lock = threading.RLock()
+        self._index = None
+        self._seq = 0  # last log entry applied to `_index`
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tenants ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT NOT NULL UNIQUE,"
+                " model TEXT, updated_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, tenant_id INTEGER NOT NULL, text BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_tenant ON chunks(tenant_id)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+            for column, kind in (("document_id", "TEXT"), ("chunk_hash", "TEXT"), ("vector", "BLOB")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {kind}")
+            # FAISS ids added (added = 1) or removed (0), in commit order.
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS log ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, faiss_id INTEGER NOT NULL, added INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        if os.path.exists(self._legacy_index_path):
+            self._migrate_legacy_index()
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def writing(self) -> Iterator[sqlite3.Connection]:
+        """A connection whose changes are committed as one transaction on exit."""
+        # Thread lock plus a file lock: several API workers share the shard files.
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self.connect() as conn:
+                yield conn
+            # Only committed changes reach the index.
+            self.refresh()
+            self._maybe_checkpoint()
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: int) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def log(self, conn: sqlite3.Connection, faiss_ids: Sequence[int], added: bool) -> None:
+        if not faiss_ids:
+            return
+        conn.executemany("INSERT INTO log (faiss_id, added) VALUES (?, ?)", [(i, int(added)) for i in faiss_ids])
+        self._set_meta(conn, "head", conn.execute("SELECT MAX(seq) FROM log").fetchone()[0])
+
+    def _migrate_legacy_index(self) -> None:
+        """Copy the vectors of a shard written before the change log into its chunk rows."""
+        import faiss
+
+        with self.writing() as conn:
+            if not os.path.exists(self._legacy_index_path):
+                return
+            index = faiss.read_index(self._legacy_index_path)
+            updates, missing = [], []
+            for chunk_id, tenant_id in conn.execute("SELECT id, tenant_id FROM chunks WHERE vector IS NULL"):
+                try:
+                    vector = index.reconstruct((tenant_id << _ROW_BITS) | chunk_id)
+                except RuntimeError:
+                    missing.append((chunk_id,))
+                    continue
+                updates.append((np.asarray(vector, dtype="float32").tobytes(), chunk_id))
+            conn.executemany("UPDATE chunks SET vector = ? WHERE id = ?", updates)
+            # Unsearchable without a vector; the next upload of the document adds them again.
+            conn.executemany("DELETE FROM chunks WHERE id = ?", missing)
+            if missing:
+                logger.warning("Dropped %d chunks without vectors from %s", len(missing), self.directory)
+        try:
+            os.remove(self._legacy_index_path)
+        except FileNotFoundError:
+            pass  # migrated by another process
+        logger.info("Moved %d vectors of %s into its SQLite file", len(updates), self.directory)
+
+    def _checkpoints(self) -> List[Tuple[int, str]]:
+        found = [(int(m.group(1)), m.group(0)) for m in map(_CHECKPOINT_RE.match, os.listdir(self.directory)) if m]
+        return [(seq, os.path.join(self.directory, name)) for seq, name in sorted(found, reverse=True)]
+
+    def _load(self, conn: sqlite3.Connection) -> None:
+        """Load the newest checkpoint, or rebuild the index from the chunk rows."""
+        import faiss
+
+        for seq, path in self._checkpoints():
+            try:
+                self._index, self._seq = faiss.read_index(path), seq
+                return
+            except (FileNotFoundError, RuntimeError):
+                continue  # removed by a concurrent checkpoint; try the next one
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        conn.execute("BEGIN")  # one snapshot of the rows and the log head
+        seq = self._meta(conn, "head")
+        rows = conn.execute("SELECT id, tenant_id, vector FROM chunks WHERE vector IS NOT NULL")
+        while True:
+            batch = rows.fetchmany(_SQL_BATCH * 20)
+            if not batch:
+                break
+            index.add_with_ids(*self._vectors_and_ids(batch))
+        conn.commit()
+        self._index, self._seq = index, seq
+
+    def _vectors_and_ids(self, rows: Sequence[Tuple[int, int, bytes]]) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.frombuffer(b"".join(row[2] for row in rows), dtype="float32").reshape(-1, self.dimension)
+        ids = np.asarray([(tenant_id << _ROW_BITS) | chunk_id for chunk_id, tenant_id, _ in rows], dtype="int64")
+        return vectors, ids
+
+    def _apply_log(self, conn: sqlite3.Connection) -> None:
+        entries = conn.execute(
+            "SELECT seq, faiss_id, added FROM log WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        for added, group in itertools.groupby(entries, key=lambda entry: entry[2]):
+            ids = [entry[1] for entry in group]
+            # Removing first keeps a re-applied add from duplicating an id.
+            self._index.remove_ids(np.asarray(ids, dtype="int64"))
+            if not added:
+                continue
+            for start in range(0, len(ids), _SQL_BATCH):
+                chunk_ids = [i & _ROW_MASK for i in ids[start:start + _SQL_BATCH]]
+                rows = conn.execute(
+                    "SELECT id, tenant_id, vector FROM chunks WHERE vector IS NOT NULL AND id IN (%s)"
+                    % ",".join("?" * len(chunk_ids)),
+                    chunk_ids,
+                ).fetchall()
+                if rows:  # chunks deleted by a later entry are gone already
+                    self._index.add_with_ids(*self._vectors_and_ids(rows))
+        if entries:
+            self._seq = entries[-1][0]
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the committed log."""
+        with self._lock, self.connect() as conn:
+            if self._index is not None and self._seq == self._meta(conn, "head"):
+                return
+            if self._index is None or self._seq < self._meta(conn, "trimmed"):
+                self._load(conn)
+            self._apply_log(conn)
+
+    def _maybe_checkpoint(self) -> None:
+        import faiss
+
+        with self.connect() as conn:
+            last = self._meta(conn, "checkpoint")
+            if self._seq - last < int(os.getenv("TENANT_CHECKPOINT_OPS", "5000")):
+                return
+            path = os.path.join(self.directory, f"vectors-{self._seq:012d}.faiss")
+            faiss.write_index(self._index, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            # The previous checkpoint and the log after it are kept, so other
+            # processes can still catch up incrementally from there.
+            conn.execute("DELETE FROM log WHERE seq <= ?", (last,))
+            self._set_meta(conn, "trimmed", last)
+            self._set_meta(conn, "checkpoint", self._seq)
+        for seq, old_path in self._checkpoints():
+            if seq < last:
+                os.remove(old_path)
+
+    @contextmanager
+    def reading(self):
+        """The shard's FAISS index, held under the shard lock while in use."""
+        with self._lock:
+            self.refresh()
+            yield self._index
+
+    def version(self) -> int:
+        """Changes whenever this shard is written (used as a cache key)."""
+        with self.connect() as conn:
+            return self._meta(conn, "head")
+
+
+class TenantVectorStore:
+    """Resume chunk vectors of all users, sharded by email."""
+
+    def __init__(self, root: str, dimension: int, shards: Optional[int] = None) -> None:
+        self.root = root
+        self.dimension = dimension
+        self.shards = shards or int(os.getenv("TENANT_SHARDS", "16"))
+        self._shards: Dict[int, _Shard] = {}
+        self._shards_lock = threading.Lock()
+
+    def shard_for(self, email: str) -> _Shard:
+        number = zlib.crc32(email.strip().lower().encode("utf-8")) % self.shards
+        with self._shards_lock:
+            if number not in self._shards:
+                self._shards[number] = _Shard(os.path.join(self.root, f"shard-{number:03d}"), self.dimension)
+            return self._shards[number]
+
+    @staticmethod
+    def _tenant_row(conn: sqlite3.Connection, email: str) -> Optional[Tuple[int, Optional[str]]]:
+        return conn.execute("SELECT id, model FROM tenants WHERE email = ?", (email,)).fetchone()
+
+    def has_tenant(self, email: str) -> bool:
+        with self.shard_for(email).connect() as conn:
+            row = self._tenant_row(conn, email)
+            return bool(row) and conn.execute(
+                "SELECT 1 FROM chunks WHERE tenant_id = ? LIMIT 1", (row[0],)
+            ).fetchone() is not None
+
+    def tenant_model(self, email: str) -> Optional[str]:
+        with self.shard_for(email).connect() as conn:
+            row = self._tenant_row(conn, email)
+        return row[1] if row else None
+
+    def version(self, email: str):
+        return self.shard_for(email).version()
+
+    def update(
+        self,
+        email: str,
+        chunks: Sequence[Chunk],
+        vectors: np.ndarray,
+        model: Optional[str] = None,
+        delete: Sequence[int] = (),
+        replace: bool = False,
+    ) -> int:
+        """Add `chunks` for `email` and delete its chunk rows in `delete` (all of
+        them with `replace=True`) in one SQLite commit; returns the number added.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        if len(chunks) != len(vectors):
+            raise ValueError("chunks and vectors must have the same length")
+        shard = self.shard_for(email)
+        with shard.writing() as conn:
+            row = self._tenant_row(conn, email)
+            if row is None:
+                tenant_id = conn.execute(
+                    "INSERT INTO tenants (email, model, updated_at) VALUES (?, ?, ?)", (email, model, time.time())
+                ).lastrowid
+            else:
+                tenant_id = row[0]
+                conn.execute(
+                    "UPDATE tenants SET model = COALESCE(?, model), updated_at = ? WHERE id = ?",
+                    (model, time.time(), tenant_id),
+                )
+            if replace:
+                delete = [r[0] for r in conn.execute("SELECT id FROM chunks WHERE tenant_id = ?", (tenant_id,))]
+            conn.executemany(
+                "DELETE FROM chunks WHERE id = ? AND tenant_id = ?", [(chunk_id, tenant_id) for chunk_id in delete]
+            )
+            shard.log(conn, [(tenant_id << _ROW_BITS) | chunk_id for chunk_id in delete], added=False)
+            ids = []
+            for chunk, vector in zip(chunks, vectors):
+                chunk_id = conn.execute(
+                    "INSERT INTO chunks (tenant_id, text, document_id, chunk_hash, vector) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        tenant_id, zlib.compress(chunk.text.encode("utf-8")), chunk.document_id, chunk.hash,
+                        vector.tobytes(),
+                    ),
+                ).lastrowid
+                ids.append((tenant_id << _ROW_BITS) | chunk_id)
+            shard.log(conn, ids, added=True)
+        return len(chunks)
+
+    def add(
+        self,
+        email: str,
+        texts: Sequence[str],
+        vectors: np.ndarray,
+        model: Optional[str] = None,
+        document_id: str = DEFAULT_DOCUMENT_ID,
+    ) -> int:
+        """Append `texts` as chunks of `document_id`; returns the number added."""
+        chunks = [Chunk("", document_id, chunk_hash(text), text) for text in texts]
+        return self.update(email, chunks, vectors, model)
+
+    def replace(self, email: str, texts: Sequence[str], vectors: np.ndarray, model: Optional[str] = None) -> int:
+        chunks = [Chunk("", DEFAULT_DOCUMENT_ID, chunk_hash(text), text) for text in texts]
+        return self.update(email, chunks, vectors, model, replace=True)
+
+    def stored_chunks(self, email: str) -> List[Tuple[int, str, str]]:
+        """`(chunk row, document id, text hash)` of every chunk of `email`, in order."""
+        with self.shard_for(email).connect() as conn:
+            row = self._tenant_row(conn, email)
+            if row is None:
+                return []
+            rows = conn.execute(
+                "SELECT id, document_id, chunk_hash, text FROM chunks WHERE tenant_id = ? ORDER BY id", (row[0],)
+            ).fetchall()
+        return [
+            (chunk_id, document_id or DEFAULT_DOCUMENT_ID, text_hash or chunk_hash(zlib.decompress(text).decode("utf-8")))
+            for chunk_id, document_id, text_hash, text in rows
+        ]
+
+    def delete_tenant(self, email: str) -> int:
+        """Delete every vector and chunk of `email`; returns the number of chunks removed."""
+        shard = self.shard_for(email)
+        with shard.writing() as conn:
+            row = self._tenant_row(conn, email)
+            if row is None:
+                return 0
+            chunk_ids = [r[0] for r in conn.execute("SELECT id FROM chunks WHERE tenant_id = ?", (row[0],))]
+            removed = conn.execute("DELETE FROM chunks WHERE tenant_id = ?", (row[0],)).rowcount
+            conn.execute("DELETE FROM tenants WHERE id = ?", (row[0],))
+            shard.log(conn, [(row[0] << _ROW_BITS) | chunk_id for chunk_id in chunk_ids], added=False)
+        logger.info("Deleted %d chunks of tenant %s", removed, email)
+        return removed
+
+    def _chunk_rows(self, email: str) -> Tuple[Optional[int], List[Tuple[int, bytes]]]:
+        with self.shard_for(email).connect() as conn:
+            row = self._tenant_row(conn, email)
+            if row is None:
+                return None, []
+            return row[0], conn.execute(
+                "SELECT id, text FROM chunks WHERE tenant_id = ? ORDER BY id", (row[0],)
+            ).fetchall()
+
+    def texts(self, email: str) -> List[str]:
+        return [zlib.decompress(text).decode("utf-8") for _, text in self._chunk_rows(email)[1]]
+
+    def vectors(self, email: str) -> np.ndarray:
+        """The tenant's chunk vectors as an (n, dim) float32 array."""
+        with self.shard_for(email).connect() as conn:
+            row = self._tenant_row(conn, email)
+            rows = [] if row is None else conn.execute(
+                "SELECT vector FROM chunks WHERE tenant_id = ? ORDER BY id", (row[0],)
+            ).fetchall()
+        if not rows:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.frombuffer(b"".join(vector for (vector,) in rows), dtype="float32").reshape(-1, self.dimension).copy()
+
+    def search(self, email: str, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, List[List[Optional[str]]]]:
+        """Nearest `k` chunks of `email` per query: (squared L2 distances, chunk texts)."""
+        import faiss
+
+        queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.dimension)
+        tenant_id, rows = self._chunk_rows(email)
+        if not rows:
+            return np.zeros((len(queries), 0), dtype="float32"), [[] for _ in range(len(queries))]
+        params = faiss.SearchParameters(sel=faiss.IDSelectorRange(*_tenant_range(tenant_id)))
+        with self.shard_for(email).reading() as index:
+            distances, ids = index.search(queries, min(k, len(rows)), params=params)
+        texts = {chunk_id: text for chunk_id, text in rows}
+        chunks = [
+            [
+                zlib.decompress(texts[int(i) & _ROW_MASK]).decode("utf-8") if int(i) & _ROW_MASK in texts else None
+                for i in row
+            ]
+            for row in ids
+        ]
+        return distances, chunks
+
+    def reembed_tenant(self, email: str, spec: Optional[ModelSpec] = None) -> int:
+        """Re-embed `email`'s stored chunk texts with `spec` (default: the configured model)."""
+        spec = spec or embedding_spec()
+        chunks = [
+            Chunk("", document_id, text_hash, text)
+            for (_, document_id, text_hash), text in zip(self.stored_chunks(email), self.texts(email))
+        ]
+        if not chunks:
+            return 0
+        with registry.acquire(spec) as embed_model:
+            vectors = np.asarray(embed_model.get_text_embedding_batch([c.text for c in chunks]), dtype="float32")
+        return self.update(email, chunks, vectors, model_key(spec), replace=True)
+
+    def ensure_tenant_current(self, email: str) -> bool:
+        """Re-embed the tenant if its vectors came from another model; True if it did."""
+        spec = embedding_spec()
+        if self.tenant_model(email) == model_key(spec):
+            return False
+        if os.getenv("EMBED_REEMBED_ON_MISMATCH", "true").lower() in ("0", "false", "no"):
+            raise RuntimeError(f"Vectors for {email} were not built with {spec.name}. Please upload resume again.")
+        logger.warning("Embedding model changed for tenant %s", email)
+        self.reembed_tenant(email, spec)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        tenants = chunks = 0
+        for number in range(self.shards):
+            path = os.path.join(self.root, f"shard-{number:03d}", "meta.sqlite")
+            if not os.path.exists(path):
+                continue
+            conn = sqlite3.connect(path)
+            try:
+                tenants += conn.execute("SELECT COUNT(*) FROM tenants").fetchone()[0]
+                chunks += conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            finally:
+                conn.close()
+        return {"shards": self.shards, "tenants": tenants, "chunks": chunks}
+
+
+_store: Optional[TenantVectorStore] = None
+_store_lock = threading.Lock()
+
+
+def tenant_store() -> TenantVectorStore:
+    """The process-wide store, sized for the configured embedding model."""
+    global _store
+    from backend.utils.embedding_service import embedding_dimension
+
+    with _store_lock:
+        if _store is None:
+            _store = TenantVectorStore(os.getenv("TENANT_STORE_DIR", "vector_store"), embedding_dimension())
+        return _store
+
+
+# -- Migration from the per-email layout ---------------------------------------
+
+
+def migrate(source: str = "faiss_index", store: Optional[TenantVectorStore] = None, delete_source: bool = False) -> int:
+    """Copy every `source/<email>/` directory into the tenant store; returns tenants migrated."""
+    store = store or tenant_store()
+    migrated = 0
+    for email in sorted(os.listdir(source)):
+        user_dir = os.path.join(source, email)
+        if email == VERSIONS_DIR or not os.path.isdir(user_dir):
+            continue
+        try:
+            nodes, vectors, model = read_llama_dir(user_dir)
+            texts = [node.get_content() for node in nodes]
+            if vectors is None or vectors.shape[1] != store.dimension:
+                spec = embedding_spec()
+                with registry.acquire(spec) as embed_model:
+                    vectors = np.asarray(embed_model.get_text_embedding_batch(texts), dtype="float32")
+                model = model_key(spec)
+            store.replace(email, texts, vectors, model)
+        except Exception:
+            logger.exception("Failed to migrate %s", user_dir)
+            continue
+        migrated += 1
+        if delete_source:
+            remove_user_dir(source, email)
+    logger.info("Migrated %d tenants from %s", migrated, source)
+    return migrated
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the multi-tenant resume vector store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = sub.add_parser("migrate", help="import the per-email faiss_index/<email>/ directories")
+    migrate_cmd.add_argument("--source", default="faiss_index")
+    migrate_cmd.add_argument("--delete-source", action="store_true")
+    delete_cmd = sub.add_parser("delete", help="delete one tenant's vectors")
+    delete_cmd.add_argument("email")
+    sub.add_parser("stats", help="print tenant and chunk counts")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        print(f"Migrated {migrate(args.source, delete_source=args.delete_source)} tenants.")
+    elif args.command == "delete":
+        print(f"Deleted {tenant_store().delete_tenant(args.email)} chunks.")
+    else:
+        print(tenant_store().stats())
+
+
+if __name__ == "__main__":
+    main()
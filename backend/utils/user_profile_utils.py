@@ -1,17 +1,24 @@
 import os
-from pymongo import MongoClient
+
+from backend.utils.mongo import async_candidate_db, candidate_db
+
+
+def _faiss_index_exists(email: str) -> bool:
+    faiss_index_path = f"vector_stores/{email}.index"
+    return os.path.exists(faiss_index_path)
 
 
 def check_user_profile(email: str) -> bool:
     """Returns True if profile exists in both MongoDB and FAISS."""
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://mongodb:27017/")
-    client: MongoClient = MongoClient(mongo_uri)
-    db_name = os.getenv("DB_NAME", "job_data")
-    db = client[db_name]
-    exists_in_db = db.user_profiles.find_one({"email": email}) is not None
+    exists_in_db = candidate_db().user_profiles.find_one({"email": email}) is not None
 
     # FAISS check
-    faiss_index_path = f"vector_stores/{email}.index"
-    exists_in_faiss = os.path.exists(faiss_index_path)
+    exists_in_faiss = _faiss_index_exists(email)
 
     return exists_in_db and exists_in_faiss
+
+
+async def check_user_profile_async(email: str) -> bool:
+    """Async flavour of `check_user_profile` for FastAPI handlers (uses motor)."""
+    exists_in_db = await async_candidate_db().user_profiles.find_one({"email": email}) is not None
+    return exists_in_db and _faiss_index_exists(email)
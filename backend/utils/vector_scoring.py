@@ -0,0 +1,75 @@
+"""Batch similarity scoring of job embeddings against stored resume vectors.
+
+The LLM query engine path only reads `response.source_nodes[0].score`, i.e.
+the retrieval score of the nearest resume chunk. These helpers compute the
+same number for many jobs at once, as one matrix operation, without running
+any generation.
+
+For the `IndexFlatL2` indexes written by `embed_candidate`, the score is the
+squared L2 distance returned by FAISS (which is what `FaissVectorStore`
+reports as the node score), so `match_score` semantics are unchanged.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Number of query rows scored per block in the NumPy path; bounds the size of
+# the temporary (block x resume_vectors) distance matrix.
+_BLOCK_ROWS = 4096
+
+
+def embed_queries(embed_model: Any, texts: Sequence[str], batch_size: int = 256) -> np.ndarray:
+    """Embed `texts` as queries and return a float32 matrix of shape (n, dim).
+
+    FastEmbed models expose a batched `query_embed`; other LlamaIndex
+    embedding models fall back to `get_query_embedding` per text.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    rows: List[Any] = []
+    backend_model = getattr(embed_model, "_model", None)
+    for start in range(0, len(texts), batch_size):
+        batch = list(texts[start:start + batch_size])
+        if backend_model is not None and hasattr(backend_model, "query_embed"):
+            rows.extend(backend_model.query_embed(batch))
+        else:
+            rows.extend(embed_model.get_query_embedding(text) for text in batch)
+    return np.asarray(rows, dtype="float32")
+
+
+def nearest_scores(queries: np.ndarray, resume: Any) -> np.ndarray:
+    """Score each query row against its nearest stored resume vector.
+
+    `resume` is either a FAISS index (searched with all queries at once) or
+    a (n, dim) array of resume vectors, in which case squared L2 distances
+    are computed with NumPy. Returns a float array with one score per query;
+    queries with no stored vectors score 0.
+    """
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    if queries.shape[0] == 0:
+        return np.zeros(0, dtype="float32")
+
+    if hasattr(resume, "search"):
+        if resume.ntotal == 0:
+            return np.zeros(queries.shape[0], dtype="float32")
+        distances, ids = resume.search(queries, 1)
+        scores = distances[:, 0].copy()
+        scores[ids[:, 0] < 0] = 0
+        return scores
+
+    vectors = np.asarray(resume, dtype="float32")
+    if vectors.size == 0:
+        return np.zeros(queries.shape[0], dtype="float32")
+    vector_norms = np.einsum("ij,ij->i", vectors, vectors)
+    scores = np.empty(queries.shape[0], dtype="float32")
+    for start in range(0, queries.shape[0], _BLOCK_ROWS):
+        block = queries[start:start + _BLOCK_ROWS]
+        block_norms = np.einsum("ij,ij->i", block, block)
+        distances = block_norms[:, None] + vector_norms[None, :] - 2.0 * (block @ vectors.T)
+        scores[start:start + len(block)] = np.maximum(distances.min(axis=1), 0)
+    return scores
@@ -1,8 +1,102 @@
+"""Where users' resume vectors live.
+
+`VECTOR_STORE_BACKEND` selects the layout:
+- `per_user` (default) - one LlamaIndex/FAISS directory per email under
+  `VECTOR_INDEX_PATH` (default `faiss_index`); `<email>` is a symlink to the
+  current version in `.versions/<email>/`, replaced atomically on upload,
+- `binary` - the same per-email directories with memory-mapped vectors and
+  SQLite nodes instead of JSON (`backend.utils.binary_index`),
+- `tenant` - the sharded multi-tenant store in `backend.utils.tenant_store`.
+"""
 import os
 import pickle
+import shutil
+import uuid
 
 VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "faiss_index")
 METADATA_STORE_PATH = os.getenv("METADATA_STORE_PATH", "metadata.pkl")
+VECTOR_STORE_BACKENDS = ("per_user", "binary", "tenant")
+VERSIONS_DIR = ".versions"
+
+
+def vector_store_backend() -> str:
+    backend = os.getenv("VECTOR_STORE_BACKEND", "per_user")
+    if backend not in VECTOR_STORE_BACKENDS:
+        raise ValueError(f"Unknown VECTOR_STORE_BACKEND {backend!r}; expected one of {VECTOR_STORE_BACKENDS}")
+    return backend
+
+
+def check_user_dir_name(email: str) -> str:
+    """`email` if it is usable as one directory name; raises ValueError otherwise."""
+    if email in ("", ".", "..") or any(c in email for c in "/\\\0"):
+        raise ValueError(f"Invalid email for a vector directory: {email!r}")
+    return email
+
+
+def _inside(path: str, root: str) -> bool:
+    root = os.path.realpath(root)
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+def delete_user_vectors(email: str) -> bool:
+    """Delete every stored resume vector of `email`; returns True if any existed."""
+    check_user_dir_name(email)
+    if vector_store_backend() == "tenant":
+        from backend.utils.tenant_store import tenant_store
+
+        return tenant_store().delete_tenant(email) > 0
+    return remove_user_dir(VECTOR_INDEX_PATH, email)
+
+
+def remove_user_dir(root: str, email: str) -> bool:
+    """Remove `root/<email>` and its versions; returns True if it existed."""
+    check_user_dir_name(email)
+    user_dir = os.path.join(root, email)
+    versions_root = os.path.join(root, VERSIONS_DIR)
+    versions = os.path.join(versions_root, email)
+    # The symlink itself is removed, not followed; anything rmtree'd must
+    # resolve to a directory strictly below its root.
+    for path, parent in ((user_dir, root), (versions, versions_root)):
+        if os.path.lexists(path) and not os.path.islink(path) and (
+            not _inside(path, parent) or os.path.realpath(path) == os.path.realpath(parent)
+        ):
+            raise ValueError(f"Refusing to remove {path!r} outside {parent!r}")
+    existed = os.path.lexists(user_dir)
+    if os.path.islink(user_dir):
+        os.remove(user_dir)
+    elif os.path.isdir(user_dir):
+        shutil.rmtree(user_dir)
+    shutil.rmtree(versions, ignore_errors=True)
+    return existed
+
+
+def new_version_dir(user_dir: str) -> str:
+    """A fresh `.versions/<email>/<id>` directory path for `root/<email>`."""
+    root, name = os.path.split(os.path.normpath(user_dir))
+    return os.path.join(root, VERSIONS_DIR, name, uuid.uuid4().hex)
+
+
+def swap_user_dir(new_dir: str, user_dir: str) -> None:
+    """Point `user_dir` (a symlink) at the freshly persisted `new_dir`.
+
+    The symlink is replaced with one rename, so readers always find a
+    complete index. The previous version is kept for readers still loading it.
+    """
+    parent = os.path.dirname(os.path.abspath(user_dir))
+    versions = os.path.dirname(os.path.abspath(new_dir))
+    previous = os.path.realpath(user_dir) if os.path.islink(user_dir) else None
+    if os.path.isdir(user_dir) and previous is None:
+        # Written before versioning: move it into the versions once.
+        previous = os.path.join(versions, f"legacy-{uuid.uuid4().hex}")
+        os.rename(user_dir, previous)
+    link = os.path.join(parent, f".{os.path.basename(user_dir)}.{uuid.uuid4().hex}.link")
+    os.symlink(os.path.relpath(new_dir, parent), link)
+    os.replace(link, user_dir)
+    keep = {os.path.realpath(new_dir), previous}
+    for name in os.listdir(versions):
+        path = os.path.join(versions, name)
+        if os.path.isdir(path) and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
 
 
 def faiss_exists_for_email(email: str) -> bool: